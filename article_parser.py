@@ -0,0 +1,27 @@
+import time
+from typing import Dict
+
+from newspaper import Article
+
+
+def parse_article(page: Dict) -> Dict:
+    """Run newspaper's parsing and boilerplate removal on already downloaded HTML.
+
+    Takes {"page_config": <link record>, "html": <raw html>} and returns the
+    same result shape as SeleniumNewsScraper.get_text, plus the source and
+    the parse time in seconds for the metrics. Kept at module level
+    so it can be shipped to a ProcessPoolExecutor.
+    """
+    started = time.monotonic()
+    page_config = page["page_config"]
+    article = Article(page_config["url"])
+    article.download(input_html=page["html"])
+    article.parse()
+    return {
+        "title": [article.title, page_config["title"]],
+        "content": article.text,
+        "url": page_config["url"],
+        "date": [article.publish_date, page_config["date"]],
+        "source": page_config.get("source"),
+        "parse_seconds": time.monotonic() - started,
+    }
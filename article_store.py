@@ -0,0 +1,299 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from dedup import canonicalize_url
+from text_search import build_match, index_text
+
+
+class ArticleStore:
+    """Local SQLite store for crawl runs, articles, texts and company mentions.
+
+    Articles and texts are keyed by canonical URL and upserted, so re-running
+    a crawl or the text stage updates rows instead of duplicating them.
+    Company links live in their own table with an origin ("title" for the
+    crawl tags, "text" for mentions found in the article body) and are
+    indexed by company, so queries such as "all ENGIE articles since
+    2024-06-01" are an index range scan instead of re-reading JSON files.
+
+    Texts are also added to an FTS5 index as they are upserted, in stemmed
+    and folded form (see text_search), keyed by the id of the texts row.
+    """
+
+    def __init__(self, path: str = "articles.sqlite3"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                articles INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                source_url TEXT NOT NULL,
+                source TEXT NOT NULL,
+                title TEXT,
+                date TEXT,
+                date_raw TEXT,
+                query TEXT,
+                first_run INTEGER REFERENCES runs(id),
+                last_run INTEGER REFERENCES runs(id)
+            );
+            CREATE INDEX IF NOT EXISTS articles_source_date ON articles (source, date);
+            CREATE INDEX IF NOT EXISTS articles_date ON articles (date);
+            CREATE TABLE IF NOT EXISTS texts (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL UNIQUE,
+                title TEXT,
+                content TEXT NOT NULL,
+                publish_date TEXT,
+                cluster TEXT,
+                extracted_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS texts_cluster ON texts (cluster);
+            CREATE TABLE IF NOT EXISTS companies (
+                url TEXT NOT NULL,
+                company TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                PRIMARY KEY (url, company, origin)
+            );
+            CREATE INDEX IF NOT EXISTS companies_company ON companies (company, url);
+            CREATE VIRTUAL TABLE IF NOT EXISTS texts_search USING fts5 (
+                title, content, tokenize = 'unicode61 remove_diacritics 2'
+            );
+            """
+        )
+        # title matches weigh five times more than body matches
+        self.conn.execute("INSERT INTO texts_search (texts_search, rank) VALUES ('rank', 'bm25(5.0, 1.0)')")
+        self.conn.commit()
+
+    def start_run(self) -> int:
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at) VALUES (?)", (datetime.now().isoformat(timespec="seconds"),)
+            )
+            self.conn.commit()
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, articles = "
+                "(SELECT COUNT(*) FROM articles WHERE last_run = ?) WHERE id = ?",
+                (datetime.now().isoformat(timespec="seconds"), run_id, run_id),
+            )
+            self.conn.commit()
+
+    def upsert_articles(self, articles: Iterable[Dict], run_id: int = None) -> int:
+        """Insert or update scraped articles in one transaction, returns the number of rows"""
+        rows = []
+        links = []
+        for article in articles:
+            url = canonicalize_url(article["url"])
+            rows.append(
+                (
+                    url,
+                    article["url"],
+                    article["source"],
+                    article.get("title"),
+                    article.get("date"),
+                    article.get("date_raw"),
+                    article.get("query"),
+                    run_id,
+                    run_id,
+                )
+            )
+            links.extend((url, company, "title") for company in article.get("companies", []))
+        if not rows:
+            return 0
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO articles (url, source_url, source, title, date, date_raw, query, first_run, last_run) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET "
+                "title = excluded.title, "
+                "date = COALESCE(excluded.date, articles.date), "
+                "date_raw = COALESCE(excluded.date_raw, articles.date_raw), "
+                "query = COALESCE(articles.query, excluded.query), "
+                "last_run = COALESCE(excluded.last_run, articles.last_run)",
+                rows,
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO companies (url, company, origin) VALUES (?, ?, ?)", links)
+            self.conn.commit()
+        return len(rows)
+
+    def upsert_text(self, result: Dict):
+        """Insert or update an extracted text in the get_text result format"""
+        url = canonicalize_url(result["url"])
+        publish_date = result["date"][0] if isinstance(result.get("date"), list) else result.get("date")
+        if isinstance(publish_date, datetime):
+            publish_date = publish_date.isoformat()
+        title = result["title"][0] if isinstance(result.get("title"), list) else result.get("title")
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO texts (url, title, content, publish_date, cluster, extracted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET title = excluded.title, content = excluded.content, "
+                "publish_date = excluded.publish_date, cluster = excluded.cluster, "
+                "extracted_at = excluded.extracted_at",
+                (url, title, result["content"], publish_date, result.get("cluster"),
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+            self._index_text(url, title, result["content"])
+            self.conn.execute("DELETE FROM companies WHERE url = ? AND origin = 'text'", (url,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO companies (url, company, origin) VALUES (?, ?, 'text')",
+                [(url, company) for company in result.get("companies", [])],
+            )
+            self.conn.commit()
+
+    def _index_text(self, url: str, title: str, content: str):
+        """Replace the search index row of a text, called with the lock held"""
+        (rowid,) = self.conn.execute("SELECT id FROM texts WHERE url = ?", (url,)).fetchone()
+        self.conn.execute("DELETE FROM texts_search WHERE rowid = ?", (rowid,))
+        self.conn.execute(
+            "INSERT INTO texts_search (rowid, title, content) VALUES (?, ?, ?)",
+            (rowid, index_text(title), index_text(content)),
+        )
+
+    def rebuild_search_index(self):
+        """Re-index every stored text, e.g. after the stemmer changed"""
+        with self.lock:
+            self.conn.execute("DELETE FROM texts_search")
+            rows = self.conn.execute("SELECT id, title, content FROM texts").fetchall()
+            self.conn.executemany(
+                "INSERT INTO texts_search (rowid, title, content) VALUES (?, ?, ?)",
+                [(rowid, index_text(title), index_text(content)) for rowid, title, content in rows],
+            )
+            self.conn.execute("INSERT INTO texts_search (texts_search) VALUES ('optimize')")
+            self.conn.commit()
+
+    def search(
+        self,
+        query: str,
+        company: str = None,
+        since: str = None,
+        until: str = None,
+        limit: int = 20,
+    ) -> List[Dict]:
+        """Ranked full-text search over extracted texts, best match first.
+
+        query uses the syntax of text_search.build_match. Title matches
+        weigh more than body matches (bm25 rank). company, since and until filter
+        like query_articles, the date being the article date or, for texts
+        without a crawled article, the publish date newspaper found.
+        """
+        match = build_match(query)
+        if not match:
+            return []
+        clauses = ["texts_search MATCH ?"]
+        params = [match]
+        if company is not None:
+            clauses.append("t.url IN (SELECT url FROM companies WHERE company = ?)")
+            params.append(company)
+        if since is not None:
+            clauses.append("COALESCE(a.date, t.publish_date) >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("COALESCE(a.date, t.publish_date) < ?")
+            params.append(until + "~")
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT COALESCE(a.source_url, t.url), a.source, COALESCE(t.title, a.title), "
+                "COALESCE(a.date, t.publish_date), t.cluster, texts_search.rank "
+                "FROM texts_search JOIN texts t ON t.id = texts_search.rowid "
+                "LEFT JOIN articles a ON a.url = t.url "
+                f"WHERE {' AND '.join(clauses)} ORDER BY texts_search.rank LIMIT ?",
+                params,
+            ).fetchall()
+        return [
+            {"url": row[0], "source": row[1], "title": row[2], "date": row[3], "cluster": row[4], "score": -row[5]}
+            for row in rows
+        ]
+
+    def query_articles(
+        self,
+        company: str = None,
+        source: str = None,
+        since: str = None,
+        until: str = None,
+        with_text: bool = False,
+    ) -> List[Dict]:
+        """Articles filtered by company, source and an ISO date range, newest first.
+
+        since and until are inclusive ISO dates ("2024-06-01"); articles
+        whose date could not be normalized are left out of date ranges.
+        """
+        clauses = []
+        params = []
+        if company is not None:
+            clauses.append("a.url IN (SELECT url FROM companies WHERE company = ?)")
+            params.append(company)
+        if source is not None:
+            clauses.append("a.source = ?")
+            params.append(source)
+        if since is not None:
+            clauses.append("a.date >= ?")
+            params.append(since)
+        if until is not None:
+            # datetimes on the last day sort after the bare date
+            clauses.append("a.date < ?")
+            params.append(until + "~")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        text_column = ", t.content" if with_text else ""
+        text_join = "LEFT JOIN texts t ON t.url = a.url" if with_text else ""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT a.url, a.source_url, a.source, a.title, a.date, a.date_raw, a.query, "
+                f"(SELECT group_concat(DISTINCT c.company) FROM companies c WHERE c.url = a.url){text_column} "
+                f"FROM articles a {text_join} {where} ORDER BY a.date DESC, a.url",
+                params,
+            ).fetchall()
+        return [self._article(row, with_text) for row in rows]
+
+    @staticmethod
+    def _article(row, with_text: bool = False) -> Dict:
+        article = {
+            "title": row[3],
+            "url": row[1],
+            "date": row[4],
+            "date_raw": row[5],
+            "source": row[2],
+            "query": row[6],
+            "companies": row[7].split(",") if row[7] else [],
+        }
+        if with_text:
+            article["text"] = row[8]
+        return article
+
+    def iter_articles(self) -> Iterable[Dict]:
+        """All articles in insertion order, in the selenium_news_results.json format"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT a.url, a.source_url, a.source, a.title, a.date, a.date_raw, a.query, "
+                "(SELECT group_concat(DISTINCT c.company) FROM companies c WHERE c.url = a.url) "
+                "FROM articles a ORDER BY a.rowid"
+            ).fetchall()
+        for row in rows:
+            yield self._article(row)
+
+    def export_json(self, path: str):
+        """Write every article to a JSON file compatible with the old output"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.iter_articles()), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,577 @@
+"""Offline benchmark for the crawl and text stages.
+
+Record search and article pages once:
+
+    python benchmark.py record --queries 5 --articles 5
+
+then replay them from a local server as often as needed:
+
+    python benchmark.py run --engine http --latency 0.05
+    python benchmark.py run --engine browser --compare benchmarks/results/<earlier run>.json
+
+Check that a resource blocking browser really cannot reach other hosts:
+
+    python benchmark.py check-blocking
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+import date_normalizer
+import page_snapshot
+from get_web_links import SeleniumNewsScraper
+from page_cache import normalize_url
+from query_planner import plan_queries
+from source_health import SourceHealth
+from source_registry import selectors_for
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+FIXTURES_DIR = os.path.join("benchmarks", "fixtures")
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+class FixtureStore:
+    """Recorded pages on disk, one HTML file per page plus an index.json keyed by normalized URL"""
+
+    def __init__(self, path: str = FIXTURES_DIR):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self.index: Dict[str, Dict] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def add(self, url: str, html: str, kind: str, status: int = 200, **meta):
+        key = normalize_url(url)
+        file_name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".html"
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, file_name), "w", encoding="utf-8") as f:
+            f.write(html)
+        self.index[key] = {"url": url, "file": file_name, "kind": kind, "status": status, **meta}
+
+    def get(self, url: str) -> Optional[Dict]:
+        return self.index.get(normalize_url(url))
+
+    def body(self, entry: Dict) -> bytes:
+        with open(os.path.join(self.path, entry["file"]), "rb") as f:
+            return f.read()
+
+    def entries(self, kind: str) -> List[Dict]:
+        return [entry for entry in self.index.values() if entry["kind"] == kind]
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+
+class ReplayServer:
+    """Local HTTP server answering with recorded fixtures.
+
+    A real URL https://host/path?query is served as
+    http://127.0.0.1:<port>/host/path?query after latency plus up to jitter
+    seconds. Unknown URLs get a 404.
+    """
+
+    def __init__(self, fixtures: FixtureStore, latency: float = 0.0, jitter: float = 0.0, port: int = 0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                delay = replay.latency + random.uniform(0, replay.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                entry = replay.fixtures.get(replay.original_url(self.path))
+                with replay.lock:
+                    replay.requests += 1
+                    replay.misses += entry is None
+                if entry is None:
+                    self.send_error(404)
+                    return
+                body = replay.fixtures.body(entry)
+                self.send_response(entry.get("status", 200))
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def replay_url(self, url: str) -> str:
+        """Address of a real URL on the replay server"""
+        parts = urlsplit(url)
+        rest = url[url.index(parts.netloc) + len(parts.netloc):]
+        return f"{self.base_url}/{parts.netloc}{rest or '/'}"
+
+    @staticmethod
+    def original_url(path: str) -> str:
+        host, _, rest = path.lstrip("/").partition("/")
+        return f"https://{host}/{rest}"
+
+
+class MemorySampler:
+    """Peak resident memory of this process and its children (geckodriver, Firefox).
+
+    Samples the process tree with psutil in a background thread; without
+    psutil it falls back to ru_maxrss, which only covers this process.
+    """
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _sample(self):
+        process = psutil.Process()
+        while not self.stop_event.is_set():
+            try:
+                processes = [process] + process.children(recursive=True)
+                rss = sum(p.memory_info().rss for p in processes if p.is_running())
+                self.peak_mb = max(self.peak_mb, rss / (1024 * 1024))
+            except Exception:
+                pass
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if psutil is not None:
+            self.thread = threading.Thread(target=self._sample, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self) -> float:
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            return self.peak_mb
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def record(
+    scraper: SeleniumNewsScraper,
+    fixtures: FixtureStore,
+    queries_per_source: int = 5,
+    articles_per_query: int = 5,
+    sources: List[str] = None,
+):
+    """Fetch search pages (rendered when the source needs JS) and some of their articles into fixtures"""
+    for source_name, config in scraper.sources.items():
+        if sources and source_name not in sources:
+            continue
+        planned_queries = plan_queries(scraper.companies, config)[:queries_per_source]
+        for planned in planned_queries:
+            search_url = scraper.build_search_url(config, planned["query"])
+            html = record_search_page(scraper, source_name, config, search_url)
+            if html is None:
+                continue
+            fixtures.add(
+                search_url, html, "search", source=source_name, query=planned["query"], owners=planned["owners"]
+            )
+            raw_articles = page_snapshot.extract_articles(html, config, search_url)
+            for raw in raw_articles[:articles_per_query]:
+                if fixtures.get(raw["url"]) is not None:
+                    continue
+                page = scraper.http_fetcher.fetch(raw["url"])
+                if page["status"] == 200:
+                    fixtures.add(raw["url"], page["html"], "article", source=source_name)
+            print(f"recorded {source_name}/{planned['query']}: {len(raw_articles)} articles")
+            fixtures.save()
+
+
+def record_search_page(scraper: SeleniumNewsScraper, source_name: str, config: dict, search_url: str) -> Optional[str]:
+    if not (config.get("needs_js") or scraper.source_profiles.needs_js(source_name)):
+        page = scraper.http_fetcher.fetch(search_url)
+        if page["status"] == 200 and page_snapshot.count_articles(page["html"], config) > 0:
+            return page["html"]
+    # rendered DOM after scrolling, so replays need no JavaScript
+    with scraper.browser_pool.lease(profile=scraper.resource_profile(config)) as browser:
+        if not scraper.safe_get(browser, search_url, delay=False):
+            return None
+        try:
+            WebDriverWait(browser, 10).until(EC.presence_of_element_located((By.XPATH, selectors_for(config)["article"].xpath)))
+        except Exception:
+            return None
+        scraper.scroll_page(browser, config)
+        return browser.page_source
+
+
+def replay_sources(sources: Dict[str, dict], server: ReplayServer) -> Dict[str, dict]:
+    """Source configs pointing at the replay server, without politeness delays"""
+    replayed = {}
+    for source_name, config in sources.items():
+        config = copy.copy(config)
+        host = urlsplit(config["url"]).netloc
+        real_base = f"{urlsplit(config['url']).scheme}://{host}"
+        replay_base = f"{server.base_url}/{host}"
+        config["url"] = config["url"].replace(real_base, replay_base, 1)
+        config["search_url"] = config["search_url"].replace(real_base, replay_base, 1)
+        if "page_url" in config:
+            config["page_url"] = config["page_url"].replace(real_base, replay_base, 1)
+        config["min_interval"] = 0.0
+        config["jitter"] = 0.0
+        config["cache_ttl"] = 0
+        # the replay server is the only host a blocking browser profile may reach
+        config["allowed_hosts"] = ["127.0.0.1"]
+        replayed[source_name] = config
+    return replayed
+
+
+def run(
+    fixtures: FixtureStore,
+    engine: str = "http",
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    workers: int = 3,
+    tabs: int = 1,
+    extraction: str = "snapshot",
+    text_stage: bool = True,
+    parse_workers: int = None,
+) -> Dict:
+    """Replay every recorded search through the crawl stage, then the recorded articles through the text stage"""
+    server = ReplayServer(fixtures, latency, jitter).start()
+    workdir = tempfile.mkdtemp(prefix="scraper-benchmark-")
+    scraper = SeleniumNewsScraper(
+        headless=True,
+        num_browsers=workers,
+        tabs_per_browser=tabs,
+        extraction_mode=extraction,
+        fetch_mode=engine,
+        profiles_file=os.path.join(workdir, "source_profiles.json"),
+        cache_file=None,
+        near_duplicates_file=os.path.join(workdir, "near_duplicates.json"),
+        store_file=os.path.join(workdir, "articles.sqlite3"),
+        ledger_file=None,
+        metrics_file=None,
+    )
+    scraper.sources = replay_sources(scraper.sources, server)
+    # the limiters would measure politeness instead of the code
+    scraper.source_health = {
+        name: SourceHealth(name, rate=1000.0, max_rate=1000.0, burst=1000.0) for name in scraper.sources
+    }
+
+    jobs = []
+    for entry in fixtures.entries("search"):
+        config = scraper.sources.get(entry["source"])
+        if config is None:
+            continue
+        jobs.append(
+            {
+                "query": entry["query"],
+                "planned": {"query": entry["query"], "owners": entry.get("owners", []), "covers": []},
+                "source_name": entry["source"],
+                "config": config,
+                "host": urlsplit(config["url"]).netloc,
+            }
+        )
+
+    articles = []
+
+    def collect(job, result, error):
+        if error is None:
+            articles.extend(result)
+
+    memory = MemorySampler().start()
+    report = {
+        "engine": engine,
+        "extraction": extraction,
+        "latency": latency,
+        "jitter": jitter,
+        "workers": workers,
+        "tabs": tabs,
+        "time": datetime.now().isoformat(timespec="seconds"),
+    }
+    try:
+        started = time.monotonic()
+        scraper.build_scheduler().run(jobs, scraper.run_job, collect)
+        crawl_seconds = time.monotonic() - started
+        report["crawl"] = {
+            "jobs": len(jobs),
+            "articles": len(articles),
+            "seconds": round(crawl_seconds, 3),
+            "jobs_per_second": round(len(jobs) / crawl_seconds, 2) if crawl_seconds else None,
+            "articles_per_second": round(len(articles) / crawl_seconds, 2) if crawl_seconds else None,
+        }
+
+        if text_stage:
+            records = [
+                {"url": server.replay_url(entry["url"]), "title": "", "date": "", "source": entry["source"]}
+                for entry in fixtures.entries("article")
+            ]
+            started = time.monotonic()
+            stats = scraper.test_main_get_text(
+                records,
+                executors=workers,
+                deadline=None,
+                output_file=os.path.join(workdir, "texts.csv"),
+                parse_workers=parse_workers,
+            )
+            text_seconds = time.monotonic() - started
+            report["text"] = dict(
+                stats,
+                seconds=round(text_seconds, 3),
+                texts_per_second=round(stats["written"] / text_seconds, 2) if text_seconds else None,
+            )
+    finally:
+        scraper.cleanup()
+        report["peak_rss_mb"] = round(memory.stop(), 1)
+        server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report["replay"] = {"requests": server.requests, "misses": server.misses}
+    report["stages"] = [
+        {
+            "stage": timing["stage"],
+            "source": timing["labels"].get("source"),
+            "count": timing["count"],
+            "p50_ms": round(timing["p50"] * 1000, 2),
+            "p95_ms": round(timing["p95"] * 1000, 2),
+        }
+        for timing in scraper.metrics.snapshot()["timings"]
+        if timing["p50"] is not None
+    ]
+    report["micro"] = micro(fixtures, scraper)
+    return report
+
+
+def micro(fixtures: FixtureStore, scraper: SeleniumNewsScraper, repeat: int = 5) -> Dict:
+    """Snapshot extraction and date normalization timed on the recorded search pages alone"""
+    pages = []
+    for entry in fixtures.entries("search"):
+        config = scraper.sources.get(entry["source"])
+        if config is not None:
+            pages.append((fixtures.body(entry).decode("utf-8"), config, entry["url"], entry["source"]))
+    if not pages:
+        return {}
+
+    started = time.perf_counter()
+    raw_dates = []
+    for _ in range(repeat):
+        raw_dates = []
+        for html, config, url, source in pages:
+            raw_dates.extend((raw["date"], source) for raw in page_snapshot.extract_articles(html, config, url))
+    extraction_ms = (time.perf_counter() - started) * 1000 / (repeat * len(pages))
+
+    date_normalizer.normalize_date.cache_clear()
+    started = time.perf_counter()
+    for date, source in raw_dates:
+        scraper.normalize_date(date, source)
+    cold_us = (time.perf_counter() - started) * 1e6 / max(len(raw_dates), 1)
+    started = time.perf_counter()
+    for date, source in raw_dates:
+        scraper.normalize_date(date, source)
+    warm_us = (time.perf_counter() - started) * 1e6 / max(len(raw_dates), 1)
+
+    return {
+        "snapshot_extraction_ms_per_page": round(extraction_ms, 3),
+        "normalize_date_us_cold": round(cold_us, 2),
+        "normalize_date_us_cached": round(warm_us, 2),
+        "dates": len(raw_dates),
+    }
+
+
+def print_report(report: Dict, baseline: Dict = None):
+    def delta(path, higher_is_better=True):
+        if baseline is None:
+            return ""
+        current, previous = report, baseline
+        for key in path:
+            current = (current or {}).get(key)
+            previous = (previous or {}).get(key)
+        if not current or not previous:
+            return ""
+        change = (current - previous) / previous
+        if change == 0:
+            return " (unchanged)"
+        better = change > 0 if higher_is_better else change < 0
+        return f" ({change:+.1%} {'better' if better else 'worse'})"
+
+    print(
+        f"engine {report['engine']}, extraction {report['extraction']}, latency {report['latency']}s, "
+        f"{report['workers']} browsers x {report.get('tabs', 1)} tabs"
+    )
+    crawl = report["crawl"]
+    print(
+        f"crawl: {crawl['jobs']} jobs, {crawl['articles']} articles in {crawl['seconds']}s, "
+        f"{crawl['articles_per_second']} articles/s{delta(('crawl', 'articles_per_second'))}"
+    )
+    if "text" in report:
+        text = report["text"]
+        print(
+            f"text: {text['written']} written, {text['failed']} failed in {text['seconds']}s, "
+            f"{text['texts_per_second']} texts/s{delta(('text', 'texts_per_second'))}"
+        )
+    print(f"peak memory: {report['peak_rss_mb']} MB{delta(('peak_rss_mb',), higher_is_better=False)}")
+    print(f"replay: {report['replay']['requests']} requests, {report['replay']['misses']} misses")
+
+    previous_stages = {}
+    if baseline is not None:
+        previous_stages = {(s["stage"], s["source"]): s for s in baseline.get("stages", [])}
+    print(f"{'source':<12} {'stage':<20} {'count':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage in sorted(report["stages"], key=lambda s: (s["source"] or "", s["stage"])):
+        line = (
+            f"{stage['source'] or '-':<12} {stage['stage']:<20} {stage['count']:>7} "
+            f"{stage['p50_ms']:>9.1f} {stage['p95_ms']:>9.1f}"
+        )
+        previous = previous_stages.get((stage["stage"], stage["source"]))
+        if previous and previous["p50_ms"]:
+            line += f"  p50 {(stage['p50_ms'] - previous['p50_ms']) / previous['p50_ms']:+.1%}"
+        print(line)
+    for name, value in report.get("micro", {}).items():
+        print(f"{name}: {value}{delta(('micro', name), higher_is_better=False) if name != 'dates' else ''}")
+
+
+def check_blocking(scraper: SeleniumNewsScraper) -> Dict[str, bool]:
+    """Load a page from an allowed and from a blocked host in a resource blocking browser.
+
+    The replay server answers both as 127.0.0.1 (allowed) and as localhost
+    (blocked). Firefox never sends loopback hosts through a proxy, so this
+    check alone sets network.proxy.allow_hijacking_localhost to let the PAC
+    script route localhost like any other host. A blocked load must not
+    reach the server at all.
+    """
+    fixtures = FixtureStore(tempfile.mkdtemp(prefix="scraper-blocking-"))
+    fixtures.add("https://blocking.check/page", "<html><body><p id='loaded'>loaded</p></body></html>", kind="check")
+    server = ReplayServer(fixtures).start()
+    options = webdriver.FirefoxOptions()
+    options.add_argument("--headless")
+    scraper.apply_resource_blocking(options, ("127.0.0.1",))
+    options.set_preference("network.proxy.allow_hijacking_localhost", True)
+    driver = webdriver.Firefox(options)
+    driver.set_page_load_timeout(10)
+
+    def loads(url: str) -> bool:
+        requests_before = server.requests
+        try:
+            driver.get(url)
+        except Exception:
+            pass
+        found = bool(driver.find_elements(By.ID, "loaded"))
+        return found or server.requests > requests_before
+
+    try:
+        allowed_url = server.replay_url("https://blocking.check/page")
+        result = {
+            "allowed_loads": loads(allowed_url),
+            "blocked_loads": loads(allowed_url.replace("127.0.0.1", "localhost", 1)),
+        }
+    finally:
+        driver.quit()
+        server.stop()
+        shutil.rmtree(fixtures.path, ignore_errors=True)
+    result["ok"] = result["allowed_loads"] and not result["blocked_loads"]
+    return result
+
+
+def save_report(report: Dict, path: str = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{report['engine']}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record fixtures and benchmark the scraper offline")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record search and article pages from the live sites")
+    record_parser.add_argument("--queries", type=int, default=5, help="queries per source")
+    record_parser.add_argument("--articles", type=int, default=5, help="articles per query")
+    record_parser.add_argument("--source", action="append", help="only record these sources")
+
+    run_parser = commands.add_parser("run", help="replay the fixtures through the pipeline")
+    run_parser.add_argument("--engine", choices=["http", "browser"], default="http")
+    run_parser.add_argument("--extraction", choices=["snapshot", "live"], default="snapshot")
+    run_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    run_parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to seconds")
+    run_parser.add_argument("--workers", type=int, default=3)
+    run_parser.add_argument("--tabs", type=int, default=1, help="windows per browser, compare memory against --workers")
+    run_parser.add_argument("--parse-workers", type=int, default=None)
+    run_parser.add_argument("--no-text", action="store_true", help="skip the text stage")
+    run_parser.add_argument("--compare", help="earlier report to compare against")
+    run_parser.add_argument("--output", help="report path, default benchmarks/results/<engine>-<time>.json")
+
+    commands.add_parser("check-blocking", help="check that a resource blocking browser cannot reach other hosts")
+    args = parser.parse_args()
+
+    fixtures = FixtureStore(args.fixtures)
+    if args.command == "record":
+        scraper = SeleniumNewsScraper(headless=True, cache_file=None, ledger_file=None, metrics_file=None)
+        try:
+            record(scraper, fixtures, args.queries, args.articles, args.source)
+        finally:
+            scraper.cleanup()
+    elif args.command == "check-blocking":
+        scraper = SeleniumNewsScraper(headless=True, cache_file=None, ledger_file=None, metrics_file=None)
+        try:
+            result = check_blocking(scraper)
+        finally:
+            scraper.cleanup()
+        print(json.dumps(result, indent=2))
+        if not result["ok"]:
+            raise SystemExit("a blocked host was reachable, or the allowed one was not")
+    else:
+        report = run(
+            fixtures,
+            engine=args.engine,
+            latency=args.latency,
+            jitter=args.jitter,
+            workers=args.workers,
+            tabs=args.tabs,
+            extraction=args.extraction,
+            text_stage=not args.no_text,
+            parse_workers=args.parse_workers,
+        )
+        baseline = None
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        print_report(report, baseline)
+        print(f"report written to {save_report(report, args.output)}")
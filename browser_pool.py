@@ -0,0 +1,190 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from pool_support import (
+    MAX_START_FAILURES,
+    StartBackoff,
+    deadline_for,
+    over_memory_limit,
+    remaining,
+    start_in_background,
+)
+
+
+class BrowserPool:
+    """Lazily started, self-healing pool of WebDriver instances.
+
+    Browsers are created on demand up to max_size, outside the pool lock so
+    several of them start in parallel. Every checkout health-checks the
+    driver; dead ones are quit and replaced, and drivers are recycled after
+    max_pages leases or once geckodriver plus Firefox exceed max_rss_mb
+    (needs psutil). Use lease() so a browser always goes back to the pool.
+
+    Browsers are started for a profile (any hashable, None for the default
+    one) with factory(profile). A checkout prefers an idle browser of the
+    requested profile; when the pool is full it replaces an idle browser
+    of another profile instead of waiting.
+
+    A checkout whose browser fails to start backs off before trying again
+    and gives up after max_start_failures failures in a row, or once its
+    timeout is used up (see StartBackoff).
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[object], object],
+        max_size: int = 3,
+        max_pages: Optional[int] = 50,
+        max_rss_mb: Optional[float] = None,
+        logger: logging.Logger = None,
+        max_start_failures: int = MAX_START_FAILURES,
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.max_start_failures = max_start_failures
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.pages = {}
+        self.profiles = {}
+        self.size = 0
+        self.closed = False
+
+    def prewarm(self, count: int = None, profile=None):
+        """Start browsers in parallel in the background, up to max_size"""
+        start_in_background(self._prewarm_one, self.max_size if count is None else count, profile)
+
+    def _prewarm_one(self, profile):
+        with self.condition:
+            if self.closed or self.size >= self.max_size:
+                return
+            self.size += 1
+        driver = self._create(profile)
+        if driver is not None:
+            self.checkin(driver)
+
+    def _create(self, profile):
+        """Start a browser for an already reserved slot, frees the slot on failure"""
+        try:
+            driver = self.factory(profile)
+        except Exception as e:
+            self.logger.error(f"Error starting browser: {str(e)}")
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            return None
+        self.pages[id(driver)] = 0
+        self.profiles[id(driver)] = profile
+        return driver
+
+    def _take_idle(self, profile):
+        """Idle browser of the given profile, called with the lock held"""
+        for driver in self.idle:
+            if self.profiles.get(id(driver)) == profile:
+                self.idle.remove(driver)
+                return driver
+        return None
+
+    def checkout(self, timeout: float = None, profile=None):
+        """Take a healthy browser, starting a new one if the pool is not full"""
+        deadline = deadline_for(timeout)
+        backoff = StartBackoff(deadline, self.max_start_failures)
+        while True:
+            driver = None
+            evicted = None
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    if self.closed:
+                        raise RuntimeError("browser pool is closed")
+                    left = remaining(deadline)
+                    if left is not None and left <= 0:
+                        raise TimeoutError("no browser available")
+                    self.condition.wait(left)
+                if self.closed:
+                    raise RuntimeError("browser pool is closed")
+                driver = self._take_idle(profile)
+                if driver is None:
+                    if self.size < self.max_size:
+                        self.size += 1
+                    else:
+                        # full pool, swap an idle browser of another profile for a new one
+                        evicted = self.idle.popleft()
+
+            if driver is None:
+                if evicted is not None:
+                    self._quit(evicted)
+                driver = self._create(profile)
+                if driver is not None:
+                    return driver
+                backoff.failed()
+                continue
+
+            if self._needs_recycling(driver):
+                self._discard(driver)
+                continue
+            if self._is_alive(driver):
+                return driver
+            self.logger.warning("replacing dead browser")
+            self._discard(driver)
+
+    def checkin(self, driver):
+        """Give a browser back to the pool"""
+        self.pages[id(driver)] = self.pages.get(id(driver), 0) + 1
+        with self.condition:
+            if not self.closed:
+                self.idle.append(driver)
+                self.condition.notify()
+                return
+        self._discard(driver)
+
+    @contextmanager
+    def lease(self, timeout: float = None, profile=None):
+        driver = self.checkout(timeout, profile)
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def _is_alive(self, driver) -> bool:
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycling(self, driver) -> bool:
+        if self.max_pages is not None and self.pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        return over_memory_limit(driver, self.max_rss_mb, self.logger)
+
+    def _quit(self, driver):
+        """Quit a browser without touching its slot"""
+        self.pages.pop(id(driver), None)
+        self.profiles.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _discard(self, driver):
+        """Quit a browser and free its slot"""
+        self._quit(driver)
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close(self):
+        """Quit idle browsers, leased ones are quit when they are checked in"""
+        with self.condition:
+            self.closed = True
+            drivers = list(self.idle)
+            self.idle.clear()
+            self.condition.notify_all()
+        for driver in drivers:
+            self._discard(driver)
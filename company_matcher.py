@@ -0,0 +1,144 @@
+import re
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+# "funcţia de CEO", "CEO-ul SNN", "CEO al companiei": the alias used as a job title
+TITLE_BEFORE = re.compile(r"\b(de|ca|noul|fostul)\s+$")
+TITLE_AFTER = re.compile(r"^[\"”]?(-[a-z]|\s+(al|ale)\b)")
+
+
+@lru_cache(maxsize=4096)
+def fold_char(c: str) -> str:
+    """Strip diacritics from a single character, keeping it one character long"""
+    decomposed = [d for d in unicodedata.normalize("NFKD", c) if not unicodedata.combining(d)]
+    return decomposed[0] if decomposed else c
+
+
+def fold_preserving_offsets(text: str) -> str:
+    """Diacritics-folded copy of text with the same length, so offsets map 1:1"""
+    return "".join(fold_char(c) for c in text)
+
+
+class CompanyMatcher:
+    """Aho-Corasick matcher for company aliases.
+
+    Text is diacritics-folded and lowercased character by character (offsets
+    stay valid for the original text) and scanned once for all aliases.
+    Matches must sit on word boundaries. Aliases listed in case_sensitive
+    (ambiguous ones such as "MET" or "NEXT") also have to appear exactly in
+    that case, which keeps common words out while "Enel" still matches
+    "ENEL". Aliases in job_titles ("CEO") are dropped where they read as a
+    title ("funcţia de CEO", "CEO-ul SNN", "CEO al ..."), and aliases in
+    needs_context only count when another alias of the same company is in
+    the text too. Hits contained in a longer hit are dropped, so "ENEL Green
+    Power Romania" does not also count as "ENEL".
+    """
+
+    def __init__(
+        self,
+        companies: Dict[str, List[str]],
+        case_sensitive: Iterable[str] = (),
+        job_titles: Iterable[str] = (),
+        needs_context: Iterable[str] = (),
+    ):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.job_titles = set(job_titles)
+        self.needs_context = set(needs_context)
+
+        case_sensitive = set(case_sensitive)
+        for company, aliases in companies.items():
+            for alias in aliases:
+                folded = fold_preserving_offsets(alias)
+                self._add(folded.lower(), (company, alias, folded if alias in case_sensitive else None))
+        self._build()
+
+    def _add(self, pattern: str, payload):
+        state = 0
+        for c in pattern:
+            next_state = self.goto[state].get(c)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][c] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((len(pattern), payload))
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and c not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(c, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> List[Dict]:
+        """All company hits in text as dicts with company, alias, start and end offsets"""
+        if not text:
+            return []
+        folded = fold_preserving_offsets(text)
+        lowered = folded.lower()
+        if len(lowered) != len(folded):
+            # a few characters lowercase to more than one, fall back to per-character lowering
+            lowered = "".join(c.lower()[0] for c in folded)
+
+        goto, fail, output = self.goto, self.fail, self.output
+        hits = []
+        state = 0
+        for end, c in enumerate(lowered, 1):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for length, (company, alias, exact) in output[state]:
+                start = end - length
+                if start > 0 and lowered[start - 1].isalnum():
+                    continue
+                if end < len(lowered) and lowered[end].isalnum():
+                    continue
+                if exact is not None and folded[start:end] != exact:
+                    continue
+                if alias in self.job_titles and self._is_title(lowered, start, end):
+                    continue
+                hits.append({"company": company, "alias": alias, "start": start, "end": end})
+
+        hits = self._drop_contained(hits)
+        if self.needs_context:
+            hits = self._drop_without_context(hits)
+        return hits
+
+    @staticmethod
+    def _is_title(lowered: str, start: int, end: int) -> bool:
+        return bool(TITLE_BEFORE.search(lowered[max(0, start - 20):start]) or TITLE_AFTER.match(lowered[end:end + 5]))
+
+    def _drop_without_context(self, hits: List[Dict]) -> List[Dict]:
+        confirmed = {hit["company"] for hit in hits if hit["alias"] not in self.needs_context}
+        return [hit for hit in hits if hit["alias"] not in self.needs_context or hit["company"] in confirmed]
+
+    @staticmethod
+    def _drop_contained(hits: List[Dict]) -> List[Dict]:
+        hits.sort(key=lambda hit: (hit["start"], -(hit["end"] - hit["start"])))
+        kept = []
+        covered_until = -1
+        for hit in hits:
+            if hit["end"] <= covered_until:
+                continue
+            kept.append(hit)
+            covered_until = max(covered_until, hit["end"])
+        return kept
+
+    def companies(self, text: str) -> List[str]:
+        """Companies mentioned in text, in order of first mention"""
+        found = []
+        for hit in self.find(text):
+            if hit["company"] not in found:
+                found.append(hit["company"])
+        return found
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from source_health import CircuitOpenError, PROBE_RETRY
+
+
+class HostBudget:
+    """Politeness budget for a single host"""
+
+    def __init__(self, max_in_flight: int = 2, min_interval: float = 1.0, jitter: float = 0.5):
+        self.max_in_flight = max_in_flight
+        # minimum seconds between two request starts on the host
+        self.min_interval = min_interval
+        # random extra spacing, up to this many seconds
+        self.jitter = jitter
+
+
+class RetryLater(Exception):
+    """Raised by a worker to have its job run again after delay seconds.
+
+    The job goes back on its host's queue and passes through the host's
+    pacing again, no worker thread or global slot waits for it meanwhile.
+    """
+
+    def __init__(self, delay: float, error: Exception = None):
+        super().__init__(str(error) if error is not None else f"retry in {delay:.0f}s")
+        self.delay = delay
+        self.error = error
+
+
+class HostQueue:
+    """Jobs of one host ordered by the time they may start"""
+
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()
+        # jobs taken by a consumer and not finished yet, they may come back
+        self.active = 0
+        self.changed = asyncio.Event()
+
+    def put(self, job: Dict, not_before: float = 0.0):
+        heapq.heappush(self.heap, (not_before, next(self.order), job))
+        self.changed.set()
+
+    async def get(self) -> Optional[Dict]:
+        """The next job once it is due, None when the host has nothing left to run"""
+        while True:
+            timeout = None
+            if self.heap:
+                timeout = self.heap[0][0] - time.monotonic()
+                if timeout <= 0:
+                    self.active += 1
+                    return heapq.heappop(self.heap)[2]
+            elif not self.active:
+                return None
+            self.changed.clear()
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def task_done(self):
+        self.active -= 1
+        self.changed.set()
+
+
+class CrawlScheduler:
+    """Asyncio scheduler with one queue per host.
+
+    Every host gets its own queue drained by max_in_flight consumers, so a slow
+    host only ties up its own consumers. A global semaphore caps the total
+    number of running jobs and all pacing is done with asyncio.sleep. Jobs are
+    blocking callables (Selenium, requests) and run on a thread pool. A job
+    whose worker raises RetryLater is put back on its host's queue and
+    started again, paced like any other job, once its delay has passed.
+
+    Hosts can also have a SourceHealth limiter: its adaptive token bucket
+    paces the host on top of min_interval. While its circuit breaker is open
+    the host's jobs are held back without taking a global slot; once the
+    cooldown has passed the next job goes out as the half open probe, and
+    the rest follow when it closes the breaker. A job held longer than
+    max_hold seconds in total is given up with CircuitOpenError.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 3,
+        default_budget: HostBudget = None,
+        host_budgets: Dict[str, HostBudget] = None,
+        limiters: Dict[str, object] = None,
+        max_hold: Optional[float] = 1800.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.default_budget = default_budget or HostBudget()
+        self.host_budgets = host_budgets or {}
+        self.limiters = limiters or {}
+        self.max_hold = max_hold
+
+    def budget_for(self, host: str) -> HostBudget:
+        return self.host_budgets.get(host, self.default_budget)
+
+    def run(
+        self,
+        jobs: Iterable[Dict],
+        worker: Callable[[Dict], object],
+        on_result: Optional[Callable[[Dict, object, Optional[Exception]], None]] = None,
+        skip: Optional[Callable[[Dict], bool]] = None,
+    ):
+        """Run all jobs to completion, blocking the calling thread"""
+        return asyncio.run(self.run_async(jobs, worker, on_result, skip))
+
+    async def run_async(self, jobs, worker, on_result=None, skip=None):
+        """Run jobs grouped by their "host" key.
+
+        on_result(job, result, error) is called on the event loop as soon as
+        each job finishes, retried jobs only once their last run finished.
+        Jobs for which skip(job) is true when their turn comes are dropped
+        without pacing or running them.
+        """
+        loop = asyncio.get_running_loop()
+        global_slots = asyncio.Semaphore(self.max_concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+        queues: Dict[str, HostQueue] = {}
+        # first time each held job was turned back by its host's breaker, by id(job)
+        held_since: Dict[int, float] = {}
+        for job in jobs:
+            queues.setdefault(job["host"], HostQueue()).put(job)
+
+        async def consume(host: str, queue: HostQueue, next_start: list):
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                try:
+                    await run_one(host, queue, job, next_start)
+                finally:
+                    queue.task_done()
+
+        async def run_one(host: str, queue: HostQueue, job: Dict, next_start: list):
+            budget = self.budget_for(host)
+            limiter = self.limiters.get(host)
+            if skip is not None and skip(job):
+                return
+
+            if limiter is not None:
+                wait = limiter.retry_after()
+                if wait > 0:
+                    hold(host, queue, job, wait)
+                    return
+
+            # Reserve the next start slot on this host, then wait for it without blocking
+            now = time.monotonic()
+            start_at = max(now, next_start[0])
+            next_start[0] = start_at + budget.min_interval + random.uniform(0, budget.jitter)
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            if limiter is not None:
+                wait = limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+            async with global_slots:
+                result, error = None, None
+                try:
+                    result = await loop.run_in_executor(executor, worker, job)
+                except RetryLater as e:
+                    queue.put(job, time.monotonic() + e.delay)
+                    return
+                except CircuitOpenError:
+                    # another job of the host is the half open probe
+                    hold(host, queue, job, limiter.retry_after() if limiter is not None else 0.0)
+                    return
+                except Exception as e:
+                    error = e
+            held_since.pop(id(job), None)
+            if on_result is not None:
+                on_result(job, result, error)
+
+        def hold(host: str, queue: HostQueue, job: Dict, wait: float):
+            now = time.monotonic()
+            since = held_since.setdefault(id(job), now)
+            if self.max_hold is not None and now - since >= self.max_hold:
+                held_since.pop(id(job))
+                if on_result is not None:
+                    on_result(job, None, CircuitOpenError(f"circuit open for {host}"))
+                return
+            not_before = now + max(wait, PROBE_RETRY)
+            if self.max_hold is not None:
+                not_before = min(not_before, since + self.max_hold)
+            queue.put(job, not_before)
+
+        consumers = []
+        for host, queue in queues.items():
+            next_start = [0.0]
+            for _ in range(max(1, self.budget_for(host).max_in_flight)):
+                consumers.append(asyncio.create_task(consume(host, queue, next_start)))
+
+        try:
+            await asyncio.gather(*consumers)
+        finally:
+            executor.shutdown(wait=True)
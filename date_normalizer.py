@@ -0,0 +1,196 @@
+import calendar
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Union
+
+from query_planner import fold
+
+
+MONTHS = {
+    "ian": 1, "ianuarie": 1,
+    "feb": 2, "febr": 2, "februarie": 2,
+    "mar": 3, "mart": 3, "martie": 3,
+    "apr": 4, "aprilie": 4,
+    "mai": 5,
+    "iun": 6, "iunie": 6,
+    "iul": 7, "iulie": 7,
+    "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "septembrie": 9,
+    "oct": 10, "octombrie": 10,
+    "noi": 11, "noiem": 11, "nov": 11, "noiembrie": 11,
+    "dec": 12, "decembrie": 12,
+}
+
+RELATIVE_UNITS = {
+    "minut": "minutes", "minute": "minutes", "min": "minutes",
+    "ora": "hours", "ore": "hours", "h": "hours",
+    "zi": "days", "zile": "days",
+    "saptamana": "weeks", "saptamani": "weeks",
+    "luna": "months", "luni": "months",
+    "an": "years", "ani": "years",
+}
+
+ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:[t ](\d{2}):(\d{2})(?::(\d{2}))?)?")
+NUMERIC_DATE = re.compile(r"^(\d{1,2})[./-](\d{1,2})[./-](\d{4})(?:,?\s+(\d{1,2}):(\d{2}))?$")
+MONTH_NAME_DATE = re.compile(
+    r"^(\d{1,2})\s+(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+    r"(?:\s+(\d{4}))?(?:,?\s+(\d{1,2}):(\d{2}))?$"
+)
+RELATIVE_DATE = re.compile(
+    r"^(?:acum\s+)?(\d+|o|un|una)\s+(" + "|".join(sorted(RELATIVE_UNITS, key=len, reverse=True)) + r")\b"
+)
+DAY_WORD = re.compile(r"^(azi|astazi|ieri|alaltaieri)\b(?:,?\s+(?:ora\s+)?(\d{1,2}):(\d{2}))?")
+TIME_ONLY = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+class DateParser:
+    """Date parser for one source, regexes are compiled once at import time.
+
+    Handles ISO dates, dd.mm.yyyy, Romanian month names and abbreviations
+    ("19 sep", "11 mart. 2023", "19 septembrie 2024, 14:30"), relative forms
+    ("acum 5 minute", "acum o oră", "ieri") and bare times. Dates without a
+    year get the anchor's year, or the previous one if that would put them
+    after the anchor ("29 feb" goes back to the last leap year). Values that
+    look like dates but are not valid ones ("31.02.2024", "25:70") give None.
+    Relative forms are resolved against the anchor, the crawl timestamp.
+    Extra strptime formats from the source config ("date_formats") are tried
+    first.
+    """
+
+    def __init__(self, formats: Iterable[str] = ()):
+        self.formats = tuple(formats)
+
+    def parse(self, date_str: str, anchor: datetime) -> Optional[str]:
+        """ISO date (YYYY-MM-DD) or datetime string, None if the value is not a date"""
+        if not date_str:
+            return None
+        raw = " ".join(date_str.split())
+        for date_format in self.formats:
+            try:
+                return self._iso(datetime.strptime(raw, date_format), "%H" in date_format)
+            except ValueError:
+                continue
+
+        text = fold(raw).replace("in urma", "").strip()
+
+        match = ISO_DATE.match(text)
+        if match:
+            year, month, day, hour, minute, second = match.groups()
+            moment = self._datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+            return self._iso(moment, hour is not None)
+
+        match = NUMERIC_DATE.match(text)
+        if match:
+            day, month, year, hour, minute = match.groups()
+            moment = self._datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0))
+            return self._iso(moment, hour is not None)
+
+        match = MONTH_NAME_DATE.match(text)
+        if match:
+            day, month_name, year, hour, minute = match.groups()
+            month = MONTHS[month_name]
+            if year is None:
+                year = anchor.year
+                if (month, int(day)) > (anchor.month, anchor.day):
+                    year -= 1
+                if (month, int(day)) == (2, 29):
+                    while not calendar.isleap(year):
+                        year -= 1
+            moment = self._datetime(int(year), month, int(day), int(hour or 0), int(minute or 0))
+            return self._iso(moment, hour is not None)
+
+        match = RELATIVE_DATE.match(text)
+        if match:
+            amount, unit = match.groups()
+            amount = 1 if amount in ("o", "un", "una") else int(amount)
+            unit = RELATIVE_UNITS[unit]
+            if unit == "months":
+                delta = timedelta(days=30 * amount)
+            elif unit == "years":
+                delta = timedelta(days=365 * amount)
+            else:
+                delta = timedelta(**{unit: amount})
+            return self._iso(anchor - delta, unit in ("minutes", "hours"))
+
+        match = DAY_WORD.match(text)
+        if match:
+            word, hour, minute = match.groups()
+            days_back = {"azi": 0, "astazi": 0, "ieri": 1, "alaltaieri": 2}[word]
+            moment = self._at_time(anchor - timedelta(days=days_back), int(hour or 0), int(minute or 0))
+            return self._iso(moment, hour is not None)
+
+        match = TIME_ONLY.match(text)
+        if match:
+            moment = self._at_time(anchor, int(match.group(1)), int(match.group(2)))
+            return self._iso(moment, True)
+
+        return None
+
+    @staticmethod
+    def _datetime(*fields: int) -> Optional[datetime]:
+        """datetime(*fields), None for out of range values such as 31 February or 25:00"""
+        try:
+            return datetime(*fields)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _at_time(day: datetime, hour: int, minute: int) -> Optional[datetime]:
+        try:
+            return day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _iso(moment: Optional[datetime], with_time: bool) -> Optional[str]:
+        if moment is None:
+            return None
+        if with_time:
+            return moment.replace(microsecond=0).isoformat()
+        return moment.date().isoformat()
+
+
+_parsers: Dict[tuple, DateParser] = {}
+
+
+def parser_for(formats: Iterable[str] = ()) -> DateParser:
+    """Shared parser for a tuple of extra source formats"""
+    formats = tuple(formats)
+    parser = _parsers.get(formats)
+    if parser is None:
+        parser = _parsers[formats] = DateParser(formats)
+    return parser
+
+
+@lru_cache(maxsize=65536)
+def normalize_date(date_str: str, anchor: datetime, formats: tuple = ()) -> Optional[str]:
+    """Cached single value normalization, see DateParser"""
+    return parser_for(formats).parse(date_str, anchor)
+
+
+def normalize_many(
+    values: Iterable[Optional[str]],
+    anchor: datetime,
+    formats: Union[tuple, Iterable[tuple]] = (),
+) -> List[Optional[str]]:
+    """Normalize a whole column at once.
+
+    formats is either one tuple of extra formats for every value or an
+    iterable with one tuple per value (e.g. derived from a source column).
+    Each distinct (value, formats) pair is parsed only once.
+    """
+    values = list(values)
+    if isinstance(formats, tuple) and all(isinstance(f, str) for f in formats):
+        per_value = [formats] * len(values)
+    else:
+        per_value = [tuple(f) for f in formats]
+
+    results = {}
+    normalized = []
+    for value, value_formats in zip(values, per_value):
+        key = (value, value_formats)
+        if key not in results:
+            results[key] = normalize_date(value, anchor, value_formats) if isinstance(value, str) else None
+        normalized.append(results[key])
+    return normalized
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from query_planner import fold
+
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "_ga", "igshid", "amp", "outputtype",
+}
+HOST_PREFIXES = ("www.", "m.", "amp.")
+
+
+def canonicalize_url(url: str) -> str:
+    """Canonical form of an article URL used as its identity.
+
+    Forces https, drops www./m./amp. host prefixes, default ports, fragments,
+    tracking parameters and trailing slashes, maps AMP variants
+    (/amp, /amp/..., .amp.html) to the regular page and sorts the query.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"\.amp\.html$", ".html", parts.path)
+    path = re.sub(r"/amp/?$", "", path)
+    path = re.sub(r"^/amp/", "/", path)
+    path = path.rstrip("/") or "/"
+
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def simhash(text: str, bits: int = 64, shingle_size: int = 3) -> int:
+    """SimHash of the word shingles of a diacritics-folded text"""
+    words = re.findall(r"\w+", fold(text))
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)] if words else []
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    digest_size = bits // 8
+    rows = [
+        format(int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=digest_size).digest(), "big"), f"0{bits}b")
+        for shingle in shingles
+    ]
+    # bit is set when more than half of the shingle hashes have it, columns are counted in C via zip
+    fingerprint = 0
+    for position, column in enumerate(zip(*rows)):
+        if column.count("1") * 2 > len(rows):
+            fingerprint |= 1 << (bits - 1 - position)
+    return fingerprint
+
+
+class NearDuplicateIndex:
+    """SimHash index clustering near-duplicate articles.
+
+    Fingerprints are split into bands; documents sharing a band are
+    candidates and become near-duplicates when their Hamming distance is at
+    most max_distance. With max_distance below the number of bands every
+    near-duplicate shares at least one band. Each document joins the cluster
+    of its closest indexed near-duplicate; a cluster id is the id of the
+    document that started it. The index can be saved to and loaded from a JSON file.
+    """
+
+    def __init__(self, path: Optional[str] = None, bits: int = 64, bands: int = 8, max_distance: int = 7):
+        self.path = path
+        self.bits = bits
+        self.bands = bands
+        self.band_bits = bits // bands
+        self.max_distance = max_distance
+        self.fingerprints: Dict[str, int] = {}
+        self.clusters: Dict[str, str] = {}
+        self.buckets: Dict[tuple, List[str]] = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def _band_keys(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self.band_bits) & mask
+
+    def find(self, fingerprint: int) -> Optional[str]:
+        """Id of the closest indexed near-duplicate, None if there is none"""
+        best, best_distance = None, self.max_distance + 1
+        for key in self._band_keys(fingerprint):
+            for doc_id in self.buckets.get(key, ()):
+                distance = bin(fingerprint ^ self.fingerprints[doc_id]).count("1")
+                if distance < best_distance:
+                    best, best_distance = doc_id, distance
+        return best
+
+    def add(self, doc_id: str, text: str) -> str:
+        """Index a document and return its cluster id"""
+        if doc_id in self.clusters:
+            return self.clusters[doc_id]
+        fingerprint = simhash(text, self.bits)
+        match = self.find(fingerprint)
+        cluster = self.clusters[match] if match is not None else doc_id
+        self._insert(doc_id, fingerprint, cluster)
+        return cluster
+
+    def _insert(self, doc_id: str, fingerprint: int, cluster: str):
+        self.fingerprints[doc_id] = fingerprint
+        self.clusters[doc_id] = cluster
+        for key in self._band_keys(fingerprint):
+            self.buckets.setdefault(key, []).append(doc_id)
+
+    def save(self, path: str = None):
+        path = path or self.path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {doc_id: [self.fingerprints[doc_id], cluster] for doc_id, cluster in self.clusters.items()},
+                f,
+            )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str = None):
+        with open(path or self.path, "r", encoding="utf-8") as f:
+            for doc_id, (fingerprint, cluster) in json.load(f).items():
+                self._insert(doc_id, fingerprint, cluster)
@@ -0,0 +1,323 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from get_web_links import SeleniumNewsScraper
+from result_writer import export_json, iter_jsonl
+from source_health import CircuitOpenError, PROBE_RETRY
+from text_pipeline import CsvTextWriter
+from work_queue import open_queue
+
+CRAWL_QUEUE = "crawl"
+TEXT_QUEUE = "text"
+
+# retry delays of failed jobs on a worker, doubled per attempt
+RETRY_BACKOFF = 5.0
+MAX_RETRY_BACKOFF = 300.0
+
+
+def crawl_payload(job: Dict, crawl_started_at: datetime) -> Dict:
+    """The JSON part of a crawl job; the source config is looked up again by the worker.
+
+    crawl_started_at is the coordinator's anchor for relative dates ("acum 2 ore").
+    """
+    window = job.get("window")
+    return {
+        "source_name": job["source_name"],
+        "query": job["query"],
+        "planned": job["planned"],
+        "page": job.get("page", 1),
+        "window": [window[0].isoformat(), window[1].isoformat()] if window is not None else None,
+        "crawl_started_at": crawl_started_at.isoformat(),
+    }
+
+
+def crawl_job(scraper: SeleniumNewsScraper, payload: Dict) -> Dict:
+    """Rebuild a crawl job from its payload with the worker's own source registry and the run's date anchor"""
+    if payload.get("crawl_started_at"):
+        scraper.crawl_started_at = datetime.fromisoformat(payload["crawl_started_at"])
+    config = scraper.sources[payload["source_name"]]
+    window = payload.get("window")
+    return {
+        "query": payload["query"],
+        "planned": payload["planned"],
+        "source_name": payload["source_name"],
+        "config": config,
+        "host": urlparse(config["url"]).netloc,
+        "page": payload.get("page", 1),
+        "window": (date.fromisoformat(window[0]), date.fromisoformat(window[1])) if window else None,
+    }
+
+
+def enqueue_crawl(scraper: SeleniumNewsScraper, queue, source_names: List[str] = None, resume: bool = False) -> int:
+    """Put the pending crawl jobs on the queue, each host limited to its source's max_in_flight
+    and paced by its min_interval and jitter across all workers"""
+    added = 0
+    for job in scraper.pending_jobs(source_names, resume):
+        added += queue.put(
+            CRAWL_QUEUE,
+            scraper.job_key(job),
+            crawl_payload(job, scraper.crawl_started_at),
+            host=job["host"],
+            host_limit=job["config"].get("max_in_flight", 2),
+            host_interval=job["config"].get("min_interval", 1.0),
+            host_jitter=job["config"].get("jitter", 1.0),
+        )
+    return added
+
+
+def enqueue_texts(scraper: SeleniumNewsScraper, queue, records: Iterable[Dict]) -> int:
+    """Put text extraction jobs for link records on the queue, once per canonical URL"""
+    added = 0
+    for record in records:
+        added += queue.put(TEXT_QUEUE, scraper.text_key(record), record)
+    return added
+
+
+def coordinate(
+    scraper: SeleniumNewsScraper,
+    queue,
+    stages: Iterable[str] = (CRAWL_QUEUE, TEXT_QUEUE),
+    output_file: str = "selenium_news_results.json",
+    stream_file: str = "selenium_news_results.jsonl",
+    texts_file: str = "texts.csv",
+    source_names: List[str] = None,
+    resume: bool = False,
+    poll_interval: float = 2.0,
+):
+    """Enqueue the jobs of a run and merge what the workers send back.
+
+    The coordinator owns every output: the JSONL stream and JSON export, the
+    article store, the job ledger, the near-duplicate index and the texts CSV,
+    so workers only need the source registry. With both stages, every article
+    a crawl job returns is queued for text extraction right away. Runs until
+    all queued jobs are done or dead; start workers with run_worker().
+    """
+    stages = set(stages)
+    logger = scraper.logger
+    scraper.crawl_started_at = datetime.now()
+    if not resume:
+        queue.clear(CRAWL_QUEUE)
+        queue.clear(TEXT_QUEUE)
+
+    writer = None
+    run_id = None
+    csv_writer = None
+    if CRAWL_QUEUE in stages:
+        writer = scraper.open_result_writer(stream_file, output_file, resume or scraper.incremental)
+        run_id = scraper.article_store.start_run() if scraper.article_store is not None else None
+        logger.info(f"queued {enqueue_crawl(scraper, queue, source_names, resume)} crawl jobs")
+    if TEXT_QUEUE in stages:
+        csv_writer = CsvTextWriter(texts_file, append=resume)
+        records = iter_jsonl(stream_file) if CRAWL_QUEUE not in stages else []
+        logger.info(f"queued {enqueue_texts(scraper, queue, scraper.pending_texts(records, resume))} text jobs")
+    if scraper.metrics_file:
+        scraper.metrics.start_snapshots(scraper.metrics_file, scraper.metrics_interval)
+
+    def merge_crawl() -> int:
+        results = queue.pop_results(CRAWL_QUEUE)
+        for record in results:
+            job = crawl_job(scraper, record["payload"])
+            if record["error"] is not None:
+                logger.error(f"crawl job {record['key']} failed: {record['error']}")
+                if scraper.job_ledger is not None:
+                    scraper.job_ledger.fail(record["key"], "crawl", record["error"])
+                continue
+            articles = record["result"] or []
+            scraper.metrics.inc("articles", len(articles), source=job["source_name"], query=job["query"])
+            scraper.record_articles(job, articles, writer, run_id)
+            if job["config"].get("max_pages", 1) > 1:
+                discard_later_pages(job, articles)
+            if TEXT_QUEUE in stages:
+                enqueue_texts(scraper, queue, articles)
+        return len(results)
+
+    def discard_later_pages(job: Dict, articles: List[Dict]):
+        # a worker only sees its own pages, so the early stop of a search is decided here
+        scraper.track_page(job, articles)
+        for page_nr in range(job["page"] + 1, job["config"]["max_pages"] + 1):
+            later = dict(job, page=page_nr)
+            if scraper.page_tracker.is_exhausted(later) and queue.discard(CRAWL_QUEUE, scraper.job_key(later)):
+                scraper.mark_job_done(later, [])
+
+    def merge_texts() -> int:
+        results = queue.pop_results(TEXT_QUEUE)
+        for record in results:
+            if record["error"] is not None:
+                logger.warning(f"text job {record['key']} failed: {record['error']}")
+                scraper.text_failed(record["payload"]["url"])
+                continue
+            scraper.record_text(record["result"], csv_writer)
+        return len(results)
+
+    def unfinished(name: str) -> int:
+        counts = queue.counts(name)
+        return counts["pending"] + counts["leased"] + counts["results"]
+
+    try:
+        while True:
+            merged = 0
+            if CRAWL_QUEUE in stages:
+                merged += merge_crawl()
+            if TEXT_QUEUE in stages:
+                merged += merge_texts()
+            if not merged:
+                if not any(unfinished(name) for name in stages):
+                    break
+                time.sleep(poll_interval)
+    finally:
+        if writer is not None:
+            writer.close()
+        if run_id is not None:
+            scraper.article_store.finish_run(run_id)
+        if csv_writer is not None:
+            csv_writer.close()
+            scraper.near_duplicates.save()
+
+    for name in sorted(stages):
+        logger.info(f"{name} queue: {queue.counts(name)}")
+    scraper.report_metrics()
+    if writer is not None:
+        logger.info(f"run added {writer.written} new articles to {stream_file}")
+        export_json(stream_file, output_file)
+    scraper.cleanup()
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_BACKOFF * 2 ** max(attempts - 1, 0), MAX_RETRY_BACKOFF)
+
+
+def run_crawl_task(scraper: SeleniumNewsScraper, queue, task):
+    job = crawl_job(scraper, task.payload)
+    # the queue paces the host across all workers, see enqueue_crawl
+    health = scraper.source_health.get(job["source_name"])
+    try:
+        articles = scraper.run_job(job)
+    except CircuitOpenError:
+        # refused before any request, back on the queue without spending an attempt
+        queue.defer(task, delay=max(health.retry_after(), PROBE_RETRY) if health is not None else PROBE_RETRY)
+        return
+    except Exception as e:
+        scraper.logger.warning(f"{task.key} failed on attempt {task.attempts}: {str(e)}")
+        queue.nack(task, str(e), delay=retry_delay(task.attempts))
+        return
+    queue.ack(task, articles)
+
+
+def run_text_task(scraper: SeleniumNewsScraper, queue, task):
+    result = scraper.get_text(task.payload)
+    if not result:
+        queue.nack(task, "download or parse failed", delay=retry_delay(task.attempts))
+        return
+    result["date"] = [value.isoformat() if isinstance(value, datetime) else value for value in result["date"]]
+    queue.ack(task, result)
+
+
+def run_worker(
+    scraper: SeleniumNewsScraper,
+    queue,
+    stages: Iterable[str] = (CRAWL_QUEUE, TEXT_QUEUE),
+    threads: int = None,
+    idle_exit: Optional[float] = 60.0,
+    poll_interval: float = 1.0,
+    worker_id: str = None,
+):
+    """Lease, run and ack jobs until the queues stayed empty for idle_exit seconds (None: forever).
+
+    Each of the threads loops on its own lease, crawl jobs before text jobs.
+    Start any number of workers on any number of machines against the same
+    queue; the per-host leasing limit and pacing keep each source within its
+    max_in_flight and min_interval overall.
+    """
+    stages = [name for name in (CRAWL_QUEUE, TEXT_QUEUE) if name in stages]
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    threads = threads or scraper.max_concurrency
+    handlers = {CRAWL_QUEUE: run_crawl_task, TEXT_QUEUE: run_text_task}
+    done = {"tasks": 0}
+    lock = threading.Lock()
+
+    def loop(n: int):
+        owner = f"{worker_id}-{n}"
+        idle_since = None
+        while True:
+            task = None
+            for name in stages:
+                task = queue.lease(name, owner)
+                if task is not None:
+                    break
+            if task is None:
+                idle_since = idle_since or time.monotonic()
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    return
+                time.sleep(poll_interval)
+                continue
+            idle_since = None
+            try:
+                handlers[task.queue](scraper, queue, task)
+            except Exception as e:
+                scraper.logger.error(f"Error running {task.key}: {str(e)}")
+                queue.nack(task, str(e), delay=retry_delay(task.attempts))
+            with lock:
+                done["tasks"] += 1
+
+    scraper.logger.info(f"worker {worker_id} started with {threads} threads on {', '.join(stages)}")
+    if CRAWL_QUEUE in stages:
+        scraper.prewarm_browsers()
+    try:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(loop, n) for n in range(threads)]:
+                future.result()
+    finally:
+        scraper.logger.info(f"worker {worker_id} ran {done['tasks']} jobs")
+        scraper.report_metrics()
+        scraper.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the crawl and text stages on a shared work queue")
+    parser.add_argument(
+        "--queue", default="work_queue.sqlite3", help="SQLite file, or redis://host:port/db for several machines"
+    )
+    parser.add_argument("--stage", choices=["crawl", "text", "all"], default="all")
+    parser.add_argument("--lease", type=float, default=600.0, help="seconds a worker may hold a job")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = commands.add_parser("coordinator", help="queue the jobs and merge the results")
+    coordinator_parser.add_argument("--resume", action="store_true", help="keep the queue and skip finished jobs")
+    coordinator_parser.add_argument("--source", action="append", help="only crawl these sources")
+
+    worker_parser = commands.add_parser("worker", help="run queued jobs")
+    worker_parser.add_argument("--browsers", type=int, default=3)
+    worker_parser.add_argument("--tabs", type=int, default=1, help="windows driven by each browser")
+    worker_parser.add_argument("--threads", type=int, default=None, help="jobs run at once, default browsers x tabs")
+    worker_parser.add_argument("--idle-exit", type=float, default=60.0, help="exit after this many idle seconds")
+    worker_parser.add_argument("--metrics-port", type=int, default=None)
+    args = parser.parse_args()
+
+    stages = [CRAWL_QUEUE, TEXT_QUEUE] if args.stage == "all" else [args.stage]
+    queue = open_queue(args.queue, lease_seconds=args.lease)
+    try:
+        if args.command == "coordinator":
+            scraper = SeleniumNewsScraper(headless=True)
+            coordinate(scraper, queue, stages, source_names=args.source, resume=args.resume)
+        else:
+            # workers keep no outputs of their own, the coordinator merges everything
+            scraper = SeleniumNewsScraper(
+                headless=True,
+                num_browsers=args.browsers,
+                tabs_per_browser=args.tabs,
+                max_concurrency=args.threads,
+                store_file=None,
+                ledger_file=None,
+                metrics_file=None,
+                metrics_port=args.metrics_port,
+            )
+            run_worker(scraper, queue, stages, threads=args.threads, idle_exit=args.idle_exit)
+    finally:
+        queue.close()
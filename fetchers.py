@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:132.0) Gecko/20100101 Firefox/132.0',
+    'Accept-Language': 'ro-RO,ro;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+
+class HttpFetcher:
+    """Plain HTTP fetcher backed by a pooled keep-alive session"""
+
+    def __init__(self, headers: Dict[str, str] = None, pool_size: int = 10, timeout: int = 15, cache=None):
+        self.timeout = timeout
+        # optional PageCache, read through on every fetch
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+
+        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url: str, ttl: Optional[float] = None) -> Dict:
+        """Fetch a page, returns a dict with url, status and html.
+
+        With a cache, entries younger than ttl seconds are served directly
+        (ttl=None never expires) and stale ones are revalidated with
+        If-None-Match / If-Modified-Since.
+        """
+        if self.cache is None:
+            return self._get(url)
+
+        cached = self.cache.get(url)
+        if cached is not None and self.cache.is_fresh(cached, ttl):
+            self.cache.record_hit()
+            return {"url": cached["url"], "status": cached["status"], "html": cached["html"], "from_cache": True}
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        page = self._get(url, headers)
+        if page["status"] == 304 and cached is not None:
+            self.cache.touch(url)
+            self.cache.record_revalidated()
+            return {"url": cached["url"], "status": cached["status"], "html": cached["html"], "from_cache": True}
+
+        self.cache.record_miss()
+        if page["status"] == 200:
+            self.cache.put(
+                url, page["html"], page["status"], page["etag"], page["last_modified"], final_url=page["url"]
+            )
+        return page
+
+    def _get(self, url: str, headers: Dict[str, str] = None) -> Dict:
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        return {
+            "url": response.url,
+            "status": response.status_code,
+            "html": response.text,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "from_cache": False,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class SourceProfiles:
+    """Per-source fetch hints learned during crawling and persisted between runs.
+
+    needs_js is None while undecided, True once a browser found articles the
+    plain HTTP response did not contain, False once HTTP alone was enough.
+    """
+
+    def __init__(self, path: str = "source_profiles.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.profiles = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.profiles = json.load(f)
+
+    def needs_js(self, source_name: str) -> Optional[bool]:
+        with self.lock:
+            return self.profiles.get(source_name, {}).get("needs_js")
+
+    def set_needs_js(self, source_name: str, value: bool):
+        with self.lock:
+            profile = self.profiles.setdefault(source_name, {})
+            if profile.get("needs_js") == value:
+                return
+            profile["needs_js"] = value
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.profiles, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -1,5 +1,3 @@
-import csv
-import re
 from lib2to3.fixes.fix_input import context
 
 from selenium import webdriver
@@ -8,77 +6,178 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, InvalidSelectorException
-from datetime import datetime, timedelta
+from datetime import datetime
 
 # import pandas as pd
 import json
+import os
 import time
 import random
-from typing import List, Dict
+from collections import Counter
+from typing import List, Dict, Iterable, Optional
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from queue import Queue
-from newspaper import Article
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, quote
+
+import page_snapshot
+import date_normalizer
+from fetchers import HttpFetcher, SourceProfiles
+from crawl_scheduler import CrawlScheduler, HostBudget, RetryLater
+from browser_pool import BrowserPool
+from tab_pool import TabPool, TAB_PREFERENCES
+from query_planner import plan_queries
+from company_matcher import CompanyMatcher
+from dedup import canonicalize_url, NearDuplicateIndex
+from page_cache import PageCache
+from result_writer import JsonlResultWriter, export_json, export_parquet, iter_jsonl
+from text_pipeline import TextPipeline, CsvTextWriter
+from article_parser import parse_article
+from article_store import ArticleStore
+from job_ledger import JobLedger
+from source_health import SourceHealth, CircuitOpenError
+from metrics import Metrics, sample_debug
+from source_registry import Selector, load_sources, selectors_for
+from pagination import PageTracker, build_search_url, date_windows, window_label
+
+# Scrolls to the bottom and resolves as soon as new article nodes appear, or when the
+# page has had no DOM mutations and no pending fetch/XHR for quietMs, or after timeoutMs.
+SCROLL_AND_WAIT_SCRIPT = """
+var articleXPath = arguments[0], quietMs = arguments[1], timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+
+if (!window.__scraperPending) {
+    window.__scraperPending = {count: 0};
+    var originalFetch = window.fetch;
+    if (originalFetch) {
+        window.fetch = function() {
+            window.__scraperPending.count++;
+            return originalFetch.apply(this, arguments).finally(function() {
+                window.__scraperPending.count--;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        window.__scraperPending.count++;
+        this.addEventListener("loadend", function() { window.__scraperPending.count--; });
+        return originalSend.apply(this, arguments);
+    };
+}
+
+function countArticles() {
+    return document.evaluate(
+        "count(" + articleXPath + ")", document, null, XPathResult.NUMBER_TYPE, null
+    ).numberValue;
+}
+
+var before = countArticles();
+var finished = false, quietTimer = null, hardTimer = null, observer = null;
+
+function finish(reason) {
+    if (finished) return;
+    finished = true;
+    if (observer) observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(hardTimer);
+    done({count: countArticles(), reason: reason});
+}
+
+function armQuietTimer() {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(function() {
+        if (window.__scraperPending.count > 0) armQuietTimer();
+        else finish("quiet");
+    }, quietMs);
+}
+
+observer = new MutationObserver(function() {
+    if (countArticles() > before) finish("articles");
+    else armQuietTimer();
+});
+observer.observe(document.body, {childList: true, subtree: true});
+hardTimer = setTimeout(function() { finish("timeout"); }, timeoutMs);
+armQuietTimer();
+window.scrollTo(0, document.body.scrollHeight);
+"""
+
+# Search result pages change daily, article pages practically never.
+# Sources can override these with "cache_ttl" / "article_cache_ttl" (seconds, None = forever).
+SEARCH_CACHE_TTL = 6 * 3600
+ARTICLE_CACHE_TTL = None
+
+# share of per-article extraction events logged at debug level
+DEBUG_SAMPLE_RATE = 0.01
+
+# scrape_source_http result for a 200 response without article hits
+NEEDS_RENDERING = object()
 
 class SeleniumNewsScraper:
-    def __init__(self, headless: bool = True, num_browsers: int = 3):
+    def __init__(
+        self,
+        headless: bool = True,
+        num_browsers: int = 3,
+        extraction_mode: str = "snapshot",
+        fetch_mode: str = "auto",
+        profiles_file: str = "source_profiles.json",
+        max_concurrency: int = None,
+        cache_file: str = "page_cache.sqlite3",
+        incremental: bool = False,
+        browser_max_pages: int = 50,
+        browser_max_rss_mb: float = 1500,
+        near_duplicates_file: str = "near_duplicates.json",
+        store_file: str = "articles.sqlite3",
+        ledger_file: str = "job_ledger.sqlite3",
+        max_attempts: int = 3,
+        metrics_file: str = "metrics.json",
+        metrics_interval: float = 30.0,
+        metrics_port: int = None,
+        sources_file: str = "sources.toml",
+        tabs_per_browser: int = 1,
+    ):
         self.headless = headless
         self.num_browsers = num_browsers
-        self.browser_pool = Queue()
+        # with more than one tab per browser, num_browsers Firefox processes each drive
+        # this many windows, one job per window (snapshot extraction only)
+        self.tabs_per_browser = tabs_per_browser
+        # pooled browsers are recycled after this many pages or this much memory (needs psutil)
+        self.browser_max_pages = browser_max_pages
+        self.browser_max_rss_mb = browser_max_rss_mb
+        # global cap on running crawl jobs, per host limits live in each source config
+        self.max_concurrency = max_concurrency or num_browsers * tabs_per_browser
+        # "snapshot" parses page_source once locally, "live" queries every field through WebDriver.
+        # A source can override this with an "extraction" key in its config.
+        self.extraction_mode = extraction_mode
+        # "auto" tries plain HTTP first and learns per source whether a browser is needed,
+        # "http" and "browser" force one engine. "needs_js" in a source config skips the probe.
+        self.fetch_mode = fetch_mode
+        self.page_cache = PageCache(cache_file) if cache_file else None
+        self.http_fetcher = HttpFetcher(pool_size=max(num_browsers * 2, 10), cache=self.page_cache)
+        self.source_profiles = SourceProfiles(profiles_file)
+        # Incremental mode stops scrolling once "known_stop_after" consecutive known URLs
+        # show up on a page and only merges new articles into the previous output
+        self.incremental = incremental
+        self.known_urls = set()
+        # SimHash clusters of extracted texts, kept between runs
+        self.near_duplicates = NearDuplicateIndex(near_duplicates_file)
+        # articles, texts and company links of every run, queryable with ArticleStore.query_articles
+        self.article_store = ArticleStore(store_file) if store_file else None
+        # state of every crawl and text job, lets an interrupted run continue with resume=True
+        self.job_ledger = JobLedger(ledger_file, max_attempts=max_attempts) if ledger_file else None
         self.setup_logging()
+        # per-stage timings and counters, snapshotted to metrics_file and optionally served for Prometheus
+        self.metrics = Metrics(self.logger)
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        if metrics_port:
+            self.metrics.serve(metrics_port)
+        # anchor for relative dates such as "acum 2 ore", reset at the start of every crawl
+        self.crawl_started_at = datetime.now()
+        # early stop of paginated searches, reset at the start of every crawl
+        self.page_tracker = PageTracker()
 
-        # Configure news sources with their search patterns
-        def plus_format(elems: list[str]) -> str:
-            return "+".join(elems)
-
-        self.sources = {
-            # "digi24": {
-            #     "url": "https://www.digi24.ro",
-            #     "search_url": "https://www.digi24.ro/cautare?q={query}",
-            #     "format_method": plus_format,
-            #     "article_pattern": "//article[contains(@class, 'article-alt')]",
-            #     "title_pattern": ".//h2[@class='h4 article-title']/a",
-            #     "date_pattern": ".//span[@class='article-date']",
-            #     "link_pattern": ".//h2[@class='h4 article-title']/a",
-            #     "exclude_pattern": "",
-            # },
-               "antena3": {
-                   "url": "https://www.antena3.ro",
-                   "search_url": "https://www.antena3.ro/cautare?q={query}",
-                   "format_method": plus_format,
-                   "article_pattern": ".//article",
-                   "title_pattern": ".//h3//a/@title",
-                   "date_pattern": ".//div[@class='date']",
-                   "link_pattern": ".//h3//a/@href",
-                   "exclude_pattern": "",
-               },
-               "adevarul": {
-                    "url": "https://adevarul.ro",
-                    "search_url": "https://adevarul.ro/search?q={query}&date_start=2023-01-01&date_end=2024-12-31",
-                   "format_method": plus_format,
-                    "article_pattern": "//div[contains(@class, 'container svelte-1h5vdfy')]",
-                    "title_pattern": ".//a[contains(@class, 'title titleAndHeadings')]",
-                    "date_pattern": ".//span[contains(@class, 'date metaFont')]",
-                    "link_pattern": ".//a[contains(@class, 'title titleAndHeadings')]/@href",
-                    "exclude_pattern": ".//div[contains(@class, 'advert')]"
-               },
-            #    "pro_tv": {
-            #        "url": "https://stirileprotv.ro",
-            #        "search_url": "https://adevarul.ro/cautare/{query}",
-            #        "article_pattern": "//div[contains(@class, 'search-box')]",
-            #        "title_pattern": ".//h2",
-            #        "date_pattern": ".//div[contains(@class, 'article-date')]",
-            #        "link_pattern": ".//a/@href",
-            #    },
-            #    "realitatea": {
-            #        "url": "https://www.realitatea.net",
-            #        "search_url": "https://www.realitatea.net/{query}?page={page_nr}&search-input={query}",
-            #        "article_pattern": "//div[contains(@class, 'search-box')]",
-            #        "title_pattern": ".//h2",
-            #        "date_pattern": ".//div[contains(@class, 'article-date')]",
-            #        "link_pattern": ".//a/@href",
-            #    },
-        }
+        # News sources with their search patterns, see sources.toml
+        self.sources = load_sources(sources_file)
 
         self.companies = {
             "AXPO": ["AXPO", "AXPO Energy Romania"],
@@ -118,81 +217,268 @@ class SeleniumNewsScraper:
             "TINMAR": ["TINMAR", "Tinmar Energy"],
             "VEOLIA": ["VEOLIA", "Veolia Energie Romania"]
         }
+        self.company_matcher = CompanyMatcher(
+            self.companies,
+            # aliases that are also common words, only matched in capitals
+            case_sensitive=["MET", "NEXT", "NOVA", "PREMIER", "DEER", "DEO", "CEO"],
+            # "CEO" is mostly the job title, it counts with Complexul Energetic Oltenia named in the same text
+            job_titles=["CEO"],
+            needs_context=["CEO"],
+        )
+        # rolling latency/error stats per source, driving its adaptive rate and circuit breaker.
+        # A source can tune them with a "health" dict of SourceHealth arguments.
+        self.source_health = {
+            name: SourceHealth(name, **config.get("health", {})) for name, config in self.sources.items()
+        }
 
         self.initialize_browser_pool()
 
-    def scrape_source(self, source_name: str, config: dict, query: str) -> List[Dict]:
-        """Scrape a specific news source"""
-        browser = self.get_browser()
-        articles = []
+    def build_search_url(self, config: dict, query: str, page_nr: int = 1, window=None) -> str:
+        """See pagination.build_search_url"""
+        return build_search_url(config, query, page_nr, window)
 
-        self.logger.info("got to scrape_source")
+    def scrape_source(
+        self,
+        source_name: str,
+        config: dict,
+        query: str,
+        delay: bool = True,
+        raise_errors: bool = False,
+        page_nr: int = 1,
+        window=None,
+    ) -> List[Dict]:
+        """Scrape one results page of a news source, over plain HTTP when the source allows it.
+
+        With raise_errors a page that could not be loaded raises instead of
+        counting as a search without results, so the job can be retried.
+        """
+        sample_debug(self.logger, DEBUG_SAMPLE_RATE, "scrape_source %s %s", source_name, query)
+        health = self.source_health.get(source_name)
+        if health is not None and not health.allow():
+            self.logger.warning(f"circuit open for {source_name}, skipping {query}")
+            if raise_errors:
+                raise CircuitOpenError(f"circuit open for {source_name}")
+            return []
+
+        # outcome flags are set by the engines and recorded in the source health
+        outcome = {"error": False, "timeout": False, "throttled": False}
+        started = time.monotonic()
         try:
-            query_elems = query.split(" ")
-            if len(query_elems) == 1:
-                search_url = config["search_url"].format(query=query_elems.pop())
-            elif len(query_elems) > 1:
-                formatted_query = config["format_method"](query_elems)
-                search_url = config["search_url"].format(query=formatted_query)
+            try:
+                search_url = self.build_search_url(config, query, page_nr, window)
+            except Exception as e:
+                self.logger.error(f"Error scraping {source_name}: {str(e)}")
+                outcome["error"] = True
+                if raise_errors:
+                    raise
+                return []
             print(search_url)
-            if not self.safe_get(browser, search_url):
-                return articles
 
-            # Wait for articles to load
-            try:
-                WebDriverWait(browser, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, config["article_pattern"])
-                    )
-                )
-            except TimeoutException:
-                self.logger.warning(f"Timeout waiting for articles on {source_name}")
-                return articles
+            http_result = None
+            if self.use_http(source_name, config):
+                http_result = self.scrape_source_http(source_name, config, search_url, outcome)
+                if isinstance(http_result, list):
+                    return http_result
+
+            articles = self.scrape_source_browser(source_name, config, search_url, delay, raise_errors, outcome)
+            if (
+                self.fetch_mode == "auto"
+                and http_result is NEEDS_RENDERING
+                and self.source_profiles.needs_js(source_name) is None
+                and articles
+            ):
+                # HTTP got the page without articles but the rendered page has them;
+                # failed or throttled requests say nothing about the source
+                self.source_profiles.set_needs_js(source_name, True)
+            return articles
+        except Exception:
+            outcome["error"] = True
+            raise
+        finally:
+            if health is not None:
+                health.record(time.monotonic() - started, **outcome)
 
-            # Scroll to load more articles if available
-            self.scroll_page(browser)
+    def use_http(self, source_name: str, config: dict) -> bool:
+        """Decide whether to try the HTTP fetcher before a browser"""
+        if self.fetch_mode == "browser" or config.get("needs_js"):
+            return False
+        if self.fetch_mode == "http":
+            return True
+        return not self.source_profiles.needs_js(source_name)
+
+    def scrape_source_http(
+        self, source_name: str, config: dict, search_url: str, outcome: dict = None
+    ) -> Optional[List[Dict]]:
+        """Scrape a search page without a browser.
 
-            # Extract articles
-            article_elements = browser.find_elements(
-                By.XPATH, config["article_pattern"]
+        Returns NEEDS_RENDERING when a 200 response has no article hits, and
+        None when the request failed (error, other status); in both cases a
+        browser has to load the page instead. Only NEEDS_RENDERING teaches
+        the source's needs_js. A 429 or 503 response is flagged as throttled
+        in outcome.
+        """
+        try:
+            with self.metrics.timer("http_fetch", source=source_name):
+                page = self.http_fetcher.fetch(search_url, ttl=config.get("cache_ttl", SEARCH_CACHE_TTL))
+        except Exception as e:
+            self.logger.error(f"Error accessing {search_url}: {str(e)}")
+            return None
+        self.metrics.inc("pages", source=source_name, engine="cache" if page["from_cache"] else "http")
+
+        if page["status"] != 200:
+            self.logger.warning(f"HTTP {page['status']} for {search_url}")
+            if page["status"] in (429, 503) and outcome is not None:
+                outcome["throttled"] = True
+            return None
+
+        if page_snapshot.count_articles(page["html"], config) == 0:
+            if self.fetch_mode == "http" or self.source_profiles.needs_js(source_name) is False:
+                # Source is known to render server side, so the query simply has no results
+                return []
+            self.logger.info(f"no articles in HTTP response for {source_name}, falling back to browser")
+            return NEEDS_RENDERING
+
+        if self.fetch_mode == "auto":
+            self.source_profiles.set_needs_js(source_name, False)
+        try:
+            with self.metrics.timer("extraction", source=source_name, mode="snapshot"):
+                raw_articles = page_snapshot.extract_articles(page["html"], config, page["url"])
+        except Exception as e:
+            self.logger.error(f"Error parsing page from {source_name}: {str(e)}")
+            return []
+        return [self.to_article(raw, source_name) for raw in raw_articles]
+
+    def scrape_source_browser(
+        self,
+        source_name: str,
+        config: dict,
+        search_url: str,
+        delay: bool = True,
+        raise_errors: bool = False,
+        outcome: dict = None,
+    ) -> List[Dict]:
+        """Scrape a search page with a pooled browser, flagging errors and timeouts in outcome"""
+        outcome = outcome if outcome is not None else {}
+        # WebElements of a tab go stale as soon as another tab runs a command
+        snapshot = config.get("extraction", self.extraction_mode) == "snapshot" or self.tabs_per_browser > 1
+        if snapshot and self.page_cache is not None:
+            cached = self.page_cache.get_fresh(
+                search_url, config.get("cache_ttl", SEARCH_CACHE_TTL), namespace="rendered"
             )
+            if cached is not None:
+                self.metrics.inc("pages", source=source_name, engine="cache")
+                return self.extract_articles_snapshot(cached["html"], source_name, config, cached["url"])
+
+        articles = []
+
+        try:
+            checkout_started = time.monotonic()
+            with self.browser_pool.lease(profile=self.resource_profile(config)) as browser:
+                self.metrics.observe("browser_checkout", time.monotonic() - checkout_started, source=source_name)
+                self.metrics.inc("pages", source=source_name, engine="browser")
+                with self.metrics.timer("page_load", source=source_name):
+                    loaded = self.safe_get(browser, search_url, delay)
+                if not loaded:
+                    outcome["error"] = True
+                    if raise_errors:
+                        raise RuntimeError(f"could not load {search_url}")
+                    return articles
 
-            self.logger.info(f"got some article elements {len(article_elements)}")
-            for element in article_elements:
+                # Wait for articles to load
                 try:
-                    title = self.extract_element_text(element, config["title_pattern"])
-                    self.logger.info(f"got title")
-                    date = self.extract_element_text(element, config["date_pattern"])
-                    self.logger.info(f"got date")
-                    link = self.extract_element_text(element, config["link_pattern"])
-                    self.logger.info(f"got link")
-                    exclude = None
-                    if (config["exclude_pattern"] != "" ):
-                        try:
-                            exclude = self.extract_element_text(element, config["exclude_pattern"])
-                        except NoSuchElementException:
-                            pass
-
-                    if title and link and exclude is None:
-                        articles.append(
-                            {
-                                "title": title,
-                                "url": link,
-                                "date": self.normalize_date(date, source_name),
-                                "source": source_name,
-                            }
+                    with self.metrics.timer("wait_for_articles", source=source_name):
+                        WebDriverWait(browser, 10).until(
+                            EC.presence_of_element_located(
+                                (By.XPATH, selectors_for(config)["article"].xpath)
+                            )
                         )
-                except Exception as e:
-                    self.logger.error(
-                        f"Error extracting article from {source_name}: {str(e)}"
-                    )
+                except TimeoutException:
+                    self.logger.warning(f"Timeout waiting for articles on {source_name}")
+                    outcome["timeout"] = True
+                    return articles
+
+                # Scroll to load more articles if available
+                stop_check = self.known_urls_stop_check(config, search_url) if self.incremental else None
+                with self.metrics.timer("scroll", source=source_name):
+                    self.scroll_page(browser, config, stop_check=stop_check)
+
+                # Extract articles
+                if snapshot:
+                    page_source = browser.page_source
+                    page_url = browser.current_url or search_url
+                    if self.page_cache is not None:
+                        self.page_cache.record_miss()
+                        self.page_cache.put(search_url, page_source, namespace="rendered", final_url=page_url)
+                    articles = self.extract_articles_snapshot(page_source, source_name, config, page_url)
+                else:
+                    with self.metrics.timer("extraction", source=source_name, mode="live"):
+                        articles = self.extract_articles_live(browser, source_name, config)
 
         except Exception as e:
             self.logger.error(f"Error scraping {source_name}: {str(e)}")
+            outcome["error"] = True
+            if raise_errors:
+                raise
 
-        finally:
-            self.return_browser(browser)
+        return articles
+
+    def to_article(self, raw: dict, source_name: str) -> Dict:
+        """Turn raw extracted fields into an output article"""
+        return {
+            "title": raw["title"],
+            "url": raw["url"],
+            "date": self.normalize_date(raw["date"], source_name),
+            "date_raw": raw["date"],
+            "source": source_name,
+        }
+
+    def extract_articles_live(self, browser, source_name: str, config: dict) -> List[Dict]:
+        """Extract articles field by field through WebDriver calls"""
+        articles = []
+        selectors = selectors_for(config)
+        article_elements = browser.find_elements(
+            By.XPATH, selectors["article"].xpath
+        )
+
+        self.logger.debug(f"{source_name}: {len(article_elements)} article elements")
+        for element in article_elements:
+            try:
+                title = self.extract_element_text(element, selectors["title"])
+                date = self.extract_element_text(element, selectors["date"])
+                link = self.extract_element_text(element, selectors["link"])
+                sample_debug(self.logger, DEBUG_SAMPLE_RATE, "%s: extracted %r %r %s", source_name, title, date, link)
+                exclude = None
+                if "exclude" in selectors:
+                    try:
+                        exclude = self.extract_element_text(element, selectors["exclude"])
+                    except NoSuchElementException:
+                        pass
+
+                if title and link and exclude is None:
+                    articles.append(
+                        self.to_article({"title": title, "url": link, "date": date}, source_name)
+                    )
+            except Exception as e:
+                self.logger.error(
+                    f"Error extracting article from {source_name}: {str(e)}"
+                )
+
+        return articles
+
+    def extract_articles_snapshot(self, page_source: str, source_name: str, config: dict, page_url: str = None) -> List[Dict]:
+        """Extract articles from a single page_source snapshot parsed locally"""
+        articles = []
+        try:
+            with self.metrics.timer("extraction", source=source_name, mode="snapshot"):
+                raw_articles = page_snapshot.extract_articles(page_source, config, page_url)
+        except Exception as e:
+            self.logger.error(f"Error parsing snapshot from {source_name}: {str(e)}")
+            return articles
 
+        self.logger.debug(f"{source_name}: {len(raw_articles)} article elements")
+        for raw in raw_articles:
+            articles.append(self.to_article(raw, source_name))
+            sample_debug(self.logger, DEBUG_SAMPLE_RATE, "%s: extracted %s", source_name, raw)
         return articles
 
     def setup_logging(self):
@@ -204,256 +490,651 @@ class SeleniumNewsScraper:
         self.logger = logging.getLogger(__name__)
 
     def initialize_browser_pool(self):
-        """Initialize pool of browser instances"""
-        for _ in range(self.num_browsers):
-            options = webdriver.FirefoxOptions()
-            if self.headless:
-                options.add_argument("--headless")
-
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--window-size=1920x1080")
-            options.add_argument("--lang=ro-RO")
-            options.set_preference("network.cookie.cookieBehavior", 2)
-
-            # Use undetected-chromedriver to avoid detection
-            driver = webdriver.Firefox(options)
-            driver.set_page_load_timeout(30)
-            self.browser_pool.put(driver)
+        """Initialize the pool of browser instances (or browser tabs), browsers start lazily on first use"""
+        if self.tabs_per_browser > 1:
+            self.browser_pool = TabPool(
+                self.create_browser,
+                max_browsers=self.num_browsers,
+                tabs_per_browser=self.tabs_per_browser,
+                max_pages=self.browser_max_pages,
+                max_rss_mb=self.browser_max_rss_mb,
+                logger=self.logger,
+            )
+            return
+        self.browser_pool = BrowserPool(
+            self.create_browser,
+            max_size=self.num_browsers,
+            max_pages=self.browser_max_pages,
+            max_rss_mb=self.browser_max_rss_mb,
+            logger=self.logger,
+        )
+
+    def prewarm_browsers(self):
+        """Start the pooled browsers in the background, before the first browser job waits for one.
+
+        Only done when some source is loaded with a browser, for the profile most of them use.
+        """
+        profiles = Counter(
+            self.resource_profile(config)
+            for source_name, config in self.sources.items()
+            if not self.use_http(source_name, config)
+        )
+        if profiles:
+            self.browser_pool.prewarm(profile=profiles.most_common(1)[0][0])
+
+    def resource_profile(self, config: dict):
+        """Browser profile key for a source, None unless it sets "block_resources".
+
+        Blocking sources get images, web fonts and media autoplay switched
+        off, and only the hosts in "allowed_hosts" (default: the source's own
+        domain and its subdomains) are reachable, which cuts ads and trackers.
+        """
+        if not config.get("block_resources"):
+            return None
+        allowed_hosts = config.get("allowed_hosts")
+        if allowed_hosts is None:
+            host = urlparse(config["url"]).netloc
+            allowed_hosts = [host[4:] if host.startswith("www.") else host]
+        return ("blocking", tuple(sorted(allowed_hosts)))
+
+    def apply_resource_blocking(self, options, allowed_hosts):
+        """Firefox preferences for a resource blocking profile"""
+        options.set_preference("permissions.default.image", 2)
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+        options.set_preference("browser.display.use_document_fonts", 0)
+        options.set_preference("media.autoplay.default", 5)
+        options.set_preference("media.autoplay.blocking_policy", 2)
+        options.set_preference("media.preload.default", 0)
+        options.set_preference("network.prefetch-next", False)
+        options.set_preference("network.dns.disablePrefetch", True)
+
+        # Hosts outside the allowlist are sent to a closed local port through a PAC script
+        pac_script = (
+            "function FindProxyForURL(url, host) {"
+            f" var allowed = {json.dumps(list(allowed_hosts))};"
+            " for (var i = 0; i < allowed.length; i++) {"
+            "  if (host == allowed[i] || dnsDomainIs(host, '.' + allowed[i])) return 'DIRECT';"
+            " }"
+            " return 'PROXY 127.0.0.1:9';"
+            "}"
+        )
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url", "data:text/javascript," + quote(pac_script))
+        # an unreachable proxy must fail the request, not fall back to a direct connection
+        options.set_preference("network.proxy.failover_direct", False)
+
+    def create_browser(self, profile=None):
+        """Start one pooled Firefox instance for a resource_profile() key"""
+        options = webdriver.FirefoxOptions()
+        if self.headless:
+            options.add_argument("--headless")
+
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1920x1080")
+        options.add_argument("--lang=ro-RO")
+        options.set_preference("network.cookie.cookieBehavior", 2)
+        if profile is not None:
+            self.apply_resource_blocking(options, profile[1])
+        if self.tabs_per_browser > 1:
+            for name, value in TAB_PREFERENCES.items():
+                options.set_preference(name, value)
+
+        # Use undetected-chromedriver to avoid detection
+        driver = webdriver.Firefox(options)
+        driver.set_page_load_timeout(30)
+        return driver
 
     def get_browser(self):
         """Get a browser from the pool"""
-        return self.browser_pool.get()
+        return self.browser_pool.checkout()
 
     def return_browser(self, browser):
         """Return a browser to the pool"""
-        self.browser_pool.put(browser)
+        self.browser_pool.checkin(browser)
 
     def random_delay(self, min_seconds=2, max_seconds=5):
         """Add random delay between actions"""
         time.sleep(random.uniform(min_seconds, max_seconds))
 
-    def safe_get(self, browser, url: str) -> bool:
+    def safe_get(self, browser, url: str, delay: bool = True) -> bool:
         """Safely navigate to URL with error handling"""
         try:
             browser.get(url)
-            self.random_delay(1, 3)
+            if delay:
+                self.random_delay(1, 3)
             return True
         except Exception as e:
             self.logger.error(f"Error accessing {url}: {str(e)}")
             return False
 
-    def extract_element_text(self, element, xpath: str) -> str:
-        """Safely extract text from element using xpath"""
+    def extract_element_text(self, element, selector) -> str:
+        """Safely extract text from element with a precompiled Selector (or a raw pattern)"""
+        if not isinstance(selector, Selector):
+            try:
+                selector = Selector(selector)
+            except ValueError as e:
+                print(f"Invalid selector: {str(e)}")
+                return None
         try:
-            # Check if xpath ends with an attribute selector (e.g., @href, @class)
-            attribute_match = re.search(r'/@([^/\[\]]+)$', xpath)
-
-            if attribute_match:
-                # If it ends with @attribute, remove the @attribute part for finding the element
-                attribute_name = attribute_match.group(1)
-                element_xpath = xpath[:xpath.rfind('/@' + attribute_name)]
-
-                # Find element and get its attribute
-                found_element = element.find_element(By.XPATH, element_xpath)
-                # If it ends with an HTML tag, get the text content
-                if len(found_element.text.strip()) > len(found_element.get_attribute(attribute_name)) and attribute_name != "href":
-                    return found_element.text.strip()
-                else:
-                    return found_element.get_attribute(attribute_name).strip()
-            else:
-                found_element = element.find_element(By.XPATH, xpath).text
-                return found_element
-
+            return selector.extract_webdriver(element)
         except NoSuchElementException:
             # Element not found
             return None
         except InvalidSelectorException:
             # Invalid XPath syntax
-            print(f"Invalid XPath selector: {xpath}")
+            print(f"Invalid XPath selector: {selector.pattern}")
             return None
         except Exception as e:
             # Handle any other exceptions
-            print(f"Error extracting from XPath {xpath}: {str(e)}")
+            print(f"Error extracting from XPath {selector.pattern}: {str(e)}")
             return None
 
-    def scroll_page(self, browser, scroll_pause_time=2):
-        """Scroll the page to load dynamic content"""
-        last_height = browser.execute_script("return document.body.scrollHeight")
+    def scroll_page(self, browser, config: dict, stop_check=None):
+        """Scroll the page to load dynamic content.
 
-        while True:
-            browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(scroll_pause_time)
+        Every scroll waits in the browser for new article selector nodes or for
+        the page to go quiet (no DOM mutations and no pending fetch/XHR for
+        scroll_quiet_ms), instead of sleeping a fixed time. Scrolling stops
+        when a scroll brings no new articles, after max_scrolls scrolls or
+        once max_articles articles are on the page. stop_check(browser) is
+        called after every productive scroll and ends scrolling early when it
+        returns True.
+        """
+        max_scrolls = config.get("max_scrolls", 20)
+        max_articles = config.get("max_articles")
+        quiet_ms = config.get("scroll_quiet_ms", 500)
+        timeout_ms = config.get("scroll_timeout_ms", 5000)
+        browser.set_script_timeout(timeout_ms / 1000 + 5)
 
-            new_height = browser.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+        for _ in range(max_scrolls):
+            state = browser.execute_async_script(
+                SCROLL_AND_WAIT_SCRIPT, selectors_for(config)["article"].xpath, quiet_ms, timeout_ms
+            )
+            if max_articles is not None and state["count"] >= max_articles:
+                break
+            if state["reason"] != "articles":
+                break
+            if stop_check is not None and stop_check(browser):
                 break
-            last_height = new_height
 
-    def normalize_date(self, date_str: str, source: str) -> str:
-        """Normalize different date formats to ISO format"""
-        # Similar to previous implementation but with more robust handling
+    def reached_known_urls(self, urls: List[str], config: dict) -> bool:
+        """True once the page lists enough consecutive already known URLs (compared canonicalized)"""
+        threshold = config.get("known_stop_after", 5)
+        consecutive = 0
+        for url in urls:
+            if canonicalize_url(url) in self.known_urls:
+                consecutive += 1
+                if consecutive >= threshold:
+                    return True
+            else:
+                consecutive = 0
+        return False
+
+    def known_urls_stop_check(self, config: dict, page_url: str):
+        """scroll_page stop check for incremental mode"""
+        def check(browser) -> bool:
+            try:
+                raw_articles = page_snapshot.extract_articles(browser.page_source, config, page_url)
+            except Exception:
+                return False
+            return self.reached_known_urls([raw["url"] for raw in raw_articles], config)
+        return check
+
+    def normalize_date(self, date_str: str, source: str) -> Optional[str]:
+        """Normalize a scraped date to ISO format, relative dates are anchored to the crawl start.
+
+        Returns None when the value is not a recognizable date.
+        """
+        if not date_str:
+            return None
+        formats = tuple(self.sources.get(source, {}).get("date_formats", ()))
         try:
-            # Remove common Romanian text
-            date_str = date_str.lower()
-            date_str = date_str.replace("acum", "").replace("în urmă", "")
-
-            # Handle relative dates
-            if "minut" in date_str:
-                minutes = int("".join(filter(str.isdigit, date_str)))
-                return (datetime.now() - timedelta(minutes=minutes)).isoformat()
-            elif "ora" in date_str:
-                hours = int("".join(filter(str.isdigit, date_str)))
-                return (datetime.now() - timedelta(hours=hours)).isoformat()
-            elif "zi" in date_str:
-                days = int("".join(filter(str.isdigit, date_str)))
-                return (datetime.now() - timedelta(days=days)).isoformat()
-
-            # Handle absolute dates
-            # Add more specific date format handling here
-
-            return date_str
+            normalized = date_normalizer.normalize_date(date_str, self.crawl_started_at, formats)
         except Exception as e:
             self.logger.error(f"Date parsing error for {source}: {date_str} - {str(e)}")
-            return ""
+            return None
+        if normalized is None:
+            self.logger.debug(f"Unrecognized date for {source}: {date_str}")
+        return normalized
 
-    def main(self, output_file: str = "selenium_news_results.json"):
-        """Main scraping process"""
-        all_results = []
+    def iter_jobs(self, source_names: List[str] = None):
+        """Yield one crawl job per planned query, date window and results page of every source.
 
-        #   for company in self.companies:
-        #       articles = []
-        #       for query in self.companies[company]:
-        #           for source_name, config in self.sources.items():
-        #               articles.append(self.scrape_source(source_name, config, query))
-        #     all_results.extend(articles)
-        with ThreadPoolExecutor(max_workers=self.num_browsers) as executor:
-            futures = []
-
-            for company in self.companies:
-                for query in self.companies[company]:
-                    for source_name, config in self.sources.items():
-                        futures.append(
-                            executor.submit(
-                                self.scrape_source, source_name, config, query
-                            )
-                        )
+        The query planner collapses company aliases a source's search already
+        covers, see query_planner.plan_queries. Pages of a search follow each
+        other, so the host's consumers fetch them side by side.
+        """
+        for source_name, config in self.sources.items():
+            if source_names is not None and source_name not in source_names:
+                continue
+            windows = date_windows(config, self.crawl_started_at.date())
+            for planned in plan_queries(self.companies, config):
+                for window in windows:
+                    for page_nr in range(1, config.get("max_pages", 1) + 1):
+                        yield {
+                            "query": planned["query"],
+                            "planned": planned,
+                            "source_name": source_name,
+                            "config": config,
+                            "host": urlparse(config["url"]).netloc,
+                            "page": page_nr,
+                            "window": window,
+                        }
 
-            for future in futures:
-                try:
-                    articles = future.result()
-                    all_results.extend(articles)
-                except Exception as e:
-                    self.logger.error(f"Error processing future: {str(e)}")
+    def build_scheduler(self) -> CrawlScheduler:
+        """Scheduler with the politeness budgets declared in self.sources and the adaptive source limiters"""
+        host_budgets = {}
+        limiters = {}
+        for source_name, config in self.sources.items():
+            host = urlparse(config["url"]).netloc
+            host_budgets[host] = HostBudget(
+                max_in_flight=config.get("max_in_flight", 2),
+                min_interval=config.get("min_interval", 1.0),
+                jitter=config.get("jitter", 1.0),
+            )
+            limiters[host] = self.source_health[source_name]
+        return CrawlScheduler(max_concurrency=self.max_concurrency, host_budgets=host_budgets, limiters=limiters)
+
+    def run_job(self, job: dict, delay: bool = False) -> List[Dict]:
+        """Scrape one job and tag its articles with the companies named in their titles.
+
+        Articles whose title names no company keep the companies the query
+        was issued for. Used as the scheduler worker, where pacing is handled
+        by the scheduler so there is no blocking delay by default.
+        """
+        if self.page_tracker.is_exhausted(job):
+            return []
+        labels = {"source": job["source_name"], "query": job["query"]}
+        with self.metrics.trace(self.job_key(job)):
+            try:
+                with self.metrics.timer("job", source=job["source_name"]):
+                    articles = self.scrape_source(
+                        job["source_name"],
+                        job["config"],
+                        job["query"],
+                        delay=delay,
+                        raise_errors=True,
+                        page_nr=job.get("page", 1),
+                        window=job.get("window"),
+                    )
+            except Exception:
+                self.metrics.inc("jobs", status="error", **labels)
+                raise
+        self.metrics.inc("jobs", status="ok", **labels)
+        self.metrics.inc("articles", len(articles), **labels)
+        if job["config"].get("max_pages", 1) > 1:
+            self.track_page(job, articles)
+        for article in articles:
+            article["query"] = job["query"]
+            article["companies"] = (
+                self.company_matcher.companies(article["title"]) or list(job["planned"]["owners"])
+            )
+        return articles
+
+    def track_page(self, job: dict, articles: List[Dict]):
+        """Stop a paginated search at a page without new articles, or at known ones in incremental mode"""
+        urls = [article["url"] for article in articles]
+        if self.page_tracker.record(job, urls):
+            self.logger.info(f"{self.job_key(job)}: no new articles, skipping later pages")
+        elif self.incremental and self.reached_known_urls(urls, job["config"]):
+            self.page_tracker.stop(job)
+
+    def skip_exhausted_page(self, job: dict) -> bool:
+        """Scheduler skip hook, pages after the end of their search are recorded as done without a request"""
+        if not self.page_tracker.is_exhausted(job):
+            return False
+        self.mark_job_done(job, [])
+        return True
+
+    def job_key(self, job: dict) -> str:
+        parts = [job["source_name"], job["query"]]
+        if job.get("window") is not None:
+            parts.append(window_label(job["window"]))
+        if job.get("page", 1) > 1:
+            parts.append(f"p{job['page']}")
+        return JobLedger.job_key("crawl", *parts)
+
+    def run_ledger_job(self, job: dict, delay: bool = False) -> List[Dict]:
+        """run_job with the attempt recorded in the job ledger.
+
+        A failed attempt with attempts left raises RetryLater with the
+        ledger's backoff, so the scheduler runs the job again later instead of
+        a worker thread sleeping on it. The job is only marked done by
+        mark_job_done, once its articles are written.
+        """
+        if self.job_ledger is None:
+            return self.run_job(job, delay)
+        key = self.job_key(job)
+        # attempts of this run, a resumed job gets max_attempts again
+        job["attempt"] = job.get("attempt", 0) + 1
+        self.job_ledger.start(
+            key,
+            "crawl",
+            {
+                "source": job["source_name"],
+                "query": job["query"],
+                "companies": job["planned"]["owners"],
+                "page": job.get("page", 1),
+                "window": window_label(job.get("window")),
+            },
+        )
+        try:
+            return self.run_job(job, delay)
+        except CircuitOpenError as e:
+            # refused before any request, the scheduler holds the job until the breaker lets it through
+            job["attempt"] -= 1
+            self.job_ledger.release(key, str(e))
+            raise
+        except Exception as e:
+            wait = self.job_ledger.fail(key, "crawl", str(e))
+            if job["attempt"] >= self.job_ledger.max_attempts:
+                raise
+            self.logger.warning(f"retrying {key} in {wait:.0f}s after: {str(e)}")
+            raise RetryLater(wait, e) from e
 
-        # Deduplicate results
-        unique_results = {article["url"]: article for article in all_results}.values()
+    def mark_job_done(self, job: dict, articles: List[Dict]):
+        if self.job_ledger is not None:
+            self.job_ledger.done(self.job_key(job), "crawl", len(articles))
+
+    def pending_jobs(self, source_names: List[str] = None, resume: bool = False):
+        """Crawl jobs still to run; resuming skips jobs the ledger has as done or backing off"""
+        if self.job_ledger is None:
+            yield from self.iter_jobs(source_names)
+            return
+        if not resume:
+            self.job_ledger.reset("crawl")
+        skipped = 0
+        for job in self.iter_jobs(source_names):
+            if resume and not self.job_ledger.is_due(self.job_key(job)):
+                skipped += 1
+                continue
+            yield job
+        if skipped:
+            self.logger.info(f"resume skipped {skipped} finished or backing off crawl jobs")
+
+    def record_articles(self, job: dict, articles: List[Dict], writer: JsonlResultWriter, run_id: int = None):
+        """Write the articles of a finished crawl job to the stream and the store, then mark it done"""
+        writer.write_many(articles)
+        if self.article_store is not None:
+            self.article_store.upsert_articles(articles, run_id)
+        self.mark_job_done(job, articles)
+
+    def open_result_writer(self, stream_file: str, output_file: str, resume: bool) -> JsonlResultWriter:
+        """Open the JSONL result stream, continuing the existing one when resuming"""
+        if not resume and os.path.exists(stream_file):
+            os.remove(stream_file)
+        if resume and not os.path.exists(stream_file) and os.path.exists(output_file):
+            # seed the stream from an output written before streaming existed
+            with open(output_file, "r", encoding="utf-8") as f:
+                previous_results = json.load(f)
+            with JsonlResultWriter(stream_file, key_func=lambda article: canonicalize_url(article["url"])) as seed:
+                seed.write_many(previous_results)
+        writer = JsonlResultWriter(stream_file, key_func=lambda article: canonicalize_url(article["url"]))
+        if writer.resumed:
+            self.logger.info(f"resuming {stream_file} with {writer.resumed} articles")
+        return writer
+
+    def main(
+        self,
+        output_file: str = "selenium_news_results.json",
+        stream_file: str = "selenium_news_results.jsonl",
+        resume: bool = False,
+        parquet_file: str = None,
+    ):
+        """Main scraping process.
+
+        Articles are appended to stream_file and upserted into the article
+        store as each job completes, the JSON output (and optional Parquet
+        file) is compacted from the stream at the end. With resume the jobs
+        the ledger has as done are skipped and failed ones are retried.
+        """
+        self.crawl_started_at = datetime.now()
+        self.page_tracker = PageTracker()
+        self.prewarm_browsers()
+        writer = self.open_result_writer(stream_file, output_file, resume or self.incremental)
+        if self.incremental:
+            # a snapshot: URLs this run writes must not stop later searches from scrolling
+            self.known_urls = set(writer.seen)
+        run_id = self.article_store.start_run() if self.article_store is not None else None
+        if self.metrics_file:
+            self.metrics.start_snapshots(self.metrics_file, self.metrics_interval)
+
+        def collect(job, articles, error):
+            if isinstance(error, CircuitOpenError):
+                # held past the scheduler's max_hold, the ledger keeps it due for --resume
+                self.logger.warning(f"gave up on job {self.job_key(job)}: {str(error)}")
+                return
+            if error is not None:
+                self.logger.error(f"Error processing job {job['source_name']}/{job['query']}: {str(error)}")
+                return
+            self.record_articles(job, articles, writer, run_id)
+
+        try:
+            self.build_scheduler().run(
+                self.pending_jobs(resume=resume), self.run_ledger_job, collect, skip=self.skip_exhausted_page
+            )
+        finally:
+            writer.close()
+            if self.article_store is not None:
+                self.article_store.finish_run(run_id)
+
+        self.logger.info(f"run added {writer.written} new articles to {stream_file}")
+        if self.job_ledger is not None:
+            self.logger.info(f"crawl jobs: {self.job_ledger.summary('crawl')}")
+        for health in self.source_health.values():
+            self.logger.info(health.report())
+        self.report_metrics()
         print("printing results: \n")
-        # Save results
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(list(unique_results), f, ensure_ascii=False, indent=2)
+        export_json(stream_file, output_file)
+        if parquet_file:
+            export_parquet(stream_file, parquet_file)
 
         self.cleanup()
 
-    def test_website_config_futures(self,source_name: str,output_file: str = "selenium_news_results.json"):
+    def test_website_config_futures(
+        self,
+        source_name: str,
+        output_file: str = "selenium_news_results.json",
+        stream_file: str = "selenium_news_results.jsonl",
+        resume: bool = False,
+    ):
         if source_name not in self.sources:
             exit(1)
-        all_results = []
+        self.page_tracker = PageTracker()
+        writer = self.open_result_writer(stream_file, output_file, resume or self.incremental)
+        if self.incremental:
+            self.known_urls = set(writer.seen)
+        def run_with_retries(job: dict) -> List[Dict]:
+            # no scheduler here to hand retries back to
+            while True:
+                try:
+                    return self.run_ledger_job(job, True)
+                except RetryLater as e:
+                    time.sleep(e.delay)
+
         with ThreadPoolExecutor(max_workers=self.num_browsers) as executor:
-           futures = []
-
-           for company in self.companies:
-               for query in self.companies[company]:
-                   futures.append(
-                       executor.submit(
-                           self.scrape_source, source_name,self.sources.get(source_name) , query
-                       )
+           futures = {}
+
+           for job in self.pending_jobs([source_name], resume):
+               futures[
+                   executor.submit(
+                       run_with_retries, job
                    )
+               ] = job
 
-           for future in futures:
+           for future in as_completed(futures):
                try:
                    articles = future.result()
-                   all_results.extend(articles)
+                   writer.write_many(articles)
+                   if self.article_store is not None:
+                       self.article_store.upsert_articles(articles)
+                   self.mark_job_done(futures[future], articles)
                except Exception as e:
                    self.logger.error(f"Error processing future: {str(e)}")
+        writer.close()
 
-        # Deduplicate results
-        unique_results = {article["url"]: article for article in all_results}.values()
         print("printing results: \n")
-        # Save results
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(list(unique_results), f, ensure_ascii=False, indent=2)
+        export_json(stream_file, output_file)
 
         self.cleanup()
 
-    def test_main_get_text(self, data : list[dict], executors: int = 5):
-        text_list = {}
-        start_time = datetime.now()
-        with ThreadPoolExecutor(max_workers=executors) as executor:
-            futures = []
+    def test_main_get_text(
+        self,
+        data: Iterable[dict],
+        executors: int = 5,
+        deadline: Optional[float] = 60,
+        output_file: str = "texts.csv",
+        parse_workers: int = None,
+        resume: bool = False,
+    ):
+        """Extract article texts for a stream of link records into a CSV file.
 
-            for page_dict in data:
+        data can be any iterable, e.g. iter_jsonl() over the results stream,
+        it is consumed lazily through a bounded queue. Downloads run on
+        executors threads and parsing on parse_workers processes (CPU count
+        by default); parse_workers=0 parses in the download threads instead.
 
-                if datetime.now() < start_time + timedelta(seconds=60):
-                    futures.append(
-                        executor.submit(
-                            self.get_text, page_dict
-                        )
-                    )
+        Every URL is recorded in the job ledger. With resume the CSV file is
+        appended to, URLs already extracted are skipped and failed ones are
+        retried once their backoff has passed.
+        """
+        csv_writer = CsvTextWriter(output_file, append=resume)
+        data = self.pending_texts(data, resume)
+
+        def writer(result: dict):
+            self.record_text(result, csv_writer)
+
+        if parse_workers == 0:
+            pipeline = TextPipeline(
+                self.get_text,
+                writer,
+                workers=executors,
+                queue_size=executors * 4,
+                deadline=deadline,
+                key=lambda record: canonicalize_url(record["url"]),
+                on_failed=self.text_failed,
+            )
+        else:
+            pipeline = TextPipeline(
+                self.download_text,
+                writer,
+                workers=executors,
+                queue_size=executors * 4,
+                deadline=deadline,
+                parse=parse_article,
+                parse_workers=parse_workers,
+                key=lambda record: canonicalize_url(record["url"]),
+                on_failed=self.text_failed,
+            )
+        try:
+            stats = pipeline.run(data)
+        finally:
+            csv_writer.close()
+            self.near_duplicates.save()
+        self.logger.info(f"text stage: {stats}")
+        self.report_metrics()
+        return stats
+
+    @staticmethod
+    def text_key(record: dict) -> str:
+        return JobLedger.job_key("text", canonicalize_url(record["url"]))
+
+    def pending_texts(self, data: Iterable[dict], resume: bool = False) -> Iterable[dict]:
+        """Link records still to extract; resuming skips texts the ledger has as done or backing off"""
+        if self.job_ledger is None:
+            return data
+        if not resume:
+            self.job_ledger.reset("text")
+            return data
+        return (record for record in data if self.job_ledger.is_due(self.text_key(record)))
+
+    def text_failed(self, url: str):
+        self.metrics.inc("texts", status="failed")
+        if self.job_ledger is not None:
+            self.job_ledger.fail(self.text_key({"url": url}), "text")
+
+    def record_text(self, result: dict, csv_writer: CsvTextWriter):
+        """Tag an extracted text with companies and its near-duplicate cluster, then write it everywhere"""
+        # parse time is measured in the parsing process and travels with the result
+        self.metrics.observe("text_parse", result.pop("parse_seconds", 0.0), source=result.get("source"))
+        self.metrics.inc("texts", status="ok", source=result.get("source"))
+        # company mentions are checked against the full text, in the writer thread
+        result["mentions"] = self.company_matcher.find((result["title"][0] or "") + "\n" + result["content"])
+        result["companies"] = list(dict.fromkeys(hit["company"] for hit in result["mentions"]))
+        # near-duplicates (syndicated or re-published stories) share a cluster id
+        result["cluster"] = self.near_duplicates.add(
+            canonicalize_url(result["url"]), (result["title"][0] or "") + "\n" + result["content"]
+        )
+        csv_writer(result)
+        if self.article_store is not None:
+            self.article_store.upsert_text(result)
+        if self.job_ledger is not None:
+            self.job_ledger.done(self.text_key(result), "text", 1)
+
+    def download_text(self, page_config: dict):
+        """Download the raw article page through the page cache, parsing is left to parse_article"""
+        try:
+            sample_debug(self.logger, DEBUG_SAMPLE_RATE, "download_text %s", page_config["url"])
+            config = self.sources.get(page_config.get("source"), {})
+            with self.metrics.timer("text_download", source=page_config.get("source")):
+                page = self.http_fetcher.fetch(
+                    page_config["url"], ttl=config.get("article_cache_ttl", ARTICLE_CACHE_TTL)
+                )
+            if page["status"] != 200:
+                self.logger.warning(f"HTTP {page['status']} for {page_config['url']}")
+                return ""
+            return {"page_config": page_config, "html": page["html"]}
+        except Exception as e:
+            print(e)
+            return ""
 
-        with open("texts.csv", "w", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            try:
-                for future in futures:
-                    result = future.result()
-                    text_list[result["url"]] = result["content"]
-                    print(result["url"])
-                    print("writinf")
-                    writer.writerows(text_list.items())
-            except Exception as e:
-                print(e)
-                writer.writerows(text_list.items())
-                print(result)
-                return text_list
-            finally:
-                writer.writerows(text_list.items())
-
-        return text_list
     def get_text(self, page_config: dict):
         try:
-            print(page_config)
-            article = Article(page_config["url"])
-            article.download()
-            article.parse()
-            result = {
-                "title": [article.title, page_config["title"]],
-                "content": article.text,
-                "url": page_config["url"],
-                "date": [ article.publish_date,page_config["date"]],
-            }
-
-            return result
+            page = self.download_text(page_config)
+            if not page:
+                return ""
+            return parse_article(page)
         except Exception as e:
             print(e)
             return ""
 
+    def report_metrics(self):
+        """Write the final metrics snapshot and log the p50/p95 summary by source and stage"""
+        self.metrics.stop_snapshots()
+        if self.metrics_file:
+            self.metrics.write_snapshot(self.metrics_file)
+        summary = self.metrics.summary()
+        self.logger.info("stage timings:\n" + summary)
+        print(summary)
 
     def cleanup(self):
-        """Clean up browser instances"""
-        while not self.browser_pool.empty():
-            browser = self.browser_pool.get()
-            try:
-                browser.quit()
-            except:
-                pass
+        """Clean up browser instances, HTTP connections and the page cache"""
+        self.http_fetcher.close()
+        if self.page_cache is not None:
+            self.logger.info(self.page_cache.report())
+            print(self.page_cache.report())
+        self.browser_pool.close()
 
 if __name__ == "__main__":
-    scraper = SeleniumNewsScraper(headless=True, num_browsers=6)
-    scraper.main()
-    # scraper.test_website_config_futures("adevarul")
+    parser = argparse.ArgumentParser(description="Scrape news search results and article texts")
+    parser.add_argument("--resume", action="store_true", help="skip finished jobs and retry failed ones")
+    parser.add_argument("--stage", choices=["crawl", "text", "all"], default="all")
+    parser.add_argument("--source", help="only crawl this source")
+    parser.add_argument("--browsers", type=int, default=6)
+    parser.add_argument("--tabs", type=int, default=1, help="windows driven by each browser")
+    args = parser.parse_args()
+
+    scraper = SeleniumNewsScraper(headless=True, num_browsers=args.browsers, tabs_per_browser=args.tabs)
+    if args.stage in ("crawl", "all"):
+        if args.source:
+            scraper.test_website_config_futures(args.source, resume=args.resume)
+        else:
+            scraper.main(resume=args.resume)
     print(datetime.now())
 
-    with open("selenium_news_results.json", "r", encoding="utf-8") as f:
-        content =json.load(f)
-    results = scraper.test_main_get_text(content)
\ No newline at end of file
+    if args.stage in ("text", "all"):
+        results = scraper.test_main_get_text(
+            iter_jsonl("selenium_news_results.jsonl"), deadline=None, resume=args.resume
+        )
\ No newline at end of file
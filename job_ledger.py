@@ -0,0 +1,147 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class JobLedger:
+    """Durable record of crawl and text jobs, so an interrupted run can resume.
+
+    Every job has a key (see job_key) and a stage ("crawl", "text"). The
+    ledger stores its state (running, done, failed), the number of attempts,
+    the result count and the last error. A failed job gets a next attempt
+    time with exponential backoff; is_due() is False for finished jobs and
+    for failed ones still backing off. A job left "running" by a crash is
+    due again.
+    """
+
+    def __init__(
+        self,
+        path: str = "job_ledger.sqlite3",
+        max_attempts: int = 3,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result_count INTEGER,
+                error TEXT,
+                meta TEXT,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_stage_state ON jobs (stage, state);
+            """
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def job_key(stage: str, *parts: str) -> str:
+        return ":".join((stage,) + parts)
+
+    def reset(self, stage: str):
+        """Forget every job of a stage, for a fresh (non resumed) run"""
+        with self.lock:
+            self.conn.execute("DELETE FROM jobs WHERE stage = ?", (stage,))
+            self.conn.commit()
+
+    def is_due(self, key: str) -> bool:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT state, next_attempt_at FROM jobs WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return True
+        state, next_attempt_at = row
+        if state == "done":
+            return False
+        return next_attempt_at <= time.time()
+
+    def attempts(self, key: str) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT attempts FROM jobs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def start(self, key: str, stage: str, meta: Optional[Dict] = None):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (key, stage, state, attempts, meta, updated_at) VALUES (?, ?, 'running', 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = 'running', attempts = attempts + 1, updated_at = ?",
+                (key, stage, json.dumps(meta, ensure_ascii=False) if meta else None, now, now),
+            )
+            self.conn.commit()
+
+    def done(self, key: str, stage: str, result_count: int = None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (key, stage, state, attempts, result_count, updated_at) "
+                "VALUES (?, ?, 'done', 1, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = 'done', result_count = excluded.result_count, "
+                "error = NULL, updated_at = excluded.updated_at",
+                (key, stage, result_count, time.time()),
+            )
+            self.conn.commit()
+
+    def fail(self, key: str, stage: str, error: str = None) -> float:
+        """Record a failure and return the backoff before the next attempt, in seconds"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT state, attempts FROM jobs WHERE key = ?", (key,)).fetchone()
+            # jobs that were not start()ed count the failed attempt here
+            if row is None:
+                attempts = 1
+            else:
+                attempts = row[1] if row[0] == "running" else row[1] + 1
+            delay = self.backoff(attempts)
+            self.conn.execute(
+                "INSERT INTO jobs (key, stage, state, attempts, error, next_attempt_at, updated_at) "
+                "VALUES (?, ?, 'failed', ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = 'failed', attempts = excluded.attempts, error = excluded.error, "
+                "next_attempt_at = excluded.next_attempt_at, updated_at = excluded.updated_at",
+                (key, stage, attempts, error, now + delay, now),
+            )
+            self.conn.commit()
+        return delay
+
+    def release(self, key: str, error: str = None):
+        """Give back a running job that was refused before doing any work, without counting the attempt"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET state = 'failed', attempts = MAX(attempts - 1, 0), error = ?, "
+                "next_attempt_at = ?, updated_at = ? WHERE key = ? AND state = 'running'",
+                (error, now, now, key),
+            )
+            self.conn.commit()
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential backoff, jittered between half and full, after the given number of attempts"""
+        ceiling = min(self.backoff_base * 2 ** max(attempts - 1, 0), self.max_backoff)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def summary(self, stage: str) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE stage = ? GROUP BY state", (stage,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def sample_debug(logger: logging.Logger, rate: float, message: str, *args):
+    """Log a debug event for roughly a rate share of calls, free when debug logging is off"""
+    if rate > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < rate:
+        logger.debug(message, *args)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Timing:
+    """Count, sum and a bounded reservoir of samples for one stage and label set"""
+
+    def __init__(self, reservoir_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.samples = []
+        self.reservoir_size = reservoir_size
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(seconds)
+        else:
+            # reservoir sampling keeps an unbiased sample of every observation
+            slot = random.randrange(self.count)
+            if slot < self.reservoir_size:
+                self.samples[slot] = seconds
+
+
+class Metrics:
+    """In-process counters and stage timings for the crawl and text stages.
+
+    Counters are tagged with labels such as source and query, timings with
+    the stage and the source. Every timer() block is also a span: with
+    trace_sample_rate > 0 a share of them is logged at debug level as a
+    JSON event carrying the trace id of the job it belongs to.
+
+    The numbers can be read as Prometheus text (prometheus_text(), served
+    by serve()), as a JSON snapshot written periodically by
+    start_snapshots(), or as a p50/p95 summary per source and stage.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger = None,
+        trace_sample_rate: float = 0.01,
+        reservoir_size: int = 2048,
+        prefix: str = "scraper",
+    ):
+        self.logger = logger or logging.getLogger(__name__)
+        self.trace_sample_rate = trace_sample_rate
+        self.reservoir_size = reservoir_size
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters: Dict[tuple, float] = {}
+        self.timings: Dict[tuple, Timing] = {}
+        self.local = threading.local()
+        self.server = None
+        self.snapshot_stop = None
+
+    @staticmethod
+    def _key(name: str, labels: Dict) -> tuple:
+        return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage: str, seconds: float, **labels):
+        key = self._key(stage, labels)
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = Timing(self.reservoir_size)
+            timing.add(seconds)
+        if self.trace_sample_rate:
+            sample_debug(
+                self.logger,
+                self.trace_sample_rate,
+                "%s",
+                json.dumps(
+                    {"trace": getattr(self.local, "trace", None), "stage": stage, "ms": round(seconds * 1000, 1), **labels},
+                    ensure_ascii=False,
+                ),
+            )
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - started, **labels)
+
+    @contextmanager
+    def trace(self, trace_id: str = None):
+        """Tag the spans of the current thread with a trace id, e.g. one per crawl job"""
+        previous = getattr(self.local, "trace", None)
+        self.local.trace = trace_id or uuid.uuid4().hex[:12]
+        try:
+            yield self.local.trace
+        finally:
+            self.local.trace = previous
+
+    def snapshot(self) -> Dict:
+        """Counters and timing quantiles as a JSON-serializable dict"""
+        with self.lock:
+            counters = [
+                {"name": key[0], "labels": dict(key[1:]), "value": value} for key, value in self.counters.items()
+            ]
+            timings = []
+            for key, timing in self.timings.items():
+                samples = sorted(timing.samples)
+                timings.append(
+                    {
+                        "stage": key[0],
+                        "labels": dict(key[1:]),
+                        "count": timing.count,
+                        "sum": round(timing.total, 4),
+                        "p50": percentile(samples, 0.5),
+                        "p95": percentile(samples, 0.95),
+                    }
+                )
+        return {"time": time.time(), "counters": counters, "timings": timings}
+
+    def write_snapshot(self, path: str = "metrics.json"):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_snapshots(self, path: str = "metrics.json", interval: float = 30.0):
+        """Write a JSON snapshot every interval seconds until stop_snapshots()"""
+        self.stop_snapshots()
+        stop = threading.Event()
+        self.snapshot_stop = stop
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.write_snapshot(path)
+                except Exception as e:
+                    self.logger.error(f"Error writing metrics snapshot: {str(e)}")
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop_snapshots(self):
+        if self.snapshot_stop is not None:
+            self.snapshot_stop.set()
+            self.snapshot_stop = None
+
+    def prometheus_text(self) -> str:
+        """Counters as <prefix>_<name>_total and timings as <prefix>_stage_seconds summaries"""
+        snapshot = self.snapshot()
+        lines = []
+        seen_types = set()
+        for counter in sorted(snapshot["counters"], key=lambda c: c["name"]):
+            metric = f"{self.prefix}_{counter['name']}_total"
+            if metric not in seen_types:
+                lines.append(f"# TYPE {metric} counter")
+                seen_types.add(metric)
+            lines.append(f"{metric}{self._labels(counter['labels'])} {counter['value']}")
+
+        metric = f"{self.prefix}_stage_seconds"
+        if snapshot["timings"]:
+            lines.append(f"# TYPE {metric} summary")
+        for timing in sorted(snapshot["timings"], key=lambda t: t["stage"]):
+            labels = dict(timing["labels"], stage=timing["stage"])
+            for quantile in ("p50", "p95"):
+                if timing[quantile] is not None:
+                    quantile_labels = dict(labels, quantile="0.5" if quantile == "p50" else "0.95")
+                    lines.append(f"{metric}{self._labels(quantile_labels)} {timing[quantile]:.6f}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {timing['sum']}")
+            lines.append(f"{metric}_count{self._labels(labels)} {timing['count']}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _labels(labels: Dict) -> str:
+        if not labels:
+            return ""
+        escaped = (
+            f'{name}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+            for name, value in sorted(labels.items())
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1"):
+        """Serve prometheus_text() on http://host:port/metrics from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+    def summary(self) -> str:
+        """p50/p95 per source and stage, for the end of a run"""
+        rows = []
+        for timing in self.snapshot()["timings"]:
+            if timing["p50"] is None:
+                continue
+            rows.append(
+                (
+                    timing["labels"].get("source", "-"),
+                    timing["stage"],
+                    timing["count"],
+                    timing["p50"],
+                    timing["p95"],
+                )
+            )
+        rows.sort()
+        lines = [f"{'source':<12} {'stage':<20} {'count':>7} {'p50 ms':>9} {'p95 ms':>9}"]
+        for source, stage, count, p50, p95 in rows:
+            lines.append(f"{source:<12} {stage:<20} {count:>7} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        self.stop_snapshots()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
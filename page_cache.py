@@ -0,0 +1,171 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for use as a cache key"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class PageCache:
+    """Content-addressed page cache stored in a local SQLite file.
+
+    Pages are keyed by namespace + normalized request URL and point at a
+    compressed body stored once per content hash; bodies no page points at
+    any more are deleted on replace and pruned on open. The final URL after
+    redirects is stored with the page, so a hit resolves relative links like
+    the live fetch did. ETag and Last-Modified are kept so the fetcher can
+    revalidate stale entries with conditional requests.
+    """
+
+    def __init__(self, path: str = "page_cache.sqlite3"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                body BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                body_hash TEXT NOT NULL REFERENCES bodies(hash),
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_body_hash ON pages (body_hash);
+            """
+        )
+        self.conn.commit()
+        self.prune()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url: str, namespace: str = "http") -> str:
+        return hashlib.sha256(f"{namespace}:{normalize_url(url)}".encode("utf-8")).hexdigest()
+
+    def get(self, url: str, namespace: str = "http") -> Optional[Dict]:
+        """Cached entry for a URL, fresh or not"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT p.url, p.status, b.body, p.etag, p.last_modified, p.fetched_at "
+                "FROM pages p JOIN bodies b ON b.hash = p.body_hash WHERE p.key = ?",
+                (self.make_key(url, namespace),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "url": row[0],
+            "status": row[1],
+            "html": zlib.decompress(row[2]).decode("utf-8"),
+            "etag": row[3],
+            "last_modified": row[4],
+            "fetched_at": row[5],
+        }
+
+    @staticmethod
+    def is_fresh(entry: Dict, ttl: Optional[float]) -> bool:
+        """ttl is in seconds, None keeps the entry forever"""
+        if ttl is None:
+            return True
+        return time.time() - entry["fetched_at"] < ttl
+
+    def get_fresh(self, url: str, ttl: Optional[float], namespace: str = "http") -> Optional[Dict]:
+        """Cached entry if it is still within its TTL, counted as a hit"""
+        entry = self.get(url, namespace)
+        if entry is not None and self.is_fresh(entry, ttl):
+            self.record_hit()
+            return entry
+        return None
+
+    def put(self, url: str, html: str, status: int = 200, etag: str = None,
+            last_modified: str = None, namespace: str = "http", final_url: str = None):
+        """Store a page under its request URL; final_url is the URL after redirects, returned on hits"""
+        body = html.encode("utf-8")
+        body_hash = hashlib.sha256(body).hexdigest()
+        key = self.make_key(url, namespace)
+        with self.lock:
+            previous = self.conn.execute("SELECT body_hash FROM pages WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR IGNORE INTO bodies (hash, body) VALUES (?, ?)",
+                (body_hash, zlib.compress(body)),
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (key, url, status, body_hash, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, final_url or url, status, body_hash, etag, last_modified, time.time()),
+            )
+            if previous is not None and previous[0] != body_hash:
+                self.conn.execute(
+                    "DELETE FROM bodies WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM pages WHERE body_hash = ?)",
+                    (previous[0], previous[0]),
+                )
+            self.conn.commit()
+
+    def prune(self) -> int:
+        """Delete bodies no page refers to, returns how many"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM bodies WHERE NOT EXISTS (SELECT 1 FROM pages WHERE pages.body_hash = bodies.hash)"
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def touch(self, url: str, namespace: str = "http"):
+        """Mark an entry as just validated after a 304 response"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE pages SET fetched_at = ? WHERE key = ?",
+                (time.time(), self.make_key(url, namespace)),
+            )
+            self.conn.commit()
+
+    def record_hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def record_revalidated(self):
+        with self.lock:
+            self.revalidated += 1
+
+    def hit_ratio(self) -> float:
+        """Share of lookups served from the cache, revalidations included"""
+        total = self.hits + self.revalidated + self.misses
+        if total == 0:
+            return 0.0
+        return (self.hits + self.revalidated) / total
+
+    def report(self) -> str:
+        return (
+            f"page cache: {self.hits} hits, {self.revalidated} revalidated, "
+            f"{self.misses} misses, hit ratio {self.hit_ratio():.1%}"
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
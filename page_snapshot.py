@@ -0,0 +1,42 @@
+from typing import List, Dict
+
+from lxml import etree, html as lxml_html
+
+from source_registry import selectors_for
+
+
+def parse_html(page_source: str, base_url: str = None):
+    """Parse a page snapshot into an lxml document"""
+    return lxml_html.document_fromstring(page_source, base_url=base_url)
+
+
+def extract_articles(page_source: str, config: dict, page_url: str = None) -> List[Dict]:
+    """Evaluate all source selectors against a single page snapshot.
+
+    Returns raw article fields (title, date, url) in page order; date
+    normalization is left to the caller.
+    """
+    document = parse_html(page_source, base_url=page_url)
+    selectors = selectors_for(config)
+    exclude = selectors.get("exclude")
+
+    articles = []
+    for element in selectors["article"].select(document):
+        title = selectors["title"].extract(element, page_url)
+        date = selectors["date"].extract(element, page_url)
+        link = selectors["link"].extract(element, page_url)
+        excluded = exclude is not None and exclude.extract(element, page_url) is not None
+
+        if title and link and not excluded:
+            articles.append({"title": title, "url": link, "date": date})
+    return articles
+
+
+def count_articles(page_source: str, config: dict) -> int:
+    """Number of article selector hits in a page snapshot, 0 for an empty page"""
+    try:
+        document = parse_html(page_source)
+    except etree.ParserError:
+        # lxml refuses empty documents
+        return 0
+    return len(selectors_for(config)["article"].select(document))
@@ -0,0 +1,121 @@
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from dedup import canonicalize_url
+
+DEFAULT_DATE_FORMAT = "%Y-%m-%d"
+
+
+def as_date(value) -> date:
+    """A TOML date, datetime or ISO string as a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def date_windows(config: dict, today: date = None) -> List[Optional[Tuple[date, date]]]:
+    """Date windows to search a source in, newest first.
+
+    A source with a "date_window" table (start, optional end defaulting to
+    today, optional days) is searched once per slice of days days, or once
+    over the whole range without days. Sources without one get [None].
+    """
+    window = config.get("date_window")
+    if not window:
+        return [None]
+    start = as_date(window["start"])
+    end = as_date(window["end"]) if window.get("end") else (today or date.today())
+    days = window.get("days")
+    if not days:
+        return [(start, end)]
+
+    windows = []
+    window_end = end
+    while window_end >= start:
+        window_start = max(start, window_end - timedelta(days=days - 1))
+        windows.append((window_start, window_end))
+        window_end = window_start - timedelta(days=1)
+    return windows
+
+
+def window_label(window: Optional[Tuple[date, date]]) -> Optional[str]:
+    if window is None:
+        return None
+    return f"{window[0].isoformat()}..{window[1].isoformat()}"
+
+
+def url_fields(config: dict, page_nr: int = 1, window: Optional[Tuple[date, date]] = None) -> Dict[str, str]:
+    """Placeholder values besides {query} for search_url and page_url.
+
+    Without an explicit window the whole configured date range is used, so
+    a single search of a windowed source still gets valid dates.
+    """
+    fields = {"page_nr": page_nr}
+    if window is None and config.get("date_window"):
+        windows = date_windows(config)
+        window = (windows[-1][0], windows[0][1])
+    if window is not None:
+        date_format = config["date_window"].get("format", DEFAULT_DATE_FORMAT)
+        fields["date_start"] = window[0].strftime(date_format)
+        fields["date_end"] = window[1].strftime(date_format)
+    return fields
+
+
+def build_search_url(config: dict, query: str, page_nr: int = 1, window: Optional[Tuple[date, date]] = None) -> str:
+    """Fill the source search_url (page_url after the first page) template with the query, page and dates"""
+    template = config["search_url"] if page_nr == 1 else config["page_url"]
+    fields = url_fields(config, page_nr, window)
+    query_elems = query.split(" ")
+    if len(query_elems) == 1:
+        return template.format(query=query_elems.pop(), **fields)
+    formatted_query = config.get("query_join", "+").join(query_elems)
+    return template.format(query=formatted_query, **fields)
+
+
+class PageTracker:
+    """Early stop for paginated searches.
+
+    Pages of one (source, query, window) search run as separate jobs, several
+    at a time. When a page comes back without articles, or only with URLs
+    earlier pages of the same search already listed (sites that repeat their
+    last page), the search is exhausted at that page and later pages are
+    skipped.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.exhausted_at: Dict[tuple, int] = {}
+        self.seen: Dict[tuple, set] = {}
+
+    @staticmethod
+    def search_key(job: dict) -> tuple:
+        return (job["source_name"], job["query"], job.get("window"))
+
+    def is_exhausted(self, job: dict) -> bool:
+        with self.lock:
+            exhausted_at = self.exhausted_at.get(self.search_key(job))
+        return exhausted_at is not None and job.get("page", 1) > exhausted_at
+
+    def record(self, job: dict, urls: List[str]) -> bool:
+        """Record the article URLs of a finished page, True if the search ends there"""
+        key = self.search_key(job)
+        page = job.get("page", 1)
+        canonical = {canonicalize_url(url) for url in urls}
+        with self.lock:
+            seen = self.seen.setdefault(key, set())
+            exhausted = not (canonical - seen)
+            seen |= canonical
+            if exhausted and page < self.exhausted_at.get(key, page + 1):
+                self.exhausted_at[key] = page
+        return exhausted
+
+    def stop(self, job: dict):
+        """End the search at this page regardless of its results, e.g. in incremental mode"""
+        key = self.search_key(job)
+        page = job.get("page", 1)
+        with self.lock:
+            if page < self.exhausted_at.get(key, page + 1):
+                self.exhausted_at[key] = page
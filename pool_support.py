@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Backoff between failed browser starts of one checkout: 0.5s, 1s, 2s, ...
+START_BACKOFF = 0.5
+START_BACKOFF_MAX = 10.0
+MAX_START_FAILURES = 3
+
+
+def deadline_for(timeout: Optional[float]) -> Optional[float]:
+    return time.monotonic() + timeout if timeout is not None else None
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a deadline_for() deadline, None for no deadline"""
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+class StartBackoff:
+    """Failed browser starts of one checkout.
+
+    failed() sleeps before the next attempt, doubling the delay each time,
+    and raises instead once max_failures starts in a row failed or the
+    checkout deadline would pass, so a browser that cannot start (missing
+    geckodriver, no memory) fails the checkout instead of spinning on the
+    factory.
+    """
+
+    def __init__(
+        self,
+        deadline: Optional[float],
+        max_failures: int = MAX_START_FAILURES,
+        delay: float = START_BACKOFF,
+        max_delay: float = START_BACKOFF_MAX,
+    ):
+        self.deadline = deadline
+        self.max_failures = max_failures
+        self.delay = delay
+        self.max_delay = max_delay
+        self.failures = 0
+
+    def failed(self):
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            raise RuntimeError(f"browser failed to start {self.failures} times in a row")
+        delay = min(self.max_delay, self.delay * 2 ** (self.failures - 1))
+        left = remaining(self.deadline)
+        if left is not None and left <= delay:
+            raise TimeoutError("no browser available, browser failed to start")
+        time.sleep(delay)
+
+
+def start_in_background(start_one: Callable[[object], None], count: int, profile=None):
+    """Run start_one(profile) count times in parallel daemon threads (pool prewarming)"""
+    for _ in range(count):
+        threading.Thread(target=start_one, args=(profile,), daemon=True).start()
+
+
+def driver_rss_mb(driver) -> Optional[float]:
+    """Resident memory of geckodriver and the browser processes it started, None without psutil"""
+    if psutil is None:
+        return None
+    try:
+        process = psutil.Process(driver.service.process.pid)
+        processes = [process] + process.children(recursive=True)
+        return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def over_memory_limit(driver, max_rss_mb: Optional[float], logger: logging.Logger) -> bool:
+    """True once a browser uses more than max_rss_mb and should be recycled"""
+    if max_rss_mb is None:
+        return False
+    rss_mb = driver_rss_mb(driver)
+    if rss_mb is not None and rss_mb > max_rss_mb:
+        logger.info(f"recycling browser using {rss_mb:.0f} MB")
+        return True
+    return False
@@ -0,0 +1,73 @@
+import unicodedata
+from typing import Dict, List
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics, so "Vânzare" and "Vanzare" compare equal"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def query_words(alias: str) -> frozenset:
+    return frozenset(fold(alias).split())
+
+
+def plan_queries(companies: Dict[str, List[str]], config: dict) -> List[Dict]:
+    """Collapse the company aliases into the search queries a source actually needs.
+
+    With "query_semantics": "all_words" a source returns every article that
+    contains all query words, so an alias whose words are a subset of
+    another alias' words already finds everything the longer alias would
+    ("CEZ" covers "CEZ Vanzare", "ENEL" covers "ENEL Green Power Romania",
+    across companies too). The default "exact" semantics only drops
+    identical aliases. If the source has an "or_format" such as "{a} OR {b}"
+    the remaining queries are batched up to "max_or_terms" per search.
+
+    Each planned query lists the (company, alias) pairs it covers and the
+    companies that own the query terms themselves.
+    """
+    semantics = config.get("query_semantics", "exact")
+    aliases = []
+    for company, company_aliases in companies.items():
+        for alias in company_aliases:
+            aliases.append((company, alias))
+
+    planned = []
+    by_words = {}
+    # shortest aliases first so they become the covering queries
+    for company, alias in sorted(aliases, key=lambda pair: len(query_words(pair[1]))):
+        words = query_words(alias)
+        target = by_words.get(words)
+        if target is None and semantics == "all_words":
+            target = next((query for query in planned if query["words"] <= words), None)
+        if target is None:
+            target = {"query": alias, "words": words, "owners": [], "covers": []}
+            planned.append(target)
+            by_words[words] = target
+        if target["words"] == words and company not in target["owners"]:
+            target["owners"].append(company)
+        target["covers"].append((company, alias))
+
+    or_format = config.get("or_format")
+    max_terms = config.get("max_or_terms", 1)
+    if not or_format or max_terms < 2:
+        return [
+            {"query": query["query"], "owners": query["owners"], "covers": query["covers"]}
+            for query in planned
+        ]
+
+    batches = []
+    for start in range(0, len(planned), max_terms):
+        group = planned[start:start + max_terms]
+        query = group[0]["query"]
+        for term in group[1:]:
+            query = or_format.format(a=query, b=term["query"])
+        batches.append(
+            {
+                "query": query,
+                "owners": [owner for term in group for owner in term["owners"]],
+                "covers": [pair for term in group for pair in term["covers"]],
+            }
+        )
+    return batches
+
@@ -0,0 +1,127 @@
+import json
+import os
+import textwrap
+import threading
+import time
+from typing import Callable, Dict, Iterator
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Stream records from a JSONL file, skipping a torn last line after a crash"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class JsonlResultWriter:
+    """Append-only JSONL writer deduplicating on a record key.
+
+    The key is the record's "url" field unless key_func derives one, e.g. a
+    canonical URL. Keys already present in the file are loaded on open, so a
+    crashed or interrupted run can be resumed by writing to the same file
+    again. Only the set of keys is kept in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        key: str = "url",
+        fsync_every: int = 50,
+        fsync_interval: float = 5.0,
+        key_func: Callable[[Dict], str] = None,
+    ):
+        self.path = path
+        self.key_func = key_func or (lambda record: record[key])
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.seen = set()
+        for record in iter_jsonl(path):
+            try:
+                self.seen.add(self.key_func(record))
+            except KeyError:
+                continue
+        self.resumed = len(self.seen)
+        self.written = 0
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.file = open(path, "a", encoding="utf-8")
+        if self.file.tell() > 0 and not self._ends_with_newline():
+            # terminate a line torn by a crash so the next record starts cleanly
+            self.file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def write(self, record: Dict) -> bool:
+        """Append a record unless its key was already written, returns True if written"""
+        with self.lock:
+            record_key = self.key_func(record)
+            if record_key in self.seen:
+                return False
+            self.seen.add(record_key)
+            self.file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self.written += 1
+            self.pending += 1
+            if self.pending >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+            return True
+
+    def write_many(self, records) -> int:
+        return sum(1 for record in records if self.write(record))
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self._sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def export_json(jsonl_path: str, json_path: str) -> int:
+    """Compact a JSONL file into the indented JSON list format used by the notebooks.
+
+    Records are streamed, so memory does not grow with the file size.
+    """
+    count = 0
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in iter_jsonl(jsonl_path):
+            f.write(",\n" if count else "\n")
+            f.write(textwrap.indent(json.dumps(record, ensure_ascii=False, indent=2, default=str), "  "))
+            count += 1
+        f.write("\n]" if count else "]")
+    os.replace(tmp_path, json_path)
+    return count
+
+
+def export_parquet(jsonl_path: str, parquet_path: str) -> int:
+    """Compact a JSONL file into Parquet, needs pandas with pyarrow or fastparquet"""
+    import pandas as pd
+
+    frame = pd.read_json(jsonl_path, lines=True)
+    frame.to_parquet(parquet_path, index=False)
+    return len(frame)
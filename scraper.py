@@ -13,52 +13,15 @@ import logging
 from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 
+from pagination import build_search_url
+from source_registry import Selector, load_sources, selectors_for
+
 
 class WebScraper:
     def __init__(self):
         self.driver
-        self.sources = {
-            "digi24": {
-                "url": "https://www.digi24.ro",
-                "search_url": "https://www.digi24.ro/search?q={query}",
-                "article_pattern": "//article[contains(@class, 'article')]",
-                "title_pattern": ".//h2[@class='h4 article-title']/a",
-                "date_pattern": ".//span[@class='article-date']",
-                "link_pattern": ".//h2[@class='h4 article-title']/a/@href",
-            },
-            #     "antena3": {
-            #         "url": "https://www.antena3.ro",
-            #         "search_url": "https://www.antena3.ro/cautare/{query}",
-            #         "article_pattern": "//div[contains(@class, 'article-item')]",
-            #         "title_pattern": ".//h3",
-            #         "date_pattern": ".//time",
-            #         "link_pattern": ".//a/@href",
-            #     },
-            #     "adevarul": {
-            #         "url": "https://adevarul.ro",
-            #         "search_url": "https://adevarul.ro/cauta?q={query}",
-            #         "article_pattern": "//div[contains(@class, 'article-box')]",
-            #         "title_pattern": ".//h3",
-            #         "date_pattern": ".//span[contains(@class, 'date')]",
-            #         "link_pattern": ".//a/@href",
-            #     },
-            #     "pro_tv": {
-            #         "url": "https://stirileprotv.ro",
-            #         "search_url": "https://adevarul.ro/cautare/{query}",
-            #         "article_pattern": "//div[contains(@class, 'search-box')]",
-            #         "title_pattern": ".//h2",
-            #         "date_pattern": ".//div[contains(@class, 'article-date')]",
-            #         "link_pattern": ".//a/@href",
-            #     },
-            #     "realitatea": {
-            #         "url": "https://www.realitatea.net",
-            #         "search_url": "https://www.realitatea.net/{query}?page={page_nr}&search-input={query}",
-            #         "article_pattern": "//div[contains(@class, 'search-box')]",
-            #         "title_pattern": ".//h2",
-            #         "date_pattern": ".//div[contains(@class, 'article-date')]",
-            #         "link_pattern": ".//a/@href",
-            #     },
-        }
+        # only the digi24 search, which stays disabled for SeleniumNewsScraper, see sources.toml
+        self.sources = {"digi24": load_sources(include_disabled=True)["digi24"]}
 
         self.companies = {
             "AXPO": ["AXPO", "AXPO Energy Romania"],
@@ -104,11 +67,10 @@ class WebScraper:
     def run_test(self, config, query: str = "", source_name: str = ""):
         return self.scrape_page(config, query, source_name)
 
-    def extract_element_text(self, element, xpath: str) -> str:
-        """Safely extract text from element using xpath"""
+    def extract_element_text(self, element, selector: Selector) -> str:
+        """Safely extract text from element using a precompiled selector"""
         try:
-            result = element.find_element(By.XPATH, xpath)
-            return result.text.strip()
+            return (selector.extract_webdriver(element) or "").strip()
         except NoSuchElementException:
             return ""
 
@@ -117,7 +79,9 @@ class WebScraper:
     ) -> List[Dict]:
         articles = []
         try:
-            search_url = config["search_url"].format(query=query)
+            # first page over the source's whole date range, like SeleniumNewsScraper
+            search_url = build_search_url(config, query)
+            selectors = selectors_for(config)
             if not self.safe_get(search_url):
                 return articles
 
@@ -125,7 +89,7 @@ class WebScraper:
             try:
                 WebDriverWait(self.driver, 10).until(
                     EC.presence_of_element_located(
-                        (By.XPATH, config["article_pattern"])
+                        (By.XPATH, selectors["article"].xpath)
                     )
                 )
             except TimeoutException:
@@ -135,14 +99,14 @@ class WebScraper:
             self.scroll_page(self.driver)
 
             article_elements = self.driver.find_elements(
-                By.XPATH, config["article_pattern"]
+                By.XPATH, selectors["article"].xpath
             )
             for element in article_elements:
                 try:
-                    title = self.extract_element_text(element, config["title_pattern"])
-                    # date = self.extract_element_text(element, config["date_pattern"])
+                    title = self.extract_element_text(element, selectors["title"])
+                    # date = self.extract_element_text(element, selectors["date"])
                     link = element.find_element(
-                        By.XPATH, config["link_pattern"]
+                        By.XPATH, selectors["link"].xpath
                     ).get_attribute("href")
 
                     if title and link:
@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+# seconds a job waits while the half open probe of its source is running
+PROBE_RETRY = 1.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of scraping a source whose circuit breaker is open"""
+
+
+class SourceHealth:
+    """Rolling health of one source driving its request rate and circuit breaker.
+
+    Every scrape is recorded with its latency and outcome. The rate of the
+    token bucket (requests per second) adapts AIMD style: it is halved on a
+    throttled response (429/503), a timeout or a page slower than
+    slow_seconds, and grows by rate_step after every healthy response, within
+    [min_rate, max_rate].
+
+    Once at least min_calls of the last window calls are recorded and the
+    rate of errors, timeouts and throttled responses reaches error_threshold
+    the breaker opens: allow() is False and callers fail fast for cooldown
+    seconds, retry_after() tells how long is left. Then a single probe is
+    let through (half open); its success closes the breaker, a failure opens
+    it again with a doubled cooldown, up to max_cooldown.
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        window: int = 20,
+        min_calls: int = 5,
+        error_threshold: float = 0.5,
+        cooldown: float = 60.0,
+        max_cooldown: float = 900.0,
+        slow_seconds: float = 20.0,
+        rate: float = 1.0,
+        min_rate: float = 0.05,
+        max_rate: float = 2.0,
+        rate_step: float = 0.1,
+        burst: float = 2.0,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.slow_seconds = slow_seconds
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.burst = burst
+
+        self.lock = threading.Lock()
+        # (latency, failed, timed_out) of the last window calls
+        self.calls = deque(maxlen=window)
+        self.timeouts = 0
+        self.errors = 0
+        self.total = 0
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            # negative tokens are reservations, paid back by the refill
+            return -self.tokens / self.rate
+
+    def is_open(self) -> bool:
+        """True while the breaker is open and its cooldown has not passed"""
+        with self.lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown
+
+    def retry_after(self) -> float:
+        """Seconds until allow() may let a scrape through again, 0 if it may now"""
+        with self.lock:
+            if self.state == "open":
+                return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+            if self.state == "half_open" and self.probing:
+                return PROBE_RETRY
+            return 0.0
+
+    def allow(self) -> bool:
+        """Whether a scrape may start now, lets a single probe through once the cooldown passed"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self.probing = False
+            if self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def record(self, latency: float, error: bool = False, timeout: bool = False, throttled: bool = False):
+        """Record a finished scrape and adapt the rate and breaker state"""
+        failed = error or timeout or throttled
+        with self.lock:
+            self.calls.append((latency, failed, timeout))
+            self.total += 1
+            self.errors += failed
+            self.timeouts += timeout
+
+            if throttled or timeout or latency > self.slow_seconds:
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif not failed:
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+            if self.state == "half_open":
+                self.probing = False
+                if failed:
+                    self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                    self._open()
+                else:
+                    self.state = "closed"
+                    self.cooldown = self.base_cooldown
+                    self.calls.clear()
+            elif self.state == "closed" and len(self.calls) >= self.min_calls:
+                if self._error_rate() >= self.error_threshold:
+                    self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def _error_rate(self) -> float:
+        if not self.calls:
+            return 0.0
+        return sum(failed for _, failed, _ in self.calls) / len(self.calls)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            latencies = sorted(latency for latency, _, _ in self.calls)
+            return {
+                "state": self.state,
+                "rate": round(self.rate, 3),
+                "error_rate": round(self._error_rate(), 3),
+                "p50_latency": latencies[len(latencies) // 2] if latencies else None,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "calls": self.total,
+            }
+
+    def report(self) -> str:
+        stats = self.stats()
+        p50 = f"{stats['p50_latency']:.1f}s" if stats["p50_latency"] is not None else "n/a"
+        return (
+            f"{self.name}: {stats['state']}, {stats['calls']} calls, {stats['errors']} errors, "
+            f"{stats['timeouts']} timeouts, p50 {p50}, rate {stats['rate']}/s"
+        )
+
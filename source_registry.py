@@ -0,0 +1,191 @@
+import re
+import tomllib
+from typing import Dict, Optional
+from urllib.parse import urljoin
+
+from lxml import etree
+
+try:
+    from cssselect import GenericTranslator, SelectorError
+except ImportError:
+    GenericTranslator = None
+
+    class SelectorError(Exception):
+        pass
+
+
+SOURCES_FILE = "sources.toml"
+
+REQUIRED_KEYS = ("url", "search_url", "article_pattern", "title_pattern", "date_pattern", "link_pattern")
+PATTERN_KEYS = {
+    "article": "article_pattern",
+    "title": "title_pattern",
+    "date": "date_pattern",
+    "link": "link_pattern",
+    "exclude": "exclude_pattern",
+}
+ATTRIBUTE_SUFFIX = re.compile(r"/@([^/\[\]]+)$")
+CSS_ATTRIBUTE_SUFFIX = re.compile(r"::attr\(([^)]+)\)$")
+
+
+def node_text(node) -> str:
+    """Whitespace-normalized text of an lxml node, close to what WebDriver .text returns"""
+    return " ".join(node.text_content().split())
+
+
+class Selector:
+    """A source pattern parsed once into an element XPath and an optional attribute.
+
+    Patterns are XPath, optionally ending in /@attribute, or CSS prefixed
+    with "css:", optionally ending in ::attr(name); CSS is translated to
+    XPath with cssselect. The same object extracts from lxml nodes (HTTP
+    engine, page snapshots) and from WebDriver elements (live extraction),
+    with the rule extract_element_text always used: for an attribute other
+    than href the element text wins when it is longer than the value.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.attribute = None
+        if pattern.startswith("css:"):
+            css = pattern[4:].strip()
+            attribute_match = CSS_ATTRIBUTE_SUFFIX.search(css)
+            if attribute_match:
+                self.attribute = attribute_match.group(1).strip()
+                css = css[:attribute_match.start()]
+            if GenericTranslator is None:
+                raise ValueError(f"CSS selector {pattern!r} needs the cssselect package")
+            try:
+                self.xpath = GenericTranslator().css_to_xpath(css, prefix="descendant-or-self::")
+            except SelectorError as e:
+                raise ValueError(f"invalid CSS selector {pattern!r}: {e}")
+        else:
+            attribute_match = ATTRIBUTE_SUFFIX.search(pattern)
+            if attribute_match:
+                self.attribute = attribute_match.group(1)
+                self.xpath = pattern[:attribute_match.start()]
+            else:
+                self.xpath = pattern
+        try:
+            self.compiled = etree.XPath(self.xpath)
+        except etree.XPathSyntaxError as e:
+            raise ValueError(f"invalid XPath {pattern!r}: {e}")
+        self.prefer_text = self.attribute not in (None, "href")
+
+    def __repr__(self):
+        return f"Selector({self.pattern!r})"
+
+    def _choose(self, text: str, value: Optional[str], base_url: str = None) -> Optional[str]:
+        if self.attribute is None:
+            return text
+        if value is None:
+            return None
+        if self.prefer_text and len(text) > len(value):
+            return text
+        value = value.strip()
+        if self.attribute == "href" and base_url:
+            # WebDriver resolves href against the page, do the same for snapshots
+            value = urljoin(base_url, value)
+        return value
+
+    def select(self, node) -> list:
+        """All matching lxml nodes"""
+        return self.compiled(node)
+
+    def extract(self, node, base_url: str = None) -> Optional[str]:
+        """Text or attribute of the first match in an lxml node, None if nothing matches"""
+        found = self.compiled(node)
+        if not found:
+            return None
+        element = found[0]
+        value = element.get(self.attribute) if self.attribute is not None else None
+        return self._choose(node_text(element), value, base_url)
+
+    def extract_webdriver(self, element) -> Optional[str]:
+        """Same as extract() on a WebDriver element, raises NoSuchElementException if nothing matches"""
+        from selenium.webdriver.common.by import By
+
+        found = element.find_element(By.XPATH, self.xpath)
+        if self.attribute is None:
+            return found.text
+        return self._choose(found.text.strip(), found.get_attribute(self.attribute))
+
+
+def compile_selectors(config: dict) -> Dict[str, Selector]:
+    """Selector objects for the pattern keys of a source config"""
+    selectors = {}
+    for name, key in PATTERN_KEYS.items():
+        pattern = config.get(key) or ""
+        if pattern:
+            selectors[name] = Selector(pattern)
+    return selectors
+
+
+def selectors_for(config: dict) -> Dict[str, Selector]:
+    """Precompiled selectors of a source, compiled and attached on first use for configs built in code"""
+    selectors = config.get("selectors")
+    if selectors is None:
+        selectors = config["selectors"] = compile_selectors(config)
+    return selectors
+
+
+def validate_source(name: str, config: dict):
+    missing = [key for key in REQUIRED_KEYS if not config.get(key)]
+    if missing:
+        raise ValueError(f"source {name}: missing {', '.join(missing)}")
+    if "{query}" not in config["search_url"]:
+        raise ValueError(f"source {name}: search_url has no {{query}} placeholder")
+    for key in ("max_scrolls", "max_articles", "max_in_flight", "max_pages"):
+        if key in config and (not isinstance(config[key], int) or config[key] < 0):
+            raise ValueError(f"source {name}: {key} must be a non-negative integer")
+    for key in ("min_interval", "jitter"):
+        if key in config and not isinstance(config[key], (int, float)):
+            raise ValueError(f"source {name}: {key} must be a number")
+    validate_pagination(name, config)
+
+
+def validate_pagination(name: str, config: dict):
+    page_url = config.get("page_url")
+    if page_url is not None and ("{page_nr}" not in page_url or "{query}" not in page_url):
+        raise ValueError(f"source {name}: page_url needs {{query}} and {{page_nr}} placeholders")
+    if config.get("max_pages", 1) > 1 and page_url is None:
+        raise ValueError(f"source {name}: max_pages > 1 needs a page_url")
+    window = config.get("date_window")
+    templates = config["search_url"] + (page_url or "")
+    if ("{date_start}" in templates or "{date_end}" in templates) and not window:
+        raise ValueError(f"source {name}: date placeholders need a date_window table")
+    if window:
+        if "start" not in window:
+            raise ValueError(f"source {name}: date_window needs a start")
+        if not isinstance(window.get("days", 1), int) or window.get("days", 1) < 1:
+            raise ValueError(f"source {name}: date_window days must be a positive integer")
+
+
+def load_sources(path: str = SOURCES_FILE, include_disabled: bool = False) -> Dict[str, dict]:
+    """Load, validate and precompile the source registry.
+
+    Every [sources.<name>] table becomes a config dict with the keys the
+    scrapers already use plus "selectors" (see Selector). Sources with
+    enabled = false are skipped unless include_disabled is set. Invalid
+    sources raise ValueError naming the source and the problem.
+    """
+    with open(path, "rb") as f:
+        registry = tomllib.load(f)
+
+    sources = {}
+    for name, config in registry.get("sources", {}).items():
+        config = dict(config)
+        if not config.pop("enabled", True) and not include_disabled:
+            continue
+        if "{page_nr}" in config.get("search_url", ""):
+            # one template for every page, the first one included
+            config.setdefault("page_url", config["search_url"])
+        validate_source(name, config)
+        config.setdefault("exclude_pattern", "")
+        config.setdefault("query_join", "+")
+        try:
+            config["selectors"] = compile_selectors(config)
+        except ValueError as e:
+            raise ValueError(f"source {name}: {e}")
+        sources[name] = config
+    return sources
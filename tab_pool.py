@@ -0,0 +1,408 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from pool_support import (
+    MAX_START_FAILURES,
+    StartBackoff,
+    deadline_for,
+    over_memory_limit,
+    remaining,
+    start_in_background,
+)
+
+# Firefox preferences that stop background windows from being throttled
+# (setTimeout is clamped to 1s in background documents by default), which
+# would slow down the in-page waits of every tab but the selected one.
+TAB_PREFERENCES = {
+    "dom.min_background_timeout_value": 4,
+    "dom.timeout.enable_budget_throttling": False,
+}
+
+NAVIGATE_SCRIPT = "window.__scraperTabNav = arguments[0]; window.location.href = arguments[1];"
+LOAD_STATE_SCRIPT = """
+return {
+    same: window.__scraperTabNav === arguments[0],
+    state: document.readyState,
+    uri: document.documentURI
+};
+"""
+ASYNC_PREFIX = """
+var __tabToken = %s;
+Array.prototype.push.call(arguments, function(value) {
+    window.__scraperTabResults = window.__scraperTabResults || {};
+    window.__scraperTabResults[__tabToken] = {value: value};
+});
+"""
+ASYNC_RESULT_SCRIPT = """
+var results = window.__scraperTabResults || {};
+var result = results[arguments[0]];
+if (result) delete results[arguments[0]];
+return result || null;
+"""
+
+
+class SharedBrowser:
+    """One WebDriver session whose windows are leased to different jobs.
+
+    WebDriver commands always act on the selected window, so every command
+    of a tab runs under lock after switching to the tab's handle.
+    """
+
+    def __init__(self, driver, profile=None):
+        self.driver = driver
+        self.profile = profile
+        self.lock = threading.RLock()
+        self.current = driver.current_window_handle
+        # the first window of a new session is the first tab
+        self.idle = [self.current]
+        self.leased = set()
+        # tab slots reserved by checkouts that are still opening their window
+        self.opening = 0
+        self.pages = 0
+        self.draining = False
+
+    @property
+    def tabs(self) -> int:
+        return len(self.idle) + len(self.leased) + self.opening
+
+    def switch(self, handle: str):
+        """Select a window, called with the lock held"""
+        if self.current != handle:
+            self.driver.switch_to.window(handle)
+            self.current = handle
+
+    def open_tab(self, window_type: str = "window") -> str:
+        with self.lock:
+            self.driver.switch_to.new_window(window_type)
+            self.current = self.driver.current_window_handle
+            return self.current
+
+    def close_tab(self, handle: str):
+        with self.lock:
+            try:
+                self.switch(handle)
+                self.driver.close()
+            except Exception:
+                pass
+            self.current = None
+
+
+class TabSession:
+    """A window of a SharedBrowser with the WebDriver interface the scraper uses.
+
+    Attribute and method calls are forwarded to the driver with the tab
+    selected. Calls that would hold the whole browser while they wait are
+    replaced: get() starts the navigation and polls for the load, and
+    execute_async_script() starts the script and polls for its result, so
+    other tabs can use the browser in the meantime. Timeouts are kept per
+    tab. WebElements are only valid until another tab runs a command, so
+    tabs are meant for page_source snapshot extraction.
+    """
+
+    def __init__(self, browser: SharedBrowser, handle: str, poll_interval: float = 0.05):
+        self.browser = browser
+        self.handle = handle
+        self.poll_interval = poll_interval
+        self.page_load_timeout = 30.0
+        self.script_timeout = 30.0
+
+    def _call(self, function, *args, **kwargs):
+        with self.browser.lock:
+            self.browser.switch(self.handle)
+            return function(*args, **kwargs)
+
+    def __getattr__(self, name):
+        value = self._call(getattr, self.browser.driver, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            return self._call(value, *args, **kwargs)
+
+        return call
+
+    def set_page_load_timeout(self, seconds: float):
+        self.page_load_timeout = seconds
+
+    def set_script_timeout(self, seconds: float):
+        self.script_timeout = seconds
+
+    def get(self, url: str):
+        """Navigate without blocking the browser, raises like WebDriver.get on timeout or a network error"""
+        token = uuid.uuid4().hex
+        self._call(self.browser.driver.execute_script, NAVIGATE_SCRIPT, token, url)
+        deadline = time.monotonic() + self.page_load_timeout
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                state = self._call(self.browser.driver.execute_script, LOAD_STATE_SCRIPT, token)
+            except WebDriverException:
+                # the old document went away between switch and script, try again
+                state = None
+            if state and not state["same"] and state["state"] == "complete":
+                if state["uri"].startswith("about:neterror"):
+                    raise WebDriverException(f"network error loading {url}")
+                return
+            if time.monotonic() > deadline:
+                self._call(self.browser.driver.execute_script, "window.stop();")
+                raise TimeoutException(f"timeout loading {url}")
+
+    def execute_async_script(self, script: str, *args):
+        token = uuid.uuid4().hex
+        self._call(self.browser.driver.execute_script, ASYNC_PREFIX % f'"{token}"' + script, *args)
+        deadline = time.monotonic() + self.script_timeout
+        while True:
+            time.sleep(self.poll_interval)
+            result = self._call(self.browser.driver.execute_script, ASYNC_RESULT_SCRIPT, token)
+            if result is not None:
+                return result["value"]
+            if time.monotonic() > deadline:
+                raise TimeoutException("timeout waiting for async script")
+
+    def reset(self):
+        """Leave the page so its scripts stop and its memory is released, without waiting for it"""
+        self._call(self.browser.driver.execute_script, "window.location.href = 'about:blank';")
+
+
+class TabPool:
+    """Pool of browser windows (tabs) spread over a few shared browsers.
+
+    Up to max_browsers Firefox processes are started lazily, each running up
+    to tabs_per_browser windows; a window is leased to one job at a time, so
+    jobs never share a page. Memory grows with the number of browsers, not
+    the number of concurrent jobs. Checkout prefers a browser of the
+    requested profile (see BrowserPool) with an idle tab, then opens a new
+    tab in one, then starts a browser, then replaces a fully idle browser of
+    another profile.
+
+    A tab that stops answering is closed and reopened; a browser that stops
+    answering is dropped. Browsers are recycled once they served
+    max_pages per tab or use more than max_rss_mb (needs psutil): they take
+    no new leases and are quit when their last tab comes back. Failed
+    browser starts back off like in BrowserPool.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[object], object],
+        max_browsers: int = 2,
+        tabs_per_browser: int = 4,
+        max_pages: Optional[int] = 50,
+        max_rss_mb: Optional[float] = None,
+        window_type: str = "window",
+        logger: logging.Logger = None,
+        max_start_failures: int = MAX_START_FAILURES,
+    ):
+        self.factory = factory
+        self.max_browsers = max_browsers
+        self.tabs_per_browser = tabs_per_browser
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.window_type = window_type
+        self.max_start_failures = max_start_failures
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.condition = threading.Condition()
+        self.browsers: List[SharedBrowser] = []
+        self.starting = 0
+        self.closed = False
+
+    @property
+    def max_size(self) -> int:
+        return self.max_browsers * self.tabs_per_browser
+
+    def prewarm(self, count: int = None, profile=None):
+        """Start browsers in parallel in the background, up to max_browsers"""
+        start_in_background(self._prewarm_one, self.max_browsers if count is None else count, profile)
+
+    def _prewarm_one(self, profile):
+        with self.condition:
+            if self.closed or len(self.browsers) + self.starting >= self.max_browsers:
+                return
+            self.starting += 1
+        self._start(profile)
+
+    def _start(self, profile) -> Optional[SharedBrowser]:
+        """Start a browser for an already reserved slot and add it with its first tab idle"""
+        try:
+            browser = SharedBrowser(self.factory(profile), profile)
+        except Exception as e:
+            self.logger.error(f"Error starting browser: {str(e)}")
+            browser = None
+        with self.condition:
+            self.starting -= 1
+            if browser is not None:
+                self.browsers.append(browser)
+            self.condition.notify_all()
+        return browser
+
+    def _usable(self, browser: SharedBrowser, profile) -> bool:
+        return browser.profile == profile and not browser.draining
+
+    def checkout(self, timeout: float = None, profile=None) -> TabSession:
+        """Lease a tab, opening a tab or starting a browser when none is idle"""
+        deadline = deadline_for(timeout)
+        backoff = StartBackoff(deadline, self.max_start_failures)
+        while True:
+            action, browser, handle = self._reserve(profile, deadline)
+            if action == "start":
+                if self._start(profile) is None:
+                    backoff.failed()
+                continue
+            if action == "evict":
+                self._quit(browser)
+                continue
+            if action == "open":
+                try:
+                    handle = browser.open_tab(self.window_type)
+                except Exception as e:
+                    self.logger.warning(f"could not open a tab: {str(e)}")
+                    handle = None
+                with self.condition:
+                    browser.opening -= 1
+                    if handle is not None:
+                        browser.leased.add(handle)
+                if handle is None:
+                    self._release(browser, None, failed=True)
+                    continue
+            session = TabSession(browser, handle)
+            if self._is_alive(session):
+                return session
+            self.logger.warning("replacing dead tab")
+            self._release(browser, handle, failed=True)
+
+    def _reserve(self, profile, deadline):
+        """Pick what checkout does next, under the pool lock: take, open, start or evict"""
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("tab pool is closed")
+                candidates = [browser for browser in self.browsers if self._usable(browser, profile)]
+                for browser in candidates:
+                    if browser.idle:
+                        handle = browser.idle.pop()
+                        browser.leased.add(handle)
+                        return "take", browser, handle
+                for browser in candidates:
+                    if browser.tabs < self.tabs_per_browser:
+                        # reserve the tab slot, the handle is added once the window is open
+                        browser.opening += 1
+                        return "open", browser, None
+                if len(self.browsers) + self.starting < self.max_browsers:
+                    self.starting += 1
+                    return "start", None, None
+                for browser in self.browsers:
+                    if not browser.leased and browser.profile != profile:
+                        # full pool, swap an idle browser of another profile for a new one
+                        self.browsers.remove(browser)
+                        return "evict", browser, None
+                left = remaining(deadline)
+                if left is not None and left <= 0:
+                    raise TimeoutError("no tab available")
+                self.condition.wait(left)
+
+    def _release(self, browser: SharedBrowser, handle: Optional[str], failed: bool = False):
+        """Give a tab back; a failed tab is closed, or its whole browser dropped if that is dead.
+
+        The last window of a session is never closed, as that ends the session.
+        """
+        quit_browser = False
+        with self.condition:
+            browser.leased.discard(handle)
+        if failed:
+            if not self._driver_alive(browser):
+                with self.condition:
+                    browser.draining = True
+            elif handle is not None:
+                with self.condition:
+                    last_window = browser.tabs == 0
+                if last_window:
+                    # a fresh window first, so closing this one keeps the session open
+                    try:
+                        fresh = browser.open_tab(self.window_type)
+                    except Exception:
+                        fresh = None
+                    with self.condition:
+                        if fresh is not None:
+                            browser.idle.append(fresh)
+                        else:
+                            browser.draining = True
+                browser.close_tab(handle)
+        with self.condition:
+            if not failed and handle is not None:
+                browser.idle.append(handle)
+            if browser.draining and not browser.leased and not browser.opening and browser in self.browsers:
+                self.browsers.remove(browser)
+                quit_browser = True
+            self.condition.notify_all()
+        if quit_browser:
+            self._quit(browser)
+
+    def checkin(self, session: TabSession):
+        """Give a tab back, blanking its page"""
+        browser = session.browser
+        failed = False
+        try:
+            session.reset()
+        except Exception:
+            failed = True
+        with self.condition:
+            browser.pages += 1
+            if self._needs_recycling(browser):
+                browser.draining = True
+            if self.closed:
+                browser.draining = True
+        self._release(browser, session.handle, failed=failed)
+
+    @contextmanager
+    def lease(self, timeout: float = None, profile=None):
+        session = self.checkout(timeout, profile)
+        try:
+            yield session
+        finally:
+            self.checkin(session)
+
+    def _is_alive(self, session: TabSession) -> bool:
+        try:
+            session.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _driver_alive(self, browser: SharedBrowser) -> bool:
+        try:
+            with browser.lock:
+                browser.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _needs_recycling(self, browser: SharedBrowser) -> bool:
+        if self.max_pages is not None and browser.pages >= self.max_pages * self.tabs_per_browser:
+            return True
+        return over_memory_limit(browser.driver, self.max_rss_mb, self.logger)
+
+    def _quit(self, browser: SharedBrowser):
+        try:
+            browser.driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        """Quit idle browsers, browsers with leased tabs are quit when their last tab is checked in"""
+        with self.condition:
+            self.closed = True
+            idle = [browser for browser in self.browsers if not browser.leased]
+            for browser in self.browsers:
+                browser.draining = True
+            for browser in idle:
+                self.browsers.remove(browser)
+            self.condition.notify_all()
+        for browser in idle:
+            self._quit(browser)
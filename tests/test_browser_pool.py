@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("browser went away")
+        return 1
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+        self.drivers = []
+
+    def __call__(self, profile):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("geckodriver not found")
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+def test_failing_factory_gives_up_after_max_start_failures():
+    factory = Factory(fail=True)
+    pool = BrowserPool(factory, max_size=2, max_start_failures=2)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+    assert factory.calls == 2
+    assert time.monotonic() - started < 2
+    assert pool.size == 0
+
+
+def test_failing_factory_respects_the_timeout():
+    factory = Factory(fail=True)
+    pool = BrowserPool(factory, max_size=2)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.2)
+    assert factory.calls == 1
+    assert time.monotonic() - started < 1
+
+
+def test_lease_reuses_and_replaces_dead_browsers():
+    factory = Factory()
+    pool = BrowserPool(factory, max_size=1)
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        assert second is first
+    first.alive = False
+    with pool.lease() as third:
+        assert third is not first
+    assert first.quit_called
+    assert factory.calls == 2
+
+
+def test_browsers_are_recycled_after_max_pages():
+    factory = Factory()
+    pool = BrowserPool(factory, max_size=1, max_pages=2)
+    for _ in range(3):
+        with pool.lease():
+            pass
+    assert factory.calls == 2
+    assert factory.drivers[0].quit_called
+
+
+def test_full_pool_times_out():
+    pool = BrowserPool(Factory(), max_size=1)
+    pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.1)
+
+
+def test_prewarm_starts_browsers_in_the_background():
+    factory = Factory()
+    pool = BrowserPool(factory, max_size=2)
+    pool.prewarm()
+    deadline = time.monotonic() + 2
+    while len(pool.idle) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pool.idle) == 2
+    pool.checkout()
+    assert factory.calls == 2
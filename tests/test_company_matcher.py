@@ -0,0 +1,58 @@
+import pytest
+
+from company_matcher import CompanyMatcher
+
+COMPANIES = {
+    "CEO": ["CEO", "Complexul Energetic Oltenia"],
+    "DEO": ["DEO", "Distributie Energie Oltenia"],
+    "ENEL": ["ENEL", "ENEL Energie"],
+    "ENEL GREEN": ["ENEL GREEN", "ENEL Green Power Romania"],
+    "EON": ["EON", "E.ON Energie Romania"],
+    "MET": ["MET", "MET Romania Energy"],
+    "TRANSELECTRICA": ["TRANSELECTRICA", "Compania Nationala de Transport al Energiei Electrice"],
+}
+
+
+@pytest.fixture
+def matcher():
+    return CompanyMatcher(COMPANIES, case_sensitive=["MET", "DEO", "CEO"], job_titles=["CEO"], needs_context=["CEO"])
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Pentru binele tuturor.”, a declarat Ondrej Safar, CEO Grupul EVRYO",
+        "alături de Secretarul General al Guvernului Marian Neacșu și de CEO-ul SNN Cosmin Ghiță.",
+        "Transelectrica a anunţat, luni, numirea în funcţia de CEO al lui Ştefăniţă Munteanu",
+        "a declarat Volker Raffel, CEO E.ON România.",
+    ],
+)
+def test_ceo_job_title_is_not_a_company(matcher, text):
+    assert "CEO" not in matcher.companies(text)
+
+
+def test_ceo_counts_next_to_the_full_company_name(matcher):
+    text = "Complexul Energetic Oltenia are un nou plan de restructurare. CEO a anunţat luni disponibilizări."
+    hits = [hit for hit in matcher.find(text) if hit["company"] == "CEO"]
+    assert [hit["alias"] for hit in hits] == ["Complexul Energetic Oltenia", "CEO"]
+
+
+def test_title_form_is_dropped_even_with_company_context(matcher):
+    text = "Complexul Energetic Oltenia are un nou CEO-ul companiei, numit în funcţia de CEO."
+    assert [hit["alias"] for hit in matcher.find(text)] == ["Complexul Energetic Oltenia"]
+
+
+def test_short_aliases_match_in_any_case_unless_listed(matcher):
+    assert matcher.companies("Enel a anunţat preţuri noi, iar Eon le-a menţinut.") == ["ENEL", "EON"]
+    assert matcher.companies("Am met-o ieri pe stradă.") == []
+    assert matcher.companies("MET Romania Energy şi MET au semnat.") == ["MET"]
+
+
+def test_deo_only_matches_in_capitals(matcher):
+    assert matcher.companies("Şi-a pus deo înainte de şedinţă, apoi un alt deo roll-on.") == []
+    assert matcher.companies("DEO anunţă întreruperi de curent în Dolj.") == ["DEO"]
+
+
+def test_contained_and_diacritic_hits(matcher):
+    hits = matcher.find("ENEL Green Power Romania şi Compania Naţională de Transport al Energiei Electrice")
+    assert [(hit["company"], hit["start"]) for hit in hits] == [("ENEL GREEN", 0), ("TRANSELECTRICA", 28)]
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from crawl_scheduler import CrawlScheduler, HostBudget, RetryLater
+from source_health import CircuitOpenError, SourceHealth
+
+
+def test_retried_job_frees_its_slot_and_is_paced_again():
+    attempts = {}
+    started = []
+    lock = threading.Lock()
+
+    def worker(job):
+        with lock:
+            started.append((job["id"], time.monotonic()))
+            attempts[job["id"]] = attempts.get(job["id"], 0) + 1
+        if job["id"] == "a1" and attempts["a1"] < 3:
+            raise RetryLater(0.2)
+        time.sleep(0.05)
+        return job["id"]
+
+    results = []
+    scheduler = CrawlScheduler(
+        max_concurrency=1,
+        default_budget=HostBudget(max_in_flight=1, min_interval=0.0, jitter=0.0),
+        host_budgets={"a": HostBudget(max_in_flight=1, min_interval=0.1, jitter=0.0)},
+    )
+    jobs = [{"id": "a1", "host": "a"}] + [{"id": f"b{n}", "host": "b"} for n in range(3)]
+    begin = time.monotonic()
+    scheduler.run(jobs, worker, lambda job, result, error: results.append((job["id"], result, error)))
+
+    assert sorted(results) == sorted((job["id"], job["id"], None) for job in jobs)
+    assert attempts["a1"] == 3
+    # the single global slot served host b while a1 waited for its retry
+    first_b = min(at for job_id, at in started if job_id.startswith("b"))
+    last_a = max(at for job_id, at in started if job_id == "a1")
+    assert first_b < last_a
+    assert last_a - begin >= 0.4
+
+
+def test_skip_and_errors_reach_on_result():
+    def worker(job):
+        if job["id"] == 2:
+            raise ValueError("broken page")
+        return job["id"]
+
+    results = {}
+    scheduler = CrawlScheduler(max_concurrency=2, default_budget=HostBudget(min_interval=0.0, jitter=0.0))
+    jobs = [{"id": n, "host": "h"} for n in range(4)]
+    scheduler.run(jobs, worker, lambda job, result, error: results.update({job["id"]: error or result}),
+                  skip=lambda job: job["id"] == 3)
+
+    assert results[0] == 0 and results[1] == 1
+    assert isinstance(results[2], ValueError)
+    assert 3 not in results
+
+
+def test_open_breaker_holds_jobs_until_a_probe_closes_it():
+    health = SourceHealth("h", window=2, min_calls=2, cooldown=0.3, rate=1000.0, max_rate=1000.0, burst=1000.0)
+    calls = []
+
+    def worker(job):
+        if not health.allow():
+            raise CircuitOpenError("circuit open for h")
+        calls.append((job["id"], health.state))
+        started = time.monotonic()
+        failed = len(calls) <= 2
+        health.record(time.monotonic() - started, error=failed)
+        if failed:
+            raise RuntimeError("server error")
+        return job["id"]
+
+    results = {}
+    scheduler = CrawlScheduler(
+        max_concurrency=2,
+        default_budget=HostBudget(max_in_flight=2, min_interval=0.0, jitter=0.0),
+        limiters={"h": health},
+    )
+    jobs = [{"id": n, "host": "h"} for n in range(6)]
+    scheduler.run(jobs, worker, lambda job, result, error: results.update({job["id"]: error or result}))
+
+    # two failures open the breaker, the third call is the half open probe and the rest follow it
+    assert [state for _, state in calls[:3]] == ["closed", "closed", "half_open"]
+    assert len(calls) == 6
+    assert sum(isinstance(value, RuntimeError) for value in results.values()) == 2
+    assert not any(isinstance(value, CircuitOpenError) for value in results.values())
+
+
+def test_jobs_held_past_max_hold_are_given_up():
+    health = SourceHealth("h", cooldown=60.0)
+    health.state, health.opened_at = "open", time.monotonic()
+    results = {}
+    scheduler = CrawlScheduler(default_budget=HostBudget(min_interval=0.0, jitter=0.0), limiters={"h": health}, max_hold=0.5)
+    scheduler.run([{"id": 1, "host": "h"}], lambda job: job["id"], lambda job, result, error: results.update({1: error}))
+    assert isinstance(results[1], CircuitOpenError)
+
+
+def test_timeouts_count_towards_the_breaker():
+    health = SourceHealth("h", window=4, min_calls=4, error_threshold=0.5)
+    for timeout in (True, True, False, False):
+        health.record(1.0, timeout=timeout)
+    assert health.state == "open"
+    assert health.retry_after() > 0
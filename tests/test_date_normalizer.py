@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from date_normalizer import DateParser, normalize_many
+
+ANCHOR = datetime(2024, 9, 20, 12, 0)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2024-03-05", "2024-03-05"),
+        ("2024-03-05T14:30:00", "2024-03-05T14:30:00"),
+        ("05.03.2024", "2024-03-05"),
+        ("19 septembrie 2024, 14:30", "2024-09-19T14:30:00"),
+        ("11 mart. 2023", "2023-03-11"),
+        ("19 sep", "2024-09-19"),
+        ("21 sep", "2023-09-21"),
+        ("acum 5 minute", "2024-09-20T11:55:00"),
+        ("ieri, 08:15", "2024-09-19T08:15:00"),
+        ("10:05", "2024-09-20T10:05:00"),
+        ("nu e o dată", None),
+    ],
+)
+def test_parse(value, expected):
+    assert DateParser().parse(value, ANCHOR) == expected
+
+
+@pytest.mark.parametrize(
+    "anchor, expected",
+    [
+        (datetime(2025, 3, 1), "2024-02-29"),
+        (datetime(2024, 3, 1), "2024-02-29"),
+        (datetime(2024, 2, 28), "2020-02-29"),
+        (datetime(2027, 1, 10), "2024-02-29"),
+    ],
+)
+def test_yearless_29_february_goes_back_to_a_leap_year(anchor, expected):
+    assert DateParser().parse("29 feb", anchor) == expected
+
+
+@pytest.mark.parametrize("value", ["31.02.2024", "2023-02-29", "2024-13-01", "30 feb 2024", "12.05.2024 25:10", "24:30"])
+def test_invalid_dates_are_none(value):
+    assert DateParser().parse(value, ANCHOR) is None
+
+
+def test_normalize_many_survives_invalid_dates():
+    values = ["29 feb", "31.02.2024", None, "05.03.2024"]
+    assert normalize_many(values, datetime(2025, 3, 1)) == ["2024-02-29", None, None, "2024-03-05"]
@@ -0,0 +1,13 @@
+from page_snapshot import count_articles
+from source_registry import load_sources
+
+SOURCES = load_sources(include_disabled=True)
+
+
+def test_empty_page_has_no_articles():
+    assert count_articles("", SOURCES["adevarul"]) == 0
+    assert count_articles("   ", SOURCES["adevarul"]) == 0
+
+
+def test_page_without_matches_has_no_articles():
+    assert count_articles("<html><body><p>Nimic</p></body></html>", SOURCES["adevarul"]) == 0
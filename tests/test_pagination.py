@@ -0,0 +1,28 @@
+from datetime import date
+
+from pagination import build_search_url, date_windows
+from source_registry import load_sources
+
+SOURCES = load_sources(include_disabled=True)
+
+
+def test_windowed_source_defaults_to_its_whole_range():
+    url = build_search_url(SOURCES["adevarul"], "CEZ Vanzare")
+    assert url == "https://adevarul.ro/search?q=CEZ+Vanzare&date_start=2023-01-01&date_end=2024-12-31"
+
+
+def test_window_and_page_fill_the_templates():
+    window = (date(2024, 7, 3), date(2024, 12, 31))
+    assert build_search_url(SOURCES["adevarul"], "Enel", window=window).endswith(
+        "date_start=2024-07-03&date_end=2024-12-31"
+    )
+    assert build_search_url(SOURCES["realitatea"], "Enel", page_nr=3) == (
+        "https://www.realitatea.net/Enel?page=3&search-input=Enel"
+    )
+
+
+def test_date_windows_cover_the_range_newest_first():
+    windows = date_windows(SOURCES["adevarul"])
+    assert windows[0][1] == date(2024, 12, 31)
+    assert windows[-1][0] == date(2023, 1, 1)
+    assert all(newer[0] > older[1] for newer, older in zip(windows, windows[1:]))
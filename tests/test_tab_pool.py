@@ -0,0 +1,146 @@
+import time
+
+import pytest
+from selenium.common.exceptions import NoSuchWindowException, WebDriverException
+
+from tab_pool import TabPool
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if handle not in self.driver.handles:
+            raise NoSuchWindowException(handle)
+        self.driver.current_window_handle = handle
+
+    def new_window(self, window_type):
+        self.driver.opened += 1
+        handle = f"window-{self.driver.opened}"
+        self.driver.handles.append(handle)
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """Just the WebDriver calls TabPool and TabSession make"""
+
+    def __init__(self):
+        self.handles = ["window-0"]
+        self.current_window_handle = "window-0"
+        self.opened = 0
+        self.dead_tabs = set()
+        self.quit_called = False
+        self.switch_to = FakeSwitchTo(self)
+        self.blanked = []
+
+    @property
+    def window_handles(self):
+        if self.quit_called:
+            raise WebDriverException("session gone")
+        return list(self.handles)
+
+    def execute_script(self, script, *args):
+        if self.quit_called or self.current_window_handle in self.dead_tabs:
+            raise WebDriverException("tab crashed")
+        if "about:blank" in script:
+            self.blanked.append(self.current_window_handle)
+        return 1
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+        self.current_window_handle = None
+
+    def quit(self):
+        self.quit_called = True
+
+
+class Factory:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+        self.drivers = []
+
+    def __call__(self, profile):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("geckodriver not found")
+        driver = FakeDriver()
+        self.drivers.append(driver)
+        return driver
+
+
+def test_leases_share_one_browser_and_checkin_blanks_the_tab():
+    factory = Factory()
+    pool = TabPool(factory, max_browsers=1, tabs_per_browser=2)
+    first = pool.checkout()
+    second = pool.checkout()
+    assert first.browser is second.browser
+    assert first.handle != second.handle
+    assert factory.calls == 1
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+
+    pool.checkin(first)
+    assert factory.drivers[0].blanked == [first.handle]
+    with pool.lease() as again:
+        assert again.handle == first.handle
+    pool.checkin(second)
+
+
+def test_dead_tab_is_closed_and_reopened():
+    factory = Factory()
+    pool = TabPool(factory, max_browsers=1, tabs_per_browser=2)
+    with pool.lease() as session:
+        dead = session.handle
+    driver = factory.drivers[0]
+    driver.dead_tabs.add(dead)
+
+    with pool.lease() as session:
+        assert session.handle != dead
+        assert session.execute_script("return 1") == 1
+    assert dead not in driver.handles
+    assert factory.calls == 1
+    assert not driver.quit_called
+
+
+def test_browser_is_recycled_after_max_pages_per_tab():
+    factory = Factory()
+    pool = TabPool(factory, max_browsers=1, tabs_per_browser=2, max_pages=1)
+    for _ in range(2):
+        with pool.lease():
+            pass
+    assert factory.drivers[0].quit_called
+    with pool.lease() as session:
+        assert session.browser.driver is factory.drivers[1]
+
+
+def test_failing_factory_gives_up_after_max_start_failures():
+    factory = Factory(fail=True)
+    pool = TabPool(factory, max_browsers=2, max_start_failures=2)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+    assert factory.calls == 2
+    assert time.monotonic() - started < 2
+    assert pool.starting == 0
+
+
+def test_failing_factory_respects_the_timeout():
+    factory = Factory(fail=True)
+    pool = TabPool(factory, max_browsers=2)
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.2)
+    assert factory.calls == 1
+
+
+def test_prewarm_starts_browsers_in_the_background():
+    factory = Factory()
+    pool = TabPool(factory, max_browsers=2, tabs_per_browser=2)
+    pool.prewarm()
+    deadline = time.monotonic() + 2
+    while len(pool.browsers) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(pool.browsers) == 2
+    pool.checkout()
+    assert factory.calls == 2
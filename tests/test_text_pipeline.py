@@ -0,0 +1,56 @@
+import threading
+
+from text_pipeline import TextPipeline
+
+
+def records(count):
+    return [{"url": f"https://example.com/{n}"} for n in range(count)]
+
+
+def run_in_thread(pipeline, items, timeout=10.0):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["stats"] = pipeline.run(items)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "run() did not return"
+    return outcome
+
+
+def test_every_result_reaches_the_sink_once():
+    written = []
+    failed = []
+    pipeline = TextPipeline(
+        fetch=lambda record: None if record["url"].endswith("/3") else dict(record, content="text"),
+        sink=written.append,
+        workers=3,
+        queue_size=2,
+        on_failed=failed.append,
+    )
+    outcome = run_in_thread(pipeline, records(20) + records(5))
+    assert outcome["stats"]["written"] == 19
+    assert outcome["stats"]["failed"] == 1
+    assert sorted(result["url"] for result in written) == sorted(r["url"] for r in records(20) if r["url"] != failed[0])
+
+
+def test_sink_error_is_raised_after_the_threads_stop():
+    written = []
+    threads_before = threading.active_count()
+
+    def sink(result):
+        if len(written) == 2:
+            raise RuntimeError("disk full")
+        written.append(result)
+
+    pipeline = TextPipeline(fetch=lambda record: dict(record, content="text"), sink=sink, workers=2, queue_size=2)
+    outcome = run_in_thread(pipeline, records(50))
+    assert isinstance(outcome["error"], RuntimeError)
+    assert len(written) == 2
+    # the producer and workers were joined before the error came out
+    assert threading.active_count() == threads_before
@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+from work_queue import RedisWorkQueue, SqliteWorkQueue
+
+LEASE = 0.2
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def queue(request, tmp_path):
+    if request.param == "sqlite":
+        work_queue = SqliteWorkQueue(str(tmp_path / "queue.sqlite3"), lease_seconds=LEASE, max_attempts=2)
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        work_queue = RedisWorkQueue(fakeredis.FakeRedis(decode_responses=True), lease_seconds=LEASE, max_attempts=2)
+    yield work_queue
+    work_queue.close()
+
+
+def expire_leases():
+    time.sleep(LEASE + 0.05)
+
+
+def test_put_is_once_per_key_and_results_come_back_in_order(queue):
+    assert queue.put("crawl", "a", {"n": 1})
+    assert not queue.put("crawl", "a", {"n": 2})
+    assert queue.put("crawl", "b", {"n": 3})
+
+    first = queue.lease("crawl", "w1")
+    second = queue.lease("crawl", "w2")
+    assert (first.key, first.payload, first.attempts) == ("a", {"n": 1}, 1)
+    assert second.key == "b"
+    assert queue.lease("crawl", "w3") is None
+
+    assert queue.ack(second, ["y"])
+    assert queue.ack(first, ["x"])
+    assert queue.pop_results("crawl", limit=1) == [{"key": "b", "payload": {"n": 3}, "result": ["y"], "error": None}]
+    assert [record["key"] for record in queue.pop_results("crawl")] == ["a"]
+    assert queue.pop_results("crawl") == []
+    assert queue.counts("crawl") == {"pending": 0, "leased": 0, "done": 2, "dead": 0, "results": 0}
+
+
+def test_expired_lease_is_leased_again(queue):
+    queue.put("crawl", "a", {})
+    stale = queue.lease("crawl", "w1")
+    assert queue.counts("crawl")["leased"] == 1
+    expire_leases()
+    assert queue.counts("crawl")["pending"] == 1
+
+    fresh = queue.lease("crawl", "w2")
+    assert (fresh.key, fresh.attempts, fresh.owner) == ("a", 2, "w2")
+    # the first worker lost the job, it can no longer give it back
+    assert not queue.nack(stale, "late")
+    assert not queue.defer(stale)
+
+
+def test_ack_from_a_stale_owner_after_re_lease_wins_once(queue):
+    queue.put("crawl", "a", {})
+    stale = queue.lease("crawl", "w1")
+    expire_leases()
+    fresh = queue.lease("crawl", "w2")
+
+    assert queue.ack(stale, "first")
+    assert not queue.ack(fresh, "second")
+    assert not queue.nack(fresh, "too late")
+    assert [record["result"] for record in queue.pop_results("crawl")] == ["first"]
+    assert queue.lease("crawl", "w3") is None
+
+
+def test_host_limit_counts_leases_of_all_workers(queue):
+    for key in ("a", "b", "c"):
+        queue.put("crawl", key, {}, host="example.ro", host_limit=2)
+    queue.put("crawl", "other", {}, host="other.ro", host_limit=2)
+
+    leased = [queue.lease("crawl", f"w{n}") for n in range(3)]
+    assert [task.key for task in leased] == ["a", "b", "other"]
+    assert queue.lease("crawl", "w4") is None
+
+    queue.ack(leased[0])
+    assert queue.lease("crawl", "w4").key == "c"
+    expire_leases()
+    # expired leases do not count against the host
+    assert queue.lease("crawl", "w5").host == "example.ro"
+
+
+def test_host_interval_paces_leases_of_all_workers(queue):
+    for key in ("a", "b"):
+        queue.put("crawl", key, {}, host="example.ro", host_limit=2, host_interval=0.05, host_jitter=0.05)
+    queue.put("crawl", "other", {}, host="other.ro", host_limit=2)
+
+    assert queue.lease("crawl", "w1").key == "a"
+    # the host has room for a second lease but is paced, other hosts are not held up
+    assert queue.lease("crawl", "w2").key == "other"
+    assert queue.lease("crawl", "w3") is None
+    # well within the lease of "a", so "b" is the one handed out
+    time.sleep(0.12)
+    assert queue.lease("crawl", "w3").key == "b"
+
+
+def test_job_is_dead_after_max_attempts(queue):
+    queue.put("crawl", "a", {"n": 1})
+    assert queue.nack(queue.lease("crawl", "w1"), "boom")
+    assert queue.lease("crawl", "w1").attempts == 2
+    expire_leases()
+    # the second lease expired too, the job is not handed out a third time
+    assert queue.lease("crawl", "w2") is None
+    assert queue.pop_results("crawl") == [{"key": "a", "payload": {"n": 1}, "result": None, "error": "lease expired"}]
+
+    queue.put("crawl", "b", {})
+    queue.nack(queue.lease("crawl", "w1"), "boom")
+    assert not queue.nack(queue.lease("crawl", "w1"), "boom again")
+    assert queue.pop_results("crawl")[0]["error"] == "boom again"
+    assert queue.counts("crawl")["dead"] == 2
+
+
+def test_nack_and_defer_delay_the_job(queue):
+    queue.put("crawl", "a", {})
+    assert queue.nack(queue.lease("crawl", "w1"), "boom", delay=LEASE)
+    assert queue.lease("crawl", "w1") is None
+    expire_leases()
+    task = queue.lease("crawl", "w1")
+    assert task.attempts == 2
+
+    # deferring does not spend attempts, the job never dies of it
+    for _ in range(3):
+        assert queue.defer(task, delay=0.05)
+        assert queue.lease("crawl", "w1") is None
+        time.sleep(0.1)
+        task = queue.lease("crawl", "w1")
+        assert task.attempts == 2
+    assert queue.ack(task, "ok")
+
+
+def test_discard_only_drops_pending_jobs(queue):
+    queue.put("crawl", "a", {})
+    queue.put("crawl", "b", {})
+    leased = queue.lease("crawl", "w1")
+
+    assert not queue.discard("crawl", leased.key)
+    assert queue.discard("crawl", "b")
+    assert not queue.discard("crawl", "b")
+    assert not queue.discard("crawl", "missing")
+    assert queue.lease("crawl", "w2") is None
+    assert queue.pop_results("crawl") == []
+    assert queue.counts("crawl")["done"] == 1
+
+
+def test_queues_and_clear_are_separate(queue):
+    queue.put("crawl", "a", {})
+    queue.put("text", "a", {})
+    queue.ack(queue.lease("text", "w1"), "text")
+    queue.clear("crawl")
+
+    assert queue.lease("crawl", "w1") is None
+    assert [record["result"] for record in queue.pop_results("text")] == ["text"]
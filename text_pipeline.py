@@ -0,0 +1,203 @@
+import csv
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty, Full
+from typing import Callable, Dict, Iterable, Optional
+
+
+_DONE = object()
+
+
+class CsvTextWriter:
+    """Writes one (url, text, companies, cluster) row per extracted article, flushed as it arrives"""
+
+    def __init__(self, path: str = "texts.csv", append: bool = False):
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self.file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        if write_header:
+            self.writer.writerow(["url", "text", "companies", "cluster"])
+
+    def __call__(self, result: Dict):
+        self.writer.writerow(
+            [result["url"], result["content"], ";".join(result.get("companies", [])), result.get("cluster", "")]
+        )
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class TextPipeline:
+    """Bounded producer/consumer pipeline for the article text stage.
+
+    A producer thread feeds link records into a bounded queue, worker
+    threads run fetch() on them, and the calling thread hands every result
+    to sink() exactly once. With a parse() function the work is split: the
+    threads only download (fetch returns the raw page) and parse() runs on a
+    process pool, so CPU-bound extraction is not serialized by the GIL.
+
+    At most queue_size links wait for a worker and at most queue_size
+    results wait for the sink, so memory stays bounded however many links
+    come in. After the deadline no new links are taken and queued ones are
+    dropped; fetches and parses already running are allowed to finish. If
+    sink() raises, the pipeline winds down the same way and run() re-raises
+    the error once its threads have stopped.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Dict], Optional[Dict]],
+        sink: Callable[[Dict], None],
+        workers: int = 5,
+        queue_size: int = 50,
+        deadline: Optional[float] = None,
+        parse: Callable[[Dict], Dict] = None,
+        parse_workers: int = None,
+        key: Callable[[Dict], str] = None,
+        on_failed: Callable[[str], None] = None,
+    ):
+        self.fetch = fetch
+        self.sink = sink
+        self.workers = workers
+        self.queue_size = queue_size
+        # seconds from the start of run(), None runs until the input is exhausted
+        self.deadline = deadline
+        # module level function, it is pickled to the process pool
+        self.parse = parse
+        self.parse_workers = parse_workers or os.cpu_count()
+        # identity of a link record, duplicates are only fetched once
+        self.key = key or (lambda record: record["url"])
+        # called with the URL of every failed fetch or parse, in the calling thread
+        self.on_failed = on_failed
+
+    def run(self, records: Iterable[Dict]) -> Dict[str, int]:
+        links = Queue(maxsize=self.queue_size)
+        # the results queue is bounded by the in_flight semaphore instead of maxsize,
+        # so process pool callbacks never block on it
+        results = Queue()
+        in_flight = threading.BoundedSemaphore(self.queue_size)
+        # set when the calling thread gives up, e.g. because the sink raised
+        stop = threading.Event()
+        stop_at = time.monotonic() + self.deadline if self.deadline is not None else None
+        stats = {"queued": 0, "written": 0, "failed": 0, "skipped": 0}
+        stats_lock = threading.Lock()
+        pending_parses = [0]
+
+        parse_pool = None
+        if self.parse is not None:
+            parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        def expired() -> bool:
+            return stop.is_set() or (stop_at is not None and time.monotonic() >= stop_at)
+
+        def acquire_slot() -> bool:
+            while not in_flight.acquire(timeout=0.5):
+                if stop.is_set():
+                    return False
+            return True
+
+        def put_until_deadline(queue: Queue, item) -> bool:
+            while not expired():
+                try:
+                    queue.put(item, timeout=0.5)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce():
+            seen = set()
+            try:
+                for record in records:
+                    record_key = self.key(record)
+                    if record_key in seen:
+                        continue
+                    seen.add(record_key)
+                    if not put_until_deadline(links, record):
+                        break
+                    stats["queued"] += 1
+            finally:
+                for _ in range(self.workers):
+                    links.put(_DONE)
+
+        def parsed(future, url: str):
+            try:
+                results.put(("parsed", future.result()))
+            except Exception:
+                results.put(("parse_failed", url))
+
+        def work():
+            try:
+                while True:
+                    record = links.get()
+                    if record is _DONE:
+                        return
+                    if expired():
+                        with stats_lock:
+                            stats["skipped"] += 1
+                        continue
+                    try:
+                        page = self.fetch(record)
+                    except Exception:
+                        page = None
+                    if not page:
+                        results.put(("failed", record["url"]))
+                        continue
+
+                    if not acquire_slot():
+                        with stats_lock:
+                            stats["skipped"] += 1
+                        continue
+                    if parse_pool is None:
+                        results.put(("result", page))
+                        continue
+                    with stats_lock:
+                        pending_parses[0] += 1
+                    future = parse_pool.submit(self.parse, page)
+                    future.add_done_callback(lambda f, url=record["url"]: parsed(f, url))
+            finally:
+                results.put(("done", None))
+
+        threads = [threading.Thread(target=produce, daemon=True)]
+        threads += [threading.Thread(target=work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        running = self.workers
+        try:
+            while running or pending_parses[0]:
+                try:
+                    kind, payload = results.get(timeout=0.5)
+                except Empty:
+                    continue
+                if kind == "done":
+                    running -= 1
+                    continue
+                if kind in ("parsed", "parse_failed"):
+                    with stats_lock:
+                        pending_parses[0] -= 1
+                if kind in ("failed", "parse_failed"):
+                    stats["failed"] += 1
+                    if self.on_failed is not None:
+                        self.on_failed(payload)
+                else:
+                    self.sink(payload)
+                    stats["written"] += 1
+                if kind != "failed":
+                    in_flight.release()
+        except BaseException:
+            # workers drop the queued links and the producer stops, the error is raised after the joins
+            stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            if parse_pool is not None:
+                parse_pool.shutdown(wait=True, cancel_futures=stop.is_set())
+        return stats
@@ -0,0 +1,73 @@
+import re
+from functools import lru_cache
+from typing import List
+
+from query_planner import fold
+
+try:
+    from nltk.stem.snowball import SnowballStemmer
+except ImportError:
+    SnowballStemmer = None
+
+
+WORD = re.compile(r"\w+")
+QUERY_TERM = re.compile(r'"([^"]*)"|(\S+)')
+# the stemmer knows the comma-below letters, older texts still use the cedilla ones
+CEDILLA = str.maketrans("şţŞŢ", "șțȘȚ")
+
+_stemmer = SnowballStemmer("romanian") if SnowballStemmer is not None else None
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Romanian Snowball stem of a lowercase word, diacritics-folded afterwards.
+
+    Without nltk the folded word itself is used, so search still works, only
+    without matching inflected forms.
+    """
+    if _stemmer is not None:
+        word = _stemmer.stem(word.translate(CEDILLA))
+    return fold(word)
+
+
+def stem_words(text: str) -> List[str]:
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def index_text(text: str) -> str:
+    """Text as it is stored in the FTS index: stemmed, folded words in their original order"""
+    return " ".join(stem_words(text or ""))
+
+
+def build_match(query: str) -> str:
+    """Translate a search box query into an FTS5 MATCH expression.
+
+    Words must all appear (in any inflection), "quoted phrases" must appear
+    as written, a leading "-" excludes a word or phrase and OR between two
+    terms accepts either. Every term is stemmed like the indexed text and
+    quoted, so FTS5 syntax characters in user input are never interpreted.
+    """
+    expression = ""
+    excluded = []
+    connector = "AND"
+    for phrase, word in QUERY_TERM.findall(query):
+        if word == "OR":
+            connector = "OR"
+            continue
+        negate = word.startswith("-")
+        stems = stem_words(phrase if phrase else word.lstrip("-"))
+        if not stems:
+            continue
+        term = '"' + " ".join(stems) + '"'
+        if negate:
+            excluded.append(term)
+        elif expression:
+            expression = f"{expression} {connector} {term}"
+        else:
+            expression = term
+        connector = "AND"
+    if not expression:
+        return ""
+    for term in excluded:
+        expression = f"({expression}) NOT {term}"
+    return expression
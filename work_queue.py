@@ -0,0 +1,572 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:
+    redis = None
+
+    class WatchError(Exception):
+        pass
+
+
+class Task:
+    """A leased job: its queue, unique key, JSON payload and attempt number"""
+
+    def __init__(self, queue: str, key: str, payload: Dict, attempts: int, owner: str, host: str = None):
+        self.queue = queue
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.owner = owner
+        self.host = host
+
+    def __repr__(self):
+        return f"Task({self.queue!r}, {self.key!r}, attempt {self.attempts})"
+
+
+class SqliteWorkQueue:
+    """Lease/ack work queue in a SQLite file, shared by processes of one machine.
+
+    put() adds a job once per (queue, key). lease() hands the oldest due job
+    to one worker for lease_seconds; a job whose worker dies before ack() or
+    nack() becomes due again when the lease expires, so delivery is at least
+    once. A job with a host and a host_limit is only leased while fewer than
+    host_limit jobs of that host are leased, across all workers, which keeps
+    a source's max_in_flight whatever the number of workers. A job with a
+    host_interval also paces its host: after a lease no job of that host is
+    leased for host_interval plus up to host_jitter seconds, the
+    min_interval/jitter of the in-process CrawlScheduler shared by all
+    workers.
+
+    ack() and a final nack() (or a lease expiring max_attempts times) leave a
+    result record that the coordinator collects with pop_results(). The
+    first ack() wins, even from a worker whose lease expired and was handed
+    to another one. defer() gives a job back without spending an attempt,
+    for jobs that could not start, e.g. behind an open circuit breaker.
+
+    SQLite locking is not reliable on network filesystems, for workers on
+    several machines use RedisWorkQueue.
+    """
+
+    def __init__(self, path: str = "work_queue.sqlite3", lease_seconds: float = 600.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        # autocommit mode, writes take the database lock with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                host TEXT,
+                host_limit INTEGER,
+                host_interval REAL,
+                host_jitter REAL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                available_at REAL NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (queue, key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_due ON tasks (queue, state, available_at);
+            CREATE INDEX IF NOT EXISTS tasks_host ON tasks (queue, host, state, available_at);
+            CREATE TABLE IF NOT EXISTS hosts (
+                queue TEXT NOT NULL,
+                host TEXT NOT NULL,
+                next_lease_at REAL NOT NULL,
+                PRIMARY KEY (queue, host)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT
+            );
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+        for column in ("host_interval", "host_jitter"):
+            if column not in columns:
+                # queue files created before host pacing
+                self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} REAL")
+
+    def _write(self, statements):
+        """Run statements(conn) in one IMMEDIATE transaction and return its result"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def put(
+        self,
+        queue: str,
+        key: str,
+        payload: Dict,
+        host: str = None,
+        host_limit: int = None,
+        host_interval: float = None,
+        host_jitter: float = 0.0,
+    ) -> bool:
+        """Add a job, False if the queue already has one with this key"""
+        now = time.time()
+        cursor = self._write(
+            lambda conn: conn.execute(
+                "INSERT OR IGNORE INTO tasks (queue, key, payload, host, host_limit, host_interval, host_jitter, "
+                "available_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    queue,
+                    key,
+                    json.dumps(payload, ensure_ascii=False),
+                    host,
+                    host_limit,
+                    host_interval,
+                    host_jitter,
+                    now,
+                    now,
+                ),
+            )
+        )
+        return cursor.rowcount == 1
+
+    def lease(self, queue: str, owner: str) -> Optional[Task]:
+        """Lease the oldest due job of the queue whose host has room and is not paced, None if there is none"""
+
+        def statements(conn):
+            now = time.time()
+            # jobs whose leases kept expiring, e.g. a worker killed by every attempt
+            for task_id, key, payload in conn.execute(
+                "SELECT id, key, payload FROM tasks "
+                "WHERE queue = ? AND state = 'leased' AND available_at <= ? AND attempts >= ?",
+                (queue, now, self.max_attempts),
+            ).fetchall():
+                self._finish(conn, task_id, queue, key, payload, "dead", error="lease expired")
+
+            row = conn.execute(
+                "SELECT id, key, payload, host, attempts, host_interval, host_jitter FROM tasks t "
+                "WHERE queue = ? AND state IN ('pending', 'leased') AND available_at <= ? "
+                "AND (host_limit IS NULL OR ("
+                "    SELECT COUNT(*) FROM tasks l WHERE l.queue = t.queue AND l.host = t.host "
+                "    AND l.state = 'leased' AND l.available_at > ?"
+                ") < host_limit) "
+                "AND NOT EXISTS ("
+                "    SELECT 1 FROM hosts h WHERE h.queue = t.queue AND h.host = t.host AND h.next_lease_at > ?"
+                ") "
+                "ORDER BY id LIMIT 1",
+                (queue, now, now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            task_id, key, payload, host, attempts, host_interval, host_jitter = row
+            if host is not None and host_interval is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO hosts (queue, host, next_lease_at) VALUES (?, ?, ?)",
+                    (queue, host, now + host_interval + random.uniform(0, host_jitter or 0.0)),
+                )
+            conn.execute(
+                "UPDATE tasks SET state = 'leased', attempts = attempts + 1, owner = ?, available_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, now, task_id),
+            )
+            return Task(queue, key, json.loads(payload), attempts + 1, owner, host)
+
+        return self._write(statements)
+
+    def _finish(self, conn, task_id: int, queue: str, key: str, payload: str, state: str, result=None, error=None):
+        conn.execute(
+            "UPDATE tasks SET state = ?, owner = NULL, error = ?, updated_at = ? WHERE id = ?",
+            (state, error, time.time(), task_id),
+        )
+        conn.execute(
+            "INSERT INTO results (queue, key, payload, result, error) VALUES (?, ?, ?, ?, ?)",
+            (queue, key, payload, json.dumps(result, ensure_ascii=False) if result is not None else None, error),
+        )
+
+    def ack(self, task: Task, result=None) -> bool:
+        """Finish a job with its JSON-serializable result, False if another worker already did"""
+
+        def statements(conn):
+            row = conn.execute(
+                "SELECT id, payload FROM tasks WHERE queue = ? AND key = ? AND state IN ('pending', 'leased')",
+                (task.queue, task.key),
+            ).fetchone()
+            if row is None:
+                return False
+            self._finish(conn, row[0], task.queue, task.key, row[1], "done", result=result)
+            return True
+
+        return self._write(statements)
+
+    def nack(self, task: Task, error: str = None, delay: float = 0.0) -> bool:
+        """Give a failed job back to run again after delay seconds, True if it will be retried.
+
+        Once it has been attempted max_attempts times the job is dead and its
+        error is passed on to the coordinator.
+        """
+
+        def statements(conn):
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM tasks WHERE queue = ? AND key = ? AND state = 'leased' "
+                "AND owner = ?",
+                (task.queue, task.key, task.owner),
+            ).fetchone()
+            if row is None:
+                return False
+            task_id, payload, attempts = row
+            if attempts >= self.max_attempts:
+                self._finish(conn, task_id, task.queue, task.key, payload, "dead", error=error)
+                return False
+            conn.execute(
+                "UPDATE tasks SET state = 'pending', owner = NULL, available_at = ?, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (time.time() + delay, error, time.time(), task_id),
+            )
+            return True
+
+        return self._write(statements)
+
+    def defer(self, task: Task, delay: float = 0.0) -> bool:
+        """Give a job that did not run back to run after delay seconds, without counting the attempt"""
+        now = time.time()
+        cursor = self._write(
+            lambda conn: conn.execute(
+                "UPDATE tasks SET state = 'pending', owner = NULL, attempts = MAX(attempts - 1, 0), "
+                "available_at = ?, updated_at = ? WHERE queue = ? AND key = ? AND state = 'leased' AND owner = ?",
+                (now + delay, now, task.queue, task.key, task.owner),
+            )
+        )
+        return cursor.rowcount == 1
+
+    def discard(self, queue: str, key: str) -> bool:
+        """Mark a job nobody leased yet as done without running it or leaving a result"""
+        cursor = self._write(
+            lambda conn: conn.execute(
+                "UPDATE tasks SET state = 'done', error = 'discarded', updated_at = ? "
+                "WHERE queue = ? AND key = ? AND state = 'pending'",
+                (time.time(), queue, key),
+            )
+        )
+        return cursor.rowcount == 1
+
+    def pop_results(self, queue: str, limit: int = 100) -> List[Dict]:
+        """Take up to limit finished jobs: key, payload and result, or error for dead ones"""
+
+        def statements(conn):
+            rows = conn.execute(
+                "SELECT id, key, payload, result, error FROM results WHERE queue = ? ORDER BY id LIMIT ?",
+                (queue, limit),
+            ).fetchall()
+            if rows:
+                conn.execute("DELETE FROM results WHERE queue = ? AND id <= ?", (queue, rows[-1][0]))
+            return rows
+
+        return [
+            {
+                "key": key,
+                "payload": json.loads(payload),
+                "result": json.loads(result) if result is not None else None,
+                "error": error,
+            }
+            for _, key, payload, result, error in self._write(statements)
+        ]
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        """Jobs by state; leases that expired count as pending"""
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT CASE WHEN state = 'leased' AND available_at <= ? THEN 'pending' ELSE state END, COUNT(*) "
+                "FROM tasks WHERE queue = ? GROUP BY 1",
+                (now, queue),
+            ).fetchall()
+            results = self.conn.execute("SELECT COUNT(*) FROM results WHERE queue = ?", (queue,)).fetchone()[0]
+        counts = {"pending": 0, "leased": 0, "done": 0, "dead": 0}
+        counts.update(dict(rows))
+        counts["results"] = results
+        return counts
+
+    def clear(self, queue: str):
+        """Drop every job and result of a queue, for a fresh run"""
+        def statements(conn):
+            conn.execute("DELETE FROM tasks WHERE queue = ?", (queue,))
+            conn.execute("DELETE FROM hosts WHERE queue = ?", (queue,))
+            conn.execute("DELETE FROM results WHERE queue = ?", (queue,))
+
+        self._write(statements)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisWorkQueue:
+    """The SqliteWorkQueue semantics on a Redis-compatible server, for workers on several machines.
+
+    client is a redis.Redis style client (redis-py, or any stand-in with the
+    same API such as fakeredis). Only plain commands and WATCH/MULTI
+    transactions are used, no Lua. Per queue:
+
+    - <prefix>:<queue>:due, sorted set of unfinished job keys by the time they
+      are due (put time, retry time or lease expiry)
+    - <prefix>:<queue>:task:<key>, hash with the payload, host, attempts, owner
+      and state
+    - <prefix>:<queue>:leased[:<host>], sorted sets of leases by expiry
+    - <prefix>:<queue>:next:<host>, time before which no job of a paced host
+      is leased
+    - <prefix>:<queue>:results, list of result records for pop_results()
+    """
+
+    def __init__(self, client, prefix: str = "scraper", lease_seconds: float = 600.0, max_attempts: int = 3):
+        self.client = client
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisWorkQueue":
+        if redis is None:
+            raise ImportError("a redis:// work queue needs the redis package")
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _key(self, queue: str, *parts: str) -> str:
+        return ":".join((self.prefix, queue) + parts)
+
+    @staticmethod
+    def _str(value) -> Optional[str]:
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return value
+
+    def put(
+        self,
+        queue: str,
+        key: str,
+        payload: Dict,
+        host: str = None,
+        host_limit: int = None,
+        host_interval: float = None,
+        host_jitter: float = 0.0,
+    ) -> bool:
+        task_key = self._key(queue, "task", key)
+        if not self.client.hsetnx(task_key, "state", "pending"):
+            return False
+        fields = {"payload": json.dumps(payload, ensure_ascii=False), "attempts": 0}
+        if host is not None and (host_limit is not None or host_interval is not None):
+            fields["host"] = host
+            if host_limit is not None:
+                fields["host_limit"] = host_limit
+            if host_interval is not None:
+                fields["host_interval"] = host_interval
+                fields["host_jitter"] = host_jitter
+        pipe = self.client.pipeline()
+        pipe.hset(task_key, mapping=fields)
+        pipe.zadd(self._key(queue, "due"), {key: time.time()})
+        pipe.execute()
+        return True
+
+    def lease(self, queue: str, owner: str, scan: int = 50) -> Optional[Task]:
+        due_key = self._key(queue, "due")
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(due_key)
+                    now = time.time()
+                    for key in pipe.zrangebyscore(due_key, "-inf", now, start=0, num=scan):
+                        key = self._str(key)
+                        task_key = self._key(queue, "task", key)
+                        state, host, host_limit, host_interval, host_jitter, attempts, payload = (
+                            self._str(value)
+                            for value in pipe.hmget(
+                                task_key, "state", "host", "host_limit", "host_interval", "host_jitter", "attempts",
+                                "payload",
+                            )
+                        )
+                        attempts = int(attempts or 0)
+                        if state == "leased" and attempts >= self.max_attempts:
+                            pipe.multi()
+                            self._finish(pipe, queue, key, host, payload, "dead", error="lease expired")
+                            pipe.execute()
+                            break
+                        if host_limit is not None:
+                            host_leases = self._key(queue, "leased", host)
+                            pipe.watch(host_leases)
+                            if pipe.zcount(host_leases, now, "+inf") >= int(host_limit):
+                                continue
+                        if host_interval is not None:
+                            next_lease = self._key(queue, "next", host)
+                            pipe.watch(next_lease)
+                            if float(self._str(pipe.get(next_lease)) or 0) > now:
+                                continue
+                        until = now + self.lease_seconds
+                        pipe.multi()
+                        if host_interval is not None:
+                            pipe.set(
+                                next_lease, now + float(host_interval) + random.uniform(0, float(host_jitter or 0))
+                            )
+                        pipe.zadd(due_key, {key: until})
+                        pipe.zadd(self._key(queue, "leased"), {key: until})
+                        if host is not None:
+                            pipe.zadd(self._key(queue, "leased", host), {key: until})
+                        pipe.hset(task_key, mapping={"state": "leased", "owner": owner, "attempts": attempts + 1})
+                        pipe.execute()
+                        return Task(queue, key, json.loads(payload), attempts + 1, owner, host)
+                    else:
+                        pipe.unwatch()
+                        return None
+                except WatchError:
+                    # another worker changed the queue between our reads and MULTI
+                    continue
+
+    def _finish(self, pipe, queue: str, key: str, host: str, payload: str, state: str, result=None, error=None):
+        """Queue the commands ending a job on a pipeline in MULTI mode"""
+        pipe.hset(self._key(queue, "task", key), mapping={"state": state, "owner": ""})
+        pipe.zrem(self._key(queue, "due"), key)
+        pipe.zrem(self._key(queue, "leased"), key)
+        if host is not None:
+            pipe.zrem(self._key(queue, "leased", host), key)
+        pipe.hdel(self._key(queue, "task", key), "payload")
+        pipe.hincrby(self._key(queue, "counts"), state, 1)
+        pipe.rpush(
+            self._key(queue, "results"),
+            json.dumps(
+                {"key": key, "payload": json.loads(payload), "result": result, "error": error}, ensure_ascii=False
+            ),
+        )
+
+    def _update(self, task: Task, change) -> bool:
+        """Run change(pipe, state, attempts, payload) in a transaction watching the task hash"""
+        task_key = self._key(task.queue, "task", task.key)
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(task_key)
+                    state, owner, attempts, payload = (
+                        self._str(value) for value in pipe.hmget(task_key, "state", "owner", "attempts", "payload")
+                    )
+                    return change(pipe, state, owner, int(attempts or 0), payload)
+                except WatchError:
+                    continue
+
+    def ack(self, task: Task, result=None) -> bool:
+        def change(pipe, state, owner, attempts, payload):
+            if state in (None, "done", "dead"):
+                pipe.unwatch()
+                return False
+            pipe.multi()
+            self._finish(pipe, task.queue, task.key, task.host, payload, "done", result=result)
+            pipe.execute()
+            return True
+
+        return self._update(task, change)
+
+    def nack(self, task: Task, error: str = None, delay: float = 0.0) -> bool:
+        def change(pipe, state, owner, attempts, payload):
+            if state != "leased" or owner != task.owner:
+                pipe.unwatch()
+                return False
+            pipe.multi()
+            if attempts >= self.max_attempts:
+                self._finish(pipe, task.queue, task.key, task.host, payload, "dead", error=error)
+                pipe.execute()
+                return False
+            self._release(pipe, task, delay, attempts)
+            pipe.execute()
+            return True
+
+        return self._update(task, change)
+
+    def defer(self, task: Task, delay: float = 0.0) -> bool:
+        def change(pipe, state, owner, attempts, payload):
+            if state != "leased" or owner != task.owner:
+                pipe.unwatch()
+                return False
+            pipe.multi()
+            self._release(pipe, task, delay, max(attempts - 1, 0))
+            pipe.execute()
+            return True
+
+        return self._update(task, change)
+
+    def _release(self, pipe, task: Task, delay: float, attempts: int):
+        """Queue the commands making a leased job pending again on a pipeline in MULTI mode"""
+        pipe.hset(
+            self._key(task.queue, "task", task.key), mapping={"state": "pending", "owner": "", "attempts": attempts}
+        )
+        pipe.zadd(self._key(task.queue, "due"), {task.key: time.time() + delay})
+        pipe.zrem(self._key(task.queue, "leased"), task.key)
+        if task.host is not None:
+            pipe.zrem(self._key(task.queue, "leased", task.host), task.key)
+
+    def discard(self, queue: str, key: str) -> bool:
+        task = Task(queue, key, None, 0, None)
+
+        def change(pipe, state, owner, attempts, payload):
+            if state != "pending":
+                pipe.unwatch()
+                return False
+            pipe.multi()
+            pipe.hset(self._key(queue, "task", key), "state", "done")
+            pipe.hdel(self._key(queue, "task", key), "payload")
+            pipe.zrem(self._key(queue, "due"), key)
+            pipe.hincrby(self._key(queue, "counts"), "done", 1)
+            pipe.execute()
+            return True
+
+        return self._update(task, change)
+
+    def pop_results(self, queue: str, limit: int = 100) -> List[Dict]:
+        results_key = self._key(queue, "results")
+        pipe = self.client.pipeline()
+        pipe.lrange(results_key, 0, limit - 1)
+        pipe.ltrim(results_key, limit, -1)
+        records, _ = pipe.execute()
+        return [json.loads(self._str(record)) for record in records]
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zcard(self._key(queue, "due"))
+        pipe.zcount(self._key(queue, "leased"), now, "+inf")
+        pipe.hgetall(self._key(queue, "counts"))
+        pipe.llen(self._key(queue, "results"))
+        unfinished, leased, finished, results = pipe.execute()
+        counts = {"pending": unfinished - leased, "leased": leased, "done": 0, "dead": 0, "results": results}
+        counts.update({self._str(state): int(count) for state, count in finished.items()})
+        return counts
+
+    def clear(self, queue: str):
+        keys = list(self.client.scan_iter(match=self._key(queue, "*"), count=500))
+        for start in range(0, len(keys), 500):
+            self.client.delete(*keys[start:start + 500])
+
+    def close(self):
+        self.client.close()
+
+
+def open_queue(url: str, **kwargs):
+    """A work queue from a redis:// or rediss:// URL, otherwise a SQLite file path (sqlite:/// prefix optional)"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue.from_url(url, **kwargs)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SqliteWorkQueue(url, **kwargs)